@@ -0,0 +1,79 @@
+"""Add site and asset balance tables
+
+Revision ID: 0ebbee43c441
+Revises: 1e063a8cc9f8
+Create Date: 2026-10-19 09:12:05.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0ebbee43c441'
+down_revision = '1e063a8cc9f8'
+branch_labels = None
+depends_on = None
+
+
+BALANCE_TABLES = [
+    ('site_balance', 'site_history', 'site_id', 'sites'),
+    ('asset_balance', 'asset_history', 'asset_id', 'assets'),
+]
+
+# Fills a balance table from its history: newest (rn = 1), second newest (rn = 2)
+# and oldest entry of every site/asset.
+BACKFILL_SQL = """
+INSERT INTO {table} ({item}, user_id, current_amount, current_currency, current_recorded_at,
+                     previous_amount, previous_currency, first_amount, first_currency)
+SELECT cur.{item}, cur.user_id, cur.amount, cur.currency, cur.recorded_at,
+       prev.amount, prev.currency, fst.amount, fst.currency
+FROM (
+    SELECT {item}, user_id, amount, currency, recorded_at,
+           ROW_NUMBER() OVER (PARTITION BY {item} ORDER BY recorded_at DESC, id DESC) AS rn
+    FROM {history}
+) cur
+LEFT JOIN (
+    SELECT {item}, amount, currency,
+           ROW_NUMBER() OVER (PARTITION BY {item} ORDER BY recorded_at DESC, id DESC) AS rn
+    FROM {history}
+) prev ON prev.{item} = cur.{item} AND prev.rn = 2
+JOIN (
+    SELECT {item}, amount, currency,
+           ROW_NUMBER() OVER (PARTITION BY {item} ORDER BY recorded_at ASC, id ASC) AS rn
+    FROM {history}
+) fst ON fst.{item} = cur.{item} AND fst.rn = 1
+WHERE cur.rn = 1
+"""
+
+
+def upgrade():
+    for table, history, item, parent in BALANCE_TABLES:
+        op.create_table(table,
+        sa.Column(item, sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('current_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('current_currency', sa.String(length=3), nullable=False),
+        sa.Column('current_recorded_at', sa.DateTime(), nullable=True),
+        sa.Column('previous_amount', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column('previous_currency', sa.String(length=3), nullable=True),
+        sa.Column('first_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('first_currency', sa.String(length=3), nullable=False),
+        sa.ForeignKeyConstraint([item], [f'{parent}.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['current_currency'], ['currency.code'], ),
+        sa.ForeignKeyConstraint(['previous_currency'], ['currency.code'], ),
+        sa.ForeignKeyConstraint(['first_currency'], ['currency.code'], ),
+        sa.PrimaryKeyConstraint(item)
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f(f'ix_{table}_user_id'), ['user_id'], unique=False)
+
+        op.execute(BACKFILL_SQL.format(table=table, history=history, item=item))
+
+
+def downgrade():
+    for table, _, _, _ in reversed(BALANCE_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_user_id'))
+        op.drop_table(table)
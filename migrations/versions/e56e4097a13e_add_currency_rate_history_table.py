@@ -0,0 +1,38 @@
+"""Add currency rate history table
+
+Revision ID: e56e4097a13e
+Revises: 0ebbee43c441
+Create Date: 2026-10-19 13:02:44.381207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e56e4097a13e'
+down_revision = '0ebbee43c441'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('currency_rate_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('currency_code', sa.String(length=3), nullable=False),
+    sa.Column('rate', sa.Numeric(precision=10, scale=6), nullable=False),
+    sa.Column('effective_from', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['currency_code'], ['currency.code'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('currency_code', 'effective_from', name='uq_currency_rate_history_code_from')
+    )
+
+    # Older rates were never recorded, so today's rate covers all existing amounts
+    op.execute(
+        "INSERT INTO currency_rate_history (currency_code, rate, effective_from) "
+        "SELECT code, rate, '1970-01-01 00:00:00' FROM currency"
+    )
+
+
+def downgrade():
+    op.drop_table('currency_rate_history')
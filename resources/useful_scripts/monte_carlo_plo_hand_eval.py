@@ -1,12 +1,22 @@
 import itertools
-import json
 import random
 from multiprocessing import Pool, cpu_count
 from treys import Card, Deck, Evaluator
 from tqdm import tqdm
+import numpy as np
 import os
 
+from plo_batch_eval import RANKS, SUITS, card_to_str, simulate_equity_batched
+from plo_equity_store import completed_shards, export_json, open_store, populate_hands, record_shard
+
 ITERATIONS_PER_HAND = 100000  # Number of simulations for each hand. Higher is more accurate but slower.
+BASE_SEED = 20240601  # Seed for the batched simulations; each class is seeded with BASE_SEED + class index.
+
+# All 24 relabellings of the four suits, as lookup tables from card code to card code
+_SUIT_PERMUTATIONS = np.array([
+    [rank * 4 + perm[suit] for rank in range(len(RANKS)) for suit in range(len(SUITS))]
+    for perm in itertools.permutations(range(len(SUITS)))
+], dtype=np.int64)
 
 evaluator = Evaluator()
 
@@ -76,123 +86,158 @@ def simulate_hand_equity(hero_hand_tuple):
         "loss_pct": (losses / ITERATIONS_PER_HAND) * 100,
     }
 
+def all_plo_hands():
+    """
+    Returns every PLO starting hand as an (270725, 4) array of sorted card codes,
+    in a fixed order (combinations of the deck ordered 2s, 2h, 2d, 2c, ..., Ac).
+    """
+    return np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(52), 4)),
+        dtype=np.int64, count=270725 * 4,
+    ).reshape(-1, 4)
+
+
+def canonical_hand_keys(hands):
+    """
+    Maps each hand to a key identifying its suit-isomorphism class.
+
+    Two hands share a key exactly when one is a suit relabelling of the other, so they
+    have identical equity against a random hand. The key is the smallest base-52
+    encoding of the sorted hand over all 24 suit permutations.
+
+    Args:
+        hands: An int array of shape (n, 4) of card codes.
+
+    Returns:
+        An int64 array of n keys.
+    """
+    mapped = np.sort(_SUIT_PERMUTATIONS[:, hands], axis=-1)  # (24, n, 4)
+    keys = (mapped * (52 ** np.arange(3, -1, -1))).sum(axis=-1)
+    return keys.min(axis=0)
+
+
+def decode_hand_key(key):
+    """Converts a canonical hand key back into a tuple of 4 card codes."""
+    return tuple(int(key) // 52 ** p % 52 for p in (3, 2, 1, 0))
+
+
+def group_isomorphic_hands(hands):
+    """
+    Groups hands into suit-isomorphism classes.
+
+    Returns:
+        A (representatives, weights, class_of_hand) tuple: one canonical hand (tuple of
+        card codes) per class, the number of hands in each class, and the class index
+        of every input hand.
+    """
+    keys, class_of_hand, weights = np.unique(
+        canonical_hand_keys(hands), return_inverse=True, return_counts=True
+    )
+    return [decode_hand_key(k) for k in keys], weights, class_of_hand
+
+
+def simulate_class_equity(class_index, hand, iterations=ITERATIONS_PER_HAND):
+    """
+    Runs the batched Monte Carlo simulation for one canonical hand.
+    The generator is seeded from the class index, so results do not depend on
+    which worker or shard runs the class.
+    Args:
+        class_index (int): The suit-isomorphism class of the hand.
+        hand (tuple): 4 card codes.
+    Returns:
+        dict: The class index, seed and raw win/tie/loss counts.
+    """
+    seed = BASE_SEED + class_index
+    wins, ties, losses = simulate_equity_batched(hand, iterations, rng=np.random.default_rng(seed))
+    return {
+        "class_id": class_index,
+        "wins": wins,
+        "ties": ties,
+        "losses": losses,
+        "iterations": iterations,
+        "seed": seed,
+    }
+
+
+def make_shards(representatives, shard_size):
+    """
+    Splits the classes into fixed, contiguous shards.
+    Returns:
+        list: (shard_id, [(class_index, hand), ...]) tuples. The split only depends on
+        shard_size, so shard ids stay valid across resumed runs.
+    """
+    tasks = list(enumerate(representatives))
+    return [(shard_id, tasks[start:start + shard_size])
+            for shard_id, start in enumerate(range(0, len(tasks), shard_size))]
+
+
+def simulate_shard(shard):
+    """
+    Simulates every class of one shard. Designed to be used with multiprocessing.Pool.
+    Returns:
+        tuple: (shard_id, list of class results).
+    """
+    shard_id, tasks = shard
+    return shard_id, [simulate_class_equity(class_index, hand) for class_index, hand in tasks]
+
+
 def main():
     """
     Main function to generate all PLO hands, run simulations in parallel,
-    and save the results to a JSON file, with efficient, index-based progress
-    saving and resuming.
+    and save the results to a SQLite store, resuming per shard.
+
+    Only one canonical hand per suit-isomorphism class is simulated (~16k instead of
+    270,725). Workers pull one shard at a time, so a slow shard never holds up the
+    others, and each finished shard is committed in a single transaction. The final
+    merge expands the classes back to every hand in plo_hand_equity.json.
     """
     # --- Constants and Configuration ---
-    CHUNK_SIZE = 100  # How many hands to process before saving a file
-    STATS_DIR = 'plo_hand_stats'
-    RESUME_FILE = os.path.join(STATS_DIR, 'resume_info.json')
+    SHARD_SIZE = 64  # How many classes each shard simulates before its results are committed
+    STORE_FILE = 'plo_hand_stats.sqlite'
     FINAL_OUTPUT_DIR = os.path.join('src', 'total_bankroll', 'data')
     FINAL_OUTPUT_FILE = os.path.join(FINAL_OUTPUT_DIR, 'plo_hand_equity.json')
 
-    # --- Setup Directories ---
-    os.makedirs(STATS_DIR, exist_ok=True)
     os.makedirs(FINAL_OUTPUT_DIR, exist_ok=True)
 
-    # --- Generate All Hands (in a deterministic, sequential order) ---
+    # --- Generate All Hands and their suit-isomorphism classes ---
     print("Generating all unique PLO starting hands...")
-    deck = Deck()
-    all_card_strs = [Card.int_to_str(c) for c in deck.cards]
-    all_plo_hands = list(itertools.combinations(all_card_strs, 4))
-    total_hands_count = len(all_plo_hands)
-    print(f"Generated {total_hands_count:,} unique hands.")
-
-    # --- Efficient Resume Logic ---
-    start_index = 0
-    if os.path.exists(RESUME_FILE):
-        try:
-            with open(RESUME_FILE, 'r') as f:
-                resume_data = json.load(f)
-                # Get the index of the last successfully processed hand
-                start_index = resume_data.get('last_processed_index', -1) + 1
-        except (json.JSONDecodeError, FileNotFoundError):
-            print("Warning: resume_info.json is corrupted or unreadable. Starting from scratch.")
-            start_index = 0
-
-    if start_index > 0:
-        print(f"Resuming simulation from hand index {start_index:,}.")
-
-    # Slice the list to get only the hands that need to be simulated
-    hands_to_simulate = all_plo_hands[start_index:]
-    num_to_simulate = len(hands_to_simulate)
-
-    if num_to_simulate == 0:
+    hands = all_plo_hands()
+    representatives, weights, class_of_hand = group_isomorphic_hands(hands)
+    print(f"Generated {len(hands):,} unique hands in {len(representatives):,} suit-isomorphic classes.")
+
+    conn = open_store(STORE_FILE)
+    populate_hands(conn, ("".join(card_to_str(c) for c in hand) for hand in hands), class_of_hand)
+
+    # --- Per-shard Resume Logic ---
+    shards = make_shards(representatives, SHARD_SIZE)
+    done = completed_shards(conn)
+    pending = [shard for shard in shards if shard[0] not in done]
+    if done:
+        print(f"Resuming: {len(done):,} of {len(shards):,} shards already stored.")
+
+    if not pending:
         print("All hands have already been simulated.")
     else:
-        print(f"Starting simulation for {num_to_simulate:,} remaining hands.")
         num_cores = cpu_count()
-        print(f"Using {num_cores} cores, simulating {ITERATIONS_PER_HAND:,} iterations per hand.")
+        print(f"Simulating {len(pending):,} shards on {num_cores} cores, "
+              f"{ITERATIONS_PER_HAND:,} iterations per class.")
 
-        results_chunk = []
-        
-        # Use Pool to parallelize the simulations
-        # Using imap (instead of imap_unordered) to get results in the same order as input
+        # chunksize=1 lets idle workers pull the next shard as soon as they finish
         with Pool(processes=num_cores) as pool:
-            with tqdm(total=num_to_simulate, desc="Simulating Hand Equities") as pbar:
-                # The 'chunksize' argument can improve performance for large iterables
-                for i, result in enumerate(pool.imap(simulate_hand_equity, hands_to_simulate, chunksize=10)):
-                    results_chunk.append(result)
-                    pbar.update()
-
-                    # When the chunk is full, save it and update the resume file
-                    if len(results_chunk) >= CHUNK_SIZE:
-                        current_absolute_index = start_index + i
-                        chunk_start_index = current_absolute_index - CHUNK_SIZE + 1
-                        
-                        # Save the chunk of results
-                        chunk_file_name = f"hands_{chunk_start_index:06d}_to_{current_absolute_index:06d}.json"
-                        with open(os.path.join(STATS_DIR, chunk_file_name), 'w') as f:
-                            json.dump(results_chunk, f)
-                        
-                        # Update the resume file with the last processed index
-                        with open(RESUME_FILE, 'w') as f:
-                            json.dump({'last_processed_index': current_absolute_index}, f)
-                        
-                        results_chunk = [] # Reset for the next chunk
-
-                # Save any remaining results in the last partial chunk
-                if results_chunk:
-                    last_absolute_index = start_index + num_to_simulate - 1
-                    chunk_start_index = last_absolute_index - len(results_chunk) + 1
-                    
-                    chunk_file_name = f"hands_{chunk_start_index:06d}_to_{last_absolute_index:06d}.json"
-                    with open(os.path.join(STATS_DIR, chunk_file_name), 'w') as f:
-                        json.dump(results_chunk, f)
-                    
-                    with open(RESUME_FILE, 'w') as f:
-                        json.dump({'last_processed_index': last_absolute_index}, f)
-
-    # --- Combine all results into a single file ---
-    print("\nCombining all saved statistics...")
-    all_results = []
-    # Sort filenames to ensure they are read in order
-    for filename in sorted(os.listdir(STATS_DIR)):
-        if filename.endswith('.json') and filename.startswith('hands_'):
-            filepath = os.path.join(STATS_DIR, filename)
-            with open(filepath, 'r') as f:
-                try:
-                    all_results.extend(json.load(f))
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse {filename}. It might be corrupted.")
-
+            with tqdm(total=sum(len(tasks) for _, tasks in pending), desc="Simulating Hand Equities") as pbar:
+                for shard_id, results in pool.imap_unordered(simulate_shard, pending, chunksize=1):
+                    record_shard(conn, shard_id, results)
+                    pbar.update(len(results))
+
+    # --- Merge the store into a single file ---
+    print("\nMerging stored statistics...")
+    all_results = export_json(conn, FINAL_OUTPUT_FILE)
+    conn.close()
     if not all_results:
         print("No results found to combine.")
         return
 
-    print(f"Loaded {len(all_results):,} total hand equities.")
-    
-    # Sort final results by win_pct for easier analysis
-    all_results.sort(key=lambda x: x['win_pct'], reverse=True)
-
-    # Save the final combined and sorted file
-    with open(FINAL_OUTPUT_FILE, 'w') as f:
-        json.dump(all_results, f, indent=2)
-
-    print(f"Successfully saved combined equities to {FINAL_OUTPUT_FILE}")
+    print(f"Successfully saved {len(all_results):,} hand equities to {FINAL_OUTPUT_FILE}")
     print("\n--- Top 5 Hands ---")
     for i in range(min(5, len(all_results))):
         hand_data = all_results[i]
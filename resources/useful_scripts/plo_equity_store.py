@@ -0,0 +1,147 @@
+"""
+SQLite store for the offline PLO equity simulations.
+
+The store holds three tables:
+    hands        one row per starting hand (hand_id, hand string, class_id)
+    class_equity one row per simulated suit-isomorphism class (raw win/tie/loss counts)
+    shards       one row per completed shard, written in the same transaction as its results
+
+Rows are only ever inserted, so an interrupted run leaves every finished shard intact
+and resuming just skips the shard ids already recorded.
+"""
+
+import json
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hands (
+    hand_id INTEGER PRIMARY KEY,
+    hand TEXT NOT NULL UNIQUE,
+    class_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_hands_class_id ON hands (class_id);
+CREATE TABLE IF NOT EXISTS class_equity (
+    class_id INTEGER PRIMARY KEY,
+    shard_id INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    ties INTEGER NOT NULL,
+    losses INTEGER NOT NULL,
+    iterations INTEGER NOT NULL,
+    seed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id INTEGER PRIMARY KEY,
+    completed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+_EQUITY_SELECT = """
+SELECT h.hand_id, h.hand, h.class_id, e.wins, e.ties, e.losses, e.iterations, e.seed
+FROM hands h JOIN class_equity e ON e.class_id = h.class_id
+"""
+
+
+def open_store(path):
+    """Opens (creating if needed) the equity store at path."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def populate_hands(conn, hand_strings, class_of_hand):
+    """
+    Writes the hand -> class mapping once. hand_id is the position in hand_strings.
+    Does nothing if the table is already populated.
+    """
+    if conn.execute("SELECT 1 FROM hands LIMIT 1").fetchone():
+        return
+    with conn:
+        conn.executemany(
+            "INSERT INTO hands (hand_id, hand, class_id) VALUES (?, ?, ?)",
+            ((i, hand, int(c)) for i, (hand, c) in enumerate(zip(hand_strings, class_of_hand))),
+        )
+
+
+def completed_shards(conn):
+    """Returns the set of shard ids whose results are already stored."""
+    return {row[0] for row in conn.execute("SELECT shard_id FROM shards")}
+
+
+def record_shard(conn, shard_id, results):
+    """
+    Appends the results of one shard and marks it complete, atomically.
+
+    Args:
+        results: An iterable of dicts with class_id, wins, ties, losses, iterations and seed.
+    """
+    with conn:
+        conn.executemany(
+            "INSERT INTO class_equity (class_id, shard_id, wins, ties, losses, iterations, seed) "
+            "VALUES (:class_id, :shard_id, :wins, :ties, :losses, :iterations, :seed)",
+            ({**r, "shard_id": shard_id} for r in results),
+        )
+        conn.execute("INSERT INTO shards (shard_id) VALUES (?)", (shard_id,))
+
+
+def _to_record(row):
+    iterations = row["iterations"]
+    return {
+        "hand_id": row["hand_id"],
+        "hand": row["hand"],
+        "class_id": row["class_id"],
+        "wins": row["wins"],
+        "ties": row["ties"],
+        "losses": row["losses"],
+        "iterations": iterations,
+        "seed": row["seed"],
+        "win_pct": row["wins"] / iterations * 100,
+        "split_pct": row["ties"] / iterations * 100,
+        "loss_pct": row["losses"] / iterations * 100,
+    }
+
+
+def get_hand_equity(conn, hand):
+    """
+    Looks up the stored equity of one hand.
+
+    Args:
+        hand: Either a hand_id (int) or a hand string in stored card order (e.g. '2s2hAdAc').
+
+    Returns:
+        A record dict, or None if the hand's class has not been simulated yet.
+    """
+    column = "h.hand_id" if isinstance(hand, int) else "h.hand"
+    row = conn.execute(f"{_EQUITY_SELECT} WHERE {column} = ?", (hand,)).fetchone()
+    return _to_record(row) if row else None
+
+
+def sample_hand_equities(conn, k):
+    """Returns up to k random simulated hands as record dicts."""
+    rows = conn.execute(f"{_EQUITY_SELECT} ORDER BY RANDOM() LIMIT ?", (k,))
+    return [_to_record(row) for row in rows]
+
+
+def iter_hand_equities(conn):
+    """Yields a record for every simulated hand, in hand_id order."""
+    for row in conn.execute(f"{_EQUITY_SELECT} ORDER BY h.hand_id"):
+        yield _to_record(row)
+
+
+def export_json(conn, output_file):
+    """
+    Merges the store into the plo_hand_equity.json format used by the app
+    (a list of {hand, win_pct, split_pct, loss_pct}, sorted by win_pct).
+
+    Returns:
+        The exported list.
+    """
+    results = [
+        {key: record[key] for key in ("hand", "win_pct", "split_pct", "loss_pct")}
+        for record in iter_hand_equities(conn)
+    ]
+    results.sort(key=lambda x: x["win_pct"], reverse=True)
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=2)
+    return results
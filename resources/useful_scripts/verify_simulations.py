@@ -1,110 +1,278 @@
+"""
+Statistical verification of the stored PLO equity simulations.
+
+Samples hands from the equity store, re-simulates each one with the batched
+evaluator and compares the fresh win/tie/loss counts against the stored counts
+with a chi-square test of homogeneity. Every hand is checked sequentially in
+batches: it fails as soon as the difference is significant, and passes as soon
+as the confidence intervals for the win % and split % differences both fit
+inside the tolerance. The first batch of every hand (a fixed sample size) is
+also pooled into one chi-square statistic, giving a p-value for the dataset.
+"""
+
+import argparse
+import math
 import os
-import json
-import random
 import sys
+import time
+from functools import partial
+from multiprocessing import Pool, cpu_count
+from statistics import NormalDist
 
-# Add project root to path to allow importing the simulation function
+# Add the script's directory to path to allow importing the simulation modules next to it
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
+import numpy as np
+
 try:
-    from monte_carlo_plo_hand_eval import simulate_hand_equity, ITERATIONS_PER_HAND
+    from monte_carlo_plo_hand_eval import ITERATIONS_PER_HAND
+    from plo_batch_eval import card_from_str, simulate_equity_batched
+    from plo_equity_store import open_store, sample_hand_equities
 except ImportError as e:
-    print(f"Error: Could not import the simulation function. Make sure this script is in the project root.")
+    print(f"Error: Could not import {e.name or 'a simulation module'}. Make sure this script is next to "
+          f"monte_carlo_plo_hand_eval.py, plo_batch_eval.py and plo_equity_store.py.")
     print(f"Details: {e}")
     sys.exit(1)
 
-from treys import Card
-
-STATS_DIR = os.path.join(project_root, 'plo_hand_stats')
+STORE_FILE = 'plo_hand_stats.sqlite'
 TOLERANCE = 1.0  # Allowable margin of error in percent
+ALPHA = 0.01  # Family-wise false-failure rate for the whole verification run
+CONFIDENCE = 0.95  # Confidence level of the intervals used to pass a hand early
+BATCH_SIZE = 10000  # Trials simulated between sequential checks
+VERIFY_SEED = 7  # Mixed with each hand_id so re-runs are reproducible
 
-def get_random_hand_record():
-    """Finds data files, and picks a random one and a random hand from it."""
-    if not os.path.isdir(STATS_DIR):
-        print(f"Error: Statistics directory not found: {STATS_DIR}")
-        return None
 
-    json_files = [f for f in os.listdir(STATS_DIR) if f.startswith('hands_') and f.endswith('.json')]
-    if not json_files:
-        print("Error: No hand data files found in the stats directory.")
-        return None
+def chi2_sf(x, df):
+    """
+    Survival function of the chi-square distribution, P(X >= x) for X ~ chi2(df).
+    Computed as the regularized upper incomplete gamma function Q(df/2, x/2).
+    """
+    if x <= 0:
+        return 1.0
+    a, x = df / 2, x / 2
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower incomplete gamma function
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - math.exp(log_prefix) * total)
+    # Continued fraction for the upper incomplete gamma function (Lentz's method)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
 
-    random_file = random.choice(json_files)
-    file_path = os.path.join(STATS_DIR, random_file)
-    try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return random.choice(data)
-    except (IOError, json.JSONDecodeError, IndexError) as e:
-        print(f"Error reading or parsing {random_file}: {e}")
-        return None
-
-def run_verification():
+
+def homogeneity_test(stored_counts, new_counts):
     """
-    Selects one random hand, re-runs the simulation, and verifies the results.
-    Returns True on success, False on failure.
+    Chi-square test that two (wins, ties, losses) samples come from the same distribution.
+    Outcomes that never occurred in either sample are dropped from the table.
+    Returns:
+        tuple: (statistic, degrees of freedom, p-value).
     """
-    stored_record = get_random_hand_record()
-    if not stored_record:
-        return False # Stop if we couldn't get a record
+    columns = [(s, n) for s, n in zip(stored_counts, new_counts) if s + n > 0]
+    stored_total = sum(s for s, _ in columns)
+    new_total = sum(n for _, n in columns)
+    grand_total = stored_total + new_total
+    df = len(columns) - 1
+    if df == 0 or stored_total == 0 or new_total == 0:
+        return 0.0, max(df, 1), 1.0
 
-    hand_str = stored_record['hand']
-    stored_win_pct = stored_record['win_pct']
-    stored_split_pct = stored_record['split_pct']
+    statistic = 0.0
+    for s, n in columns:
+        col_total = s + n
+        for observed, row_total in ((s, stored_total), (n, new_total)):
+            expected = row_total * col_total / grand_total
+            statistic += (observed - expected) ** 2 / expected
+    return statistic, df, chi2_sf(statistic, df)
 
-    print(f"--- Verifying Hand: {hand_str} ---")
-    print(f"Stored Win %: {stored_win_pct:.2f}, Stored Split %: {stored_split_pct:.2f}")
-    print(f"Running new simulation with {ITERATIONS_PER_HAND:,} iterations...")
 
-    hero_hand_tuple = tuple(sorted([hand_str[i:i+2] for i in range(0, len(hand_str), 2)], key=Card.new))
+def difference_intervals(stored_counts, new_counts, z):
+    """
+    Normal-approximation intervals for (new - stored) win % and split %.
+    Returns:
+        list: [(low, high) for win %, (low, high) for split %], in percentage points.
+    """
+    stored_total, new_total = sum(stored_counts), sum(new_counts)
+    intervals = []
+    for outcome in (0, 1):
+        p_stored = stored_counts[outcome] / stored_total
+        p_new = new_counts[outcome] / new_total
+        se = math.sqrt(p_stored * (1 - p_stored) / stored_total + p_new * (1 - p_new) / new_total)
+        diff = p_new - p_stored
+        intervals.append(((diff - z * se) * 100, (diff + z * se) * 100))
+    return intervals
+
+
+def verify_hand(record, alpha=ALPHA, tolerance=TOLERANCE, confidence=CONFIDENCE,
+                batch_size=BATCH_SIZE, max_iterations=ITERATIONS_PER_HAND, seed=VERIFY_SEED):
+    """
+    Sequentially re-simulates one stored hand. Designed to be used with multiprocessing.Pool.
+
+    Each batch is a "look" at the data. The significance threshold and the interval
+    width are Bonferroni-corrected for the number of looks, so stopping early does not
+    inflate the error rates.
+
+    Args:
+        record (dict): A store record with hand, hand_id, wins, ties and losses.
+        alpha (float): Significance level for failing this hand.
+    Returns:
+        dict: The hand, status ('pass' or 'fail'), p-value, iterations used and the
+        first-batch chi-square statistic and degrees of freedom.
+    """
+    hand = [card_from_str(record['hand'][i:i + 2]) for i in range(0, 8, 2)]
+    stored = (record['wins'], record['ties'], record['losses'])
+    rng = np.random.default_rng([seed, record['hand_id']])
 
-    new_results = simulate_hand_equity(hero_hand_tuple)
-    new_win_pct = new_results['win_pct']
-    new_split_pct = new_results['split_pct']
+    looks = math.ceil(max_iterations / batch_size)
+    alpha_look = alpha / looks
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / (2 * looks))
 
-    print(f"New Win %: {new_win_pct:.2f}, New Split %: {new_split_pct:.2f}")
+    counts = np.zeros(3, dtype=np.int64)
+    first_batch = None
+    status = 'pass'
+    p_value = 1.0
+    while counts.sum() < max_iterations:
+        counts += simulate_equity_batched(hand, min(batch_size, max_iterations - int(counts.sum())), rng=rng)
+        statistic, df, p_value = homogeneity_test(stored, counts.tolist())
+        if first_batch is None:
+            first_batch = (statistic, df)
+        if p_value < alpha_look:
+            status = 'fail'
+            break
+        if all(-tolerance <= low and high <= tolerance
+               for low, high in difference_intervals(stored, counts.tolist(), z)):
+            break
 
-    win_diff = abs(new_win_pct - stored_win_pct)
-    split_diff = abs(new_split_pct - stored_split_pct)
+    iterations = int(counts.sum())
+    return {
+        'hand': record['hand'],
+        'status': status,
+        'p_value': p_value,
+        'iterations': iterations,
+        'stored_win_pct': record['win_pct'],
+        'new_win_pct': counts[0] / iterations * 100,
+        'stored_split_pct': record['split_pct'],
+        'new_split_pct': counts[1] / iterations * 100,
+        'first_batch_statistic': first_batch[0],
+        'first_batch_df': first_batch[1],
+    }
 
-    if win_diff <= TOLERANCE and split_diff <= TOLERANCE:
-        print(f"\n✅ PASSED: Results are within the {TOLERANCE}% tolerance.\n")
-        return True
+
+def verify_dataset(records, alpha=ALPHA, workers=None, **kwargs):
+    """
+    Verifies many stored hands in parallel and summarises the run.
+
+    Only one hand per suit-isomorphism class is kept, since hands of a class share
+    their stored counts. Per-hand failures are judged at alpha / number of hands, so
+    the chance of any false failure in the run is at most alpha.
+
+    Returns:
+        dict: The per-hand results plus the summary and dataset p-value.
+    """
+    by_class = {}
+    for record in records:
+        by_class.setdefault(record['class_id'], record)
+    records = list(by_class.values())
+    if not records:
+        raise ValueError("No records to verify.")
+
+    started = time.time()
+    check = partial(verify_hand, alpha=alpha / len(records), **kwargs)
+    workers = workers or cpu_count()
+    if workers > 1:
+        with Pool(processes=workers) as pool:
+            results = list(pool.imap_unordered(check, records))
     else:
-        print(f"\n❌ FAILED: Deviation is too high.")
-        if win_diff > TOLERANCE:
-            print(f"   - Win % deviation: {win_diff:.2f}%")
-        if split_diff > TOLERANCE:
-            print(f"   - Split % deviation: {split_diff:.2f}%")
-        print("")
-        return False
+        results = [check(record) for record in records]
+
+    statistic = sum(r['first_batch_statistic'] for r in results)
+    df = sum(r['first_batch_df'] for r in results)
+    dataset_p_value = chi2_sf(statistic, df)
+    failed = [r for r in results if r['status'] == 'fail']
+    return {
+        'passed': not failed and dataset_p_value >= alpha,
+        'hands': len(results),
+        'failed_hands': failed,
+        'dataset_statistic': statistic,
+        'dataset_df': df,
+        'dataset_p_value': dataset_p_value,
+        'total_iterations': sum(r['iterations'] for r in results),
+        'elapsed_seconds': time.time() - started,
+        'results': results,
+    }
+
+
+def print_report(report):
+    """Prints a human-readable pass/fail summary of a verification run."""
+    print("--- Summary ---")
+    print(f"Hands verified: {report['hands']:,}")
+    print(f"Trials simulated: {report['total_iterations']:,} "
+          f"(avg {report['total_iterations'] / report['hands']:,.0f} per hand)")
+    print(f"Dataset chi-square: {report['dataset_statistic']:.1f} on {report['dataset_df']} df, "
+          f"p = {report['dataset_p_value']:.4f}")
+    print(f"Elapsed: {report['elapsed_seconds']:.1f}s")
+    for result in report['failed_hands']:
+        print(f"   - {result['hand']}: stored win {result['stored_win_pct']:.2f}% vs new "
+              f"{result['new_win_pct']:.2f}%, stored split {result['stored_split_pct']:.2f}% vs new "
+              f"{result['new_split_pct']:.2f}% (p = {result['p_value']:.2e})")
+    if report['passed']:
+        print("\n✅ PASSED: Stored equities are consistent with fresh simulations.\n")
+    else:
+        print(f"\n❌ FAILED: {len(report['failed_hands'])} hand(s) deviate significantly.\n")
+
 
 def main():
-    """Main function to prompt the user and run the verifications."""
-    while True:
-        try:
-            num_str = input(f"How many random hands would you like to test? [Default: 1]: ")
-            if not num_str:
-                num_to_run = 1
-                break
-            num_to_run = int(num_str)
-            if num_to_run > 0:
-                break
-            else:
-                print("Please enter a positive number.")
-        except ValueError:
-            print("Invalid input. Please enter a number.")
-
-    print(f"\nStarting verification for {num_to_run} random hand(s)...\n")
-    success_count = 0
-    for i in range(num_to_run):
-        print(f"--- Test Run {i + 1} of {num_to_run} ---")
-        if run_verification():
-            success_count += 1
-
-    print(f"--- Summary ---")
-    print(f"Completed {num_to_run} tests. Passed: {success_count}, Failed: {num_to_run - success_count}.")
+    """Parses arguments, samples stored hands and runs the verification."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hands', type=int, default=500, help="Number of random stored hands to verify.")
+    parser.add_argument('--store', default=STORE_FILE, help="Path to the equity store.")
+    parser.add_argument('--alpha', type=float, default=ALPHA, help="Family-wise false-failure rate.")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="Equivalence margin in percent.")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Trials between sequential checks.")
+    parser.add_argument('--max-iterations', type=int, default=ITERATIONS_PER_HAND, help="Trial cap per hand.")
+    parser.add_argument('--workers', type=int, default=cpu_count(), help="Worker processes.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        print(f"Error: Equity store not found: {args.store}")
+        sys.exit(1)
+
+    conn = open_store(args.store)
+    try:
+        records = sample_hand_equities(conn, args.hands)
+    finally:
+        conn.close()
+    if not records:
+        print("Error: No simulated hands found in the equity store.")
+        sys.exit(1)
+
+    print(f"\nStarting verification for {len(records)} random hand(s)...\n")
+    report = verify_dataset(
+        records, alpha=args.alpha, workers=args.workers, tolerance=args.tolerance,
+        batch_size=args.batch_size, max_iterations=args.max_iterations,
+    )
+    print_report(report)
+    sys.exit(0 if report['passed'] else 1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+"""
+Compares the SimpleCache and SQLiteCache backends.
+
+For each backend it times get, get_many, set and inc on values shaped like the
+cached bankroll breakdown, then runs several worker processes that each read a
+key after another worker has changed it, counting how many reads were stale.
+
+Usage:
+    python scripts/benchmark_cache.py [--ops 20000] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+# Add the 'src' directory to the Python path to allow importing 'total_bankroll'
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+src_path = os.path.join(project_root, 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from flask_caching.backends import SimpleCache
+
+from total_bankroll.sqlite_cache import SQLiteCache
+
+BREAKDOWN = {
+    'total_bankroll': Decimal('12345.67'),
+    'total_profit': Decimal('2345.67'),
+    'total_deposits': Decimal('15000.00'),
+    'total_withdrawals': Decimal('5000.00'),
+    'current_poker_total': Decimal('9000.00'),
+    'current_asset_total': Decimal('3345.67'),
+    'sites': [{'name': f'Site {i}', 'amount': Decimal(i * 100)} for i in range(10)],
+}
+
+
+def make_cache(backend, path):
+    if backend == 'SimpleCache':
+        return SimpleCache(threshold=1000)
+    return SQLiteCache(path, threshold=1000)
+
+
+def time_operations(cache, ops):
+    """Returns microseconds per call of each operation."""
+    keys = [f'bankroll_breakdown_{i % 500}' for i in range(ops)]
+    timings = {}
+
+    start = time.perf_counter()
+    for key in keys:
+        cache.set(key, BREAKDOWN)
+    timings['set'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    timings['get'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for position in range(0, ops, 10):
+        cache.get_many(*keys[position:position + 10])
+    timings['get_many(10)'] = (time.perf_counter() - start) * 10
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        cache.inc('cache_generation_user_1')
+    timings['inc'] = time.perf_counter() - start
+
+    return {name: seconds / ops * 1e6 for name, seconds in timings.items()}
+
+
+def worker(backend, path, worker_id, workers, rounds, barrier, results):
+    """Each round one worker writes a new value; every worker then reads it back."""
+    cache = make_cache(backend, path)
+    stale = 0
+    for round_number in range(rounds):
+        if round_number % workers == worker_id:
+            cache.set('bankroll_breakdown_1', round_number)
+        barrier.wait()
+        if cache.get('bankroll_breakdown_1') != round_number:
+            stale += 1
+        barrier.wait()
+    results.put(stale)
+
+
+def count_stale_reads(backend, path, workers, rounds):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(backend, path, worker_id, workers, rounds, barrier, results))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    stale = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return stale, workers * rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=20000, help='calls per operation')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes in the staleness test')
+    parser.add_argument('--rounds', type=int, default=200, help='writes in the staleness test')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'backend':<12} {'set':>9} {'get':>9} {'get_many(10)':>13} {'inc':>9}  stale reads")
+        for backend in ('SimpleCache', 'SQLiteCache'):
+            path = os.path.join(directory, f'{backend}.sqlite3')
+            timings = time_operations(make_cache(backend, path), args.ops)
+            stale, reads = count_stale_reads(backend, path, args.workers, args.rounds)
+            print(f"{backend:<12} {timings['set']:>7.1f}us {timings['get']:>7.1f}us "
+                  f"{timings['get_many(10)']:>11.1f}us {timings['inc']:>7.1f}us  {stale}/{reads}")
+
+
+if __name__ == "__main__":
+    main()
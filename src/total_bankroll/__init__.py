@@ -31,9 +31,14 @@ def create_app(config_name=None):
     logger.debug(f"SQLALCHEMY_DATABASE_URI={app.config.get('SQLALCHEMY_DATABASE_URI')}")
     
     # Initialize extensions
+    if app.config.get('CACHE_TYPE') == 'SQLiteCache':
+        # Flask-Caching imports backends outside its own package by dotted path
+        app.config['CACHE_TYPE'] = f'{__name__}.sqlite_cache.SQLiteCache'
     db.init_app(app)
     bcrypt.init_app(app)
     cache.init_app(app)
+    from . import cache_metrics
+    cache_metrics.init_app(app)
     limiter.init_app(app)
     mail.init_app(app)
     principal.init_app(app)
@@ -99,10 +104,10 @@ def create_app(config_name=None):
     # Register blueprints
     from .routes import (
         home_bp, about_bp, help_bp, legal_bp, auth_bp, settings_bp,
-        poker_sites_bp, assets_bp, deposit_bp, withdrawal_bp,
+        poker_sites_bp, assets_bp, balances_bp, deposit_bp, withdrawal_bp,
         add_deposit_bp, add_withdrawal_bp, charts_bp, goals_bp,
         achievements_bp, articles_bp, tools_bp, hand_eval_bp, common_bp,
-        import_db_bp
+        import_db_bp, admin_bp
     )
     app.register_blueprint(home_bp)
     app.register_blueprint(about_bp)
@@ -112,6 +117,7 @@ def create_app(config_name=None):
     app.register_blueprint(settings_bp)
     app.register_blueprint(poker_sites_bp)
     app.register_blueprint(assets_bp)
+    app.register_blueprint(balances_bp)
     app.register_blueprint(deposit_bp)
     app.register_blueprint(withdrawal_bp)
     app.register_blueprint(add_deposit_bp)
@@ -124,6 +130,15 @@ def create_app(config_name=None):
     app.register_blueprint(hand_eval_bp)
     app.register_blueprint(common_bp)
     app.register_blueprint(import_db_bp)
+    app.register_blueprint(admin_bp)
+
+    # Service results memoized per request (see request_memo)
+    from . import request_memo
+    request_memo.init_app(app)
+
+    # CLI commands (update_rates, invalidate-cache)
+    from .commands import register_commands
+    register_commands(app)
 
     # Initialize Vite asset helper
     init_vite_asset_helper(app)
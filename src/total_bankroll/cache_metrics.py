@@ -0,0 +1,232 @@
+"""
+Hit rates, value sizes and latency of the cache, per key namespace.
+
+init_app wraps the backend behind extensions.cache in a MeteredBackend, so every
+cache call (direct cache.get/set, cache_scopes, cache_refresh) is counted under
+the namespace of its key:
+    bankroll_total_1_EUR@<generations>        -> bankroll_total
+    currency_convert_USD_EUR_100@<...>        -> currency_convert
+    view/articles.index//strategy/...@<...>   -> view/articles.index
+that is, the leading lowercase words of the key, or the endpoint of a view key.
+
+For each namespace it records gets with their hits and misses, sets, deletes, the
+average and maximum get and set latency, and the average pickled size of the
+values set (measured on every SIZE_SAMPLE_EVERY-th set, since it serializes the
+value a second time). The counters belong to the worker process; they are served
+as JSON by the admin cache metrics endpoint (routes/admin.py) and logged every
+CACHE_METRICS_LOG_INTERVAL seconds.
+"""
+
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, UTC
+
+from .extensions import cache
+
+logger = logging.getLogger(__name__)
+
+SIZE_SAMPLE_EVERY = 10
+
+# Leading lowercase words of a key: the namespace of 'currency_convert_USD_EUR_1' is 'currency_convert'
+NAMESPACE_PATTERN = re.compile(r'[a-z]+(?:_[a-z]+)*(?=_|@|$)')
+
+
+def key_namespace(key):
+    """Namespace of a cache key, e.g. 'bankroll_total' for 'bankroll_total_1@...'."""
+    key = key.split('@', 1)[0]
+    if key.startswith('view/'):
+        return '/'.join(key.split('/', 2)[:2])
+    match = NAMESPACE_PATTERN.match(key)
+    return match.group(0) if match else 'other'
+
+
+class NamespaceStats:
+    """Counters of one namespace."""
+
+    __slots__ = ('hits', 'misses', 'get_seconds', 'get_max', 'sets', 'set_seconds', 'set_max',
+                 'sized_sets', 'set_bytes', 'deletes')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self):
+        gets = self.hits + self.misses
+        return {
+            'gets': gets,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / gets, 4) if gets else None,
+            'get_ms_avg': round(self.get_seconds / gets * 1000, 3) if gets else None,
+            'get_ms_max': round(self.get_max * 1000, 3),
+            'sets': self.sets,
+            'set_ms_avg': round(self.set_seconds / self.sets * 1000, 3) if self.sets else None,
+            'set_ms_max': round(self.set_max * 1000, 3),
+            'set_bytes_avg': round(self.set_bytes / self.sized_sets) if self.sized_sets else None,
+            'deletes': self.deletes,
+        }
+
+
+class CacheMetrics:
+    """Thread-safe per-namespace counters of one worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = defaultdict(NamespaceStats)
+            self.since = datetime.now(UTC)
+
+    def wants_size(self, namespace):
+        """Whether the next set in namespace should have its value size measured."""
+        stats = self._stats.get(namespace)
+        return stats is None or stats.sets % SIZE_SAMPLE_EVERY == 0
+
+    def record_gets(self, keys, values, seconds):
+        share = seconds / len(keys)
+        with self._lock:
+            for key, value in zip(keys, values):
+                stats = self._stats[key_namespace(key)]
+                if value is None:
+                    stats.misses += 1
+                else:
+                    stats.hits += 1
+                stats.get_seconds += share
+                stats.get_max = max(stats.get_max, share)
+
+    def record_sets(self, keys, seconds, sizes=None):
+        share = seconds / len(keys)
+        with self._lock:
+            for position, key in enumerate(keys):
+                stats = self._stats[key_namespace(key)]
+                stats.sets += 1
+                stats.set_seconds += share
+                stats.set_max = max(stats.set_max, share)
+                if sizes and sizes[position] is not None:
+                    stats.sized_sets += 1
+                    stats.set_bytes += sizes[position]
+
+    def record_deletes(self, keys):
+        with self._lock:
+            for key in keys:
+                self._stats[key_namespace(key)].deletes += 1
+
+    def snapshot(self):
+        """JSON-ready counters: {'pid', 'since', 'namespaces': {namespace: {...}}}."""
+        with self._lock:
+            namespaces = {namespace: stats.as_dict() for namespace, stats in sorted(self._stats.items())}
+        return {'pid': os.getpid(), 'since': self.since.isoformat(), 'namespaces': namespaces}
+
+    def log(self):
+        """Logs one line per namespace."""
+        for namespace, stats in self.snapshot()['namespaces'].items():
+            logger.info(
+                f"Cache {namespace}: {stats['hits']}/{stats['gets']} hits, "
+                f"get {stats['get_ms_avg']} ms avg {stats['get_ms_max']} ms max, "
+                f"{stats['sets']} sets of {stats['set_bytes_avg']} bytes avg, "
+                f"set {stats['set_ms_avg']} ms avg {stats['set_ms_max']} ms max"
+            )
+
+
+metrics = CacheMetrics()
+
+
+def _size(value):
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+class MeteredBackend:
+    """Cache backend proxy recording every call in metrics; other attributes are passed through."""
+
+    def __init__(self, backend, metrics, log_interval=0):
+        self._backend = backend
+        self._metrics = metrics
+        self._log_interval = log_interval
+        self._last_log = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def _maybe_log(self):
+        if self._log_interval and time.monotonic() - self._last_log >= self._log_interval:
+            self._last_log = time.monotonic()
+            self._metrics.log()
+
+    def _sizes(self, mapping):
+        return [_size(value) if self._metrics.wants_size(key_namespace(key)) else None
+                for key, value in mapping.items()]
+
+    def get(self, key):
+        start = time.perf_counter()
+        value = self._backend.get(key)
+        self._metrics.record_gets([key], [value], time.perf_counter() - start)
+        self._maybe_log()
+        return value
+
+    def get_many(self, *keys):
+        start = time.perf_counter()
+        values = self._backend.get_many(*keys)
+        if keys:
+            self._metrics.record_gets(keys, values, time.perf_counter() - start)
+        return values
+
+    def set(self, key, value, timeout=None):
+        sizes = self._sizes({key: value})
+        start = time.perf_counter()
+        result = self._backend.set(key, value, timeout)
+        self._metrics.record_sets([key], time.perf_counter() - start, sizes)
+        self._maybe_log()
+        return result
+
+    def set_many(self, mapping, timeout=None):
+        sizes = self._sizes(mapping)
+        start = time.perf_counter()
+        result = self._backend.set_many(mapping, timeout)
+        if mapping:
+            self._metrics.record_sets(list(mapping), time.perf_counter() - start, sizes)
+        return result
+
+    def add(self, key, value, timeout=None):
+        start = time.perf_counter()
+        result = self._backend.add(key, value, timeout)
+        self._metrics.record_sets([key], time.perf_counter() - start)
+        return result
+
+    def inc(self, key, delta=1):
+        start = time.perf_counter()
+        result = self._backend.inc(key, delta)
+        self._metrics.record_sets([key], time.perf_counter() - start)
+        return result
+
+    def dec(self, key, delta=1):
+        start = time.perf_counter()
+        result = self._backend.dec(key, delta)
+        self._metrics.record_sets([key], time.perf_counter() - start)
+        return result
+
+    def delete(self, key):
+        self._metrics.record_deletes([key])
+        return self._backend.delete(key)
+
+    def delete_many(self, *keys):
+        self._metrics.record_deletes(keys)
+        return self._backend.delete_many(*keys)
+
+
+def init_app(app):
+    """Wraps the backend of extensions.cache, unless CACHE_METRICS is off."""
+    if not app.config.get('CACHE_METRICS', True):
+        return
+    app.extensions['cache'][cache] = MeteredBackend(
+        app.extensions['cache'][cache], metrics, app.config.get('CACHE_METRICS_LOG_INTERVAL', 0)
+    )
@@ -0,0 +1,156 @@
+"""
+Single-flight computation and stale-while-revalidate for expensive cached values.
+
+With plain cache.get/cache.set, every worker that misses a key computes the value
+itself: when a popular entry expires (an article listing, a user's bankroll
+breakdown right after they changed a balance) all concurrent requests run the
+same queries at once. get_or_compute() instead lets one worker take a lock on
+the key and compute the value while the others wait for it to appear.
+
+Entries also have a soft TTL. Once it has passed, the entry is still served for
+up to max_stale seconds, while the first worker to notice starts recomputing it
+in a background thread; the others keep serving the stale value without
+waiting. Keys built with cache_scopes.scoped_key change when their scope is
+invalidated, and an invalidated value is a miss under its new key that is never
+served stale. So a stale entry is only ever an old computation of current data
+as long as every write to that data invalidates its scope: commits of a user's
+sites, assets, history, deposits and withdrawals bump the user scope (see
+on_bankroll_commit in models.py). With a per-process backend (SimpleCache) the
+bump only reaches the committing worker's cache.
+
+Policies are set per key namespace in CACHE_REFRESH_POLICIES (see config.py):
+    fresh: Seconds an entry is served without being recomputed
+    max_stale: Seconds after that during which it is served while being recomputed
+    lock_timeout: Seconds a worker may hold the lock, and others wait for its value
+
+The lock is a cache.add() of a separate key, which is atomic across workers with
+a shared backend (SQLiteCache, Redis) and per worker with SimpleCache.
+"""
+
+import functools
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, NamedTuple
+
+from flask import copy_current_request_context, current_app, has_request_context
+
+from .extensions import cache
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'cache_lock_{}'
+
+# Seconds between two checks for a value another worker is computing
+WAIT_INTERVAL = 0.05
+
+
+class RefreshPolicy(NamedTuple):
+    fresh: int = 300
+    max_stale: int = 0
+    lock_timeout: int = 10
+
+
+def get_policy(namespace: str) -> RefreshPolicy:
+    """Policy of namespace from CACHE_REFRESH_POLICIES; missing settings use the defaults."""
+    settings = current_app.config.get('CACHE_REFRESH_POLICIES', {}).get(namespace, {})
+    return RefreshPolicy(**settings)
+
+
+def _store(key, value, policy):
+    cache.set(key, (value, time.time() + policy.fresh), timeout=policy.fresh + policy.max_stale)
+    return value
+
+
+def _acquire(key, policy):
+    """Takes the lock on key; returns its token, or None if another worker holds it."""
+    token = uuid.uuid4().hex
+    return token if cache.add(LOCK_KEY.format(key), token, timeout=policy.lock_timeout) else None
+
+
+def _release(key, token):
+    lock_key = LOCK_KEY.format(key)
+    # A lock that timed out may have been taken by another worker since
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _in_background(function):
+    """Runs function in a daemon thread with a copy of the current request or app context."""
+    if has_request_context():
+        target = copy_current_request_context(function)
+    else:
+        app = current_app._get_current_object()
+
+        def target():
+            with app.app_context():
+                function()
+
+    threading.Thread(target=target, daemon=True).start()
+
+
+def _refresh(key, compute, policy, token):
+    try:
+        _store(key, compute(), policy)
+    except Exception:
+        logger.exception(f"Background refresh of {key} failed")
+    finally:
+        _release(key, token)
+
+
+def get_or_compute(namespace: str, key: str, compute: Callable[[], Any]) -> Any:
+    """
+    Returns the cached value of key, computing it with compute() at most once at a time.
+
+    Args:
+        namespace: Policy namespace, e.g. 'bankroll_breakdown'
+        key: Cache key
+        compute: Function returning the value; called in a background thread with a copy
+            of the request context when a stale value is refreshed
+
+    Example:
+        >>> get_or_compute('bankroll_breakdown', key, lambda: get_user_bankroll_data(user_id))
+    """
+    policy = get_policy(namespace)
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() >= fresh_until:
+            token = _acquire(key, policy)
+            if token:
+                _in_background(functools.partial(_refresh, key, compute, policy, token))
+        return value
+
+    token = _acquire(key, policy)
+    if token:
+        try:
+            return _store(key, compute(), policy)
+        finally:
+            _release(key, token)
+
+    # Another worker is computing the value: wait for it, but not past its lock
+    deadline = time.time() + policy.lock_timeout
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if not cache.has(LOCK_KEY.format(key)):
+            break
+    logger.warning(f"Computing {key} after waiting for another worker in vain")
+    return _store(key, compute(), policy)
+
+
+def cached_view(namespace: str, make_key: Callable[[], str]):
+    """
+    Decorator caching a view's response body with get_or_compute() under make_key().
+
+    Replaces Flask-Caching's @cache.cached for pages that are expensive to render.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(namespace, make_key(), lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
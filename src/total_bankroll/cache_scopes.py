@@ -0,0 +1,92 @@
+"""
+Generation-based invalidation of cached values.
+
+Cached values are stored under keys that embed the current generation of every
+scope they depend on: the global scope, and for example the user they belong to
+or the currencies they were converted with. Invalidating a scope is a single
+counter increment; keys built from the old generation are never read again and
+expire on their own. This works the same on every cache backend (SimpleCache,
+filesystem, Redis), none of which can delete keys by pattern, and replaces
+cache.clear(), which dropped every user's data and the cached article pages.
+
+Scopes:
+    GLOBAL_SCOPE: Every key built by scoped_key()
+    RATES_SCOPE: Values computed with the exchange rates (also the rates version, see rates.py)
+    user_scope(user_id): One user's data
+    currency_scope(code): Values involving one currency's rate
+
+With a per-process backend (SimpleCache) the generations live in each worker, so
+an invalidation only reaches the worker that made it; see shared_backend().
+"""
+
+import time
+
+from flask import current_app
+
+from .extensions import cache
+from .request_memo import clear_request_memo
+
+GLOBAL_SCOPE = 'global'
+RATES_SCOPE = 'rates'
+
+GENERATION_KEY = 'cache_generation_{}'
+
+# CACHE_TYPEs whose entries live inside each worker process
+PER_PROCESS_BACKENDS = {'SimpleCache', 'simple', 'flask_caching.backends.SimpleCache',
+                        'flask_caching.backends.simplecache.SimpleCache'}
+
+
+def user_scope(user_id):
+    return f'user_{user_id}'
+
+
+def currency_scope(code):
+    return f'currency_{code}'
+
+
+def generations(*scopes):
+    """Returns the current generation of each scope, starting missing ones from the clock."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(*keys)
+    for position, (key, value) in enumerate(zip(keys, values)):
+        if value is None:
+            # Start from a fresh value so an evicted counter never repeats an old generation
+            cache.add(key, time.time_ns(), timeout=0)
+            values[position] = cache.get(key)
+    return values
+
+
+def generation(scope):
+    """Returns the current generation of one scope."""
+    return generations(scope)[0]
+
+
+def shared_backend():
+    """Whether every worker sees the same cache, and so every invalidation (e.g. SQLiteCache, Redis)."""
+    return current_app.config.get('CACHE_TYPE', 'SimpleCache') not in PER_PROCESS_BACKENDS
+
+
+def invalidate(*scopes):
+    """
+    Starts a new generation of each scope, invalidating every key built in it.
+
+    Also drops the current request's memoized service results, which may have been
+    computed from the invalidated values.
+    """
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    current = cache.get_many(*keys)
+    cache.set_many({
+        key: (value or time.time_ns()) + 1 for key, value in zip(keys, current)
+    }, timeout=0)
+    clear_request_memo()
+
+
+def scoped_key(name, *scopes):
+    """
+    Cache key for name that changes whenever the global scope or any of scopes is invalidated.
+
+    Example:
+        >>> scoped_key('bankroll_total_1', user_scope(1), RATES_SCOPE)
+        'bankroll_total_1@1760871234000000000.1760871234000000007.1760871234000000002'
+    """
+    return f"{name}@{'.'.join(str(value) for value in generations(GLOBAL_SCOPE, *scopes))}"
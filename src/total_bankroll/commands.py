@@ -2,14 +2,30 @@ import click
 from flask.cli import with_appcontext
 import requests
 from datetime import date
-from .extensions import db
-from .models import Currency
+from .models import db, Currency
+from .rates import bump_rates_version
+from .cache_scopes import GLOBAL_SCOPE, currency_scope, invalidate, user_scope
 from flask import current_app
 
 
 def register_commands(app):
     """Register CLI commands with the Flask app."""
     app.cli.add_command(update_rates_command)
+    app.cli.add_command(invalidate_cache_command)
+
+
+@click.command(name='invalidate-cache')
+@click.option('--user', 'user_ids', type=int, multiple=True, help='Invalidate one user\'s cached data.')
+@click.option('--currency', 'codes', multiple=True, help='Invalidate values cached for a currency.')
+@with_appcontext
+def invalidate_cache_command(user_ids, codes):
+    """
+    Starts a new cache generation for the given users and currencies, or for
+    everything when neither is given.
+    """
+    scopes = [user_scope(user_id) for user_id in user_ids] + [currency_scope(code.upper()) for code in codes]
+    invalidate(*(scopes or [GLOBAL_SCOPE]))
+    click.echo(f"Invalidated {', '.join(scopes) if scopes else 'all cached data'}.")
 
 
 @click.command(name='update_rates')
@@ -61,6 +77,7 @@ def update_rates_command():
                 updated_count += 1
         
         db.session.commit()
+        bump_rates_version()
         message = f"Successfully updated {updated_count} exchange rates!"
         current_app.logger.info(message)
         click.echo(message)
@@ -43,11 +43,33 @@ class Config:
     # Cache Configuration
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))
+    # SimpleCache is per worker process; SQLiteCache is shared by all workers on the machine
+    # (stored in CACHE_DIR, default: the instance folder) and keeps CACHE_THRESHOLD entries.
+    CACHE_DIR = os.getenv('CACHE_DIR')
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', 500))
+    # Hits, sizes and latency per key namespace (see cache_metrics.py), logged every
+    # CACHE_METRICS_LOG_INTERVAL seconds (0 = never) and served at /admin/cache_metrics
+    CACHE_METRICS = os.getenv('CACHE_METRICS', 'true').lower() in ['true', '1', 't']
+    CACHE_METRICS_LOG_INTERVAL = int(os.getenv('CACHE_METRICS_LOG_INTERVAL', 3600))
+    # Per key namespace (see cache_refresh.py): seconds an entry is fresh, seconds it is then
+    # still served while one worker recomputes it, and seconds others wait for a value being computed
+    CACHE_REFRESH_POLICIES = {
+        'bankroll_breakdown': {'fresh': 300, 'max_stale': 600, 'lock_timeout': 10},
+        'articles': {'fresh': 3600, 'max_stale': 86400, 'lock_timeout': 10},
+        'hand_analysis': {'fresh': 86400, 'max_stale': 7 * 86400, 'lock_timeout': 30},
+    }
     
     # Redis Configuration (if using Redis cache)
     CACHE_REDIS_URL = os.getenv('REDIS_URL')
     CACHE_KEY_PREFIX = 'stakeeasy_'
 
+    # Users allowed on the /admin pages, comma-separated
+    ADMIN_EMAILS = [email.strip() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()]
+
+    # Longest chart series sent to the browser; longer ones are downsampled (0 = off).
+    # Chart endpoints accept ?max_points= to override it per request.
+    CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', 1000))
+
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI', (
@@ -6,6 +6,7 @@ from flask.cli import with_appcontext
 from .extensions import db
 
 from .models import Currency
+from .rates import bump_rates_version
 def fetch_exchange_rates(api_key):
     """Fetch live exchange rates from ExchangeRate-API."""
     url = f"https://v6.exchangerate-api.com/v6/{api_key} /latest/USD"
@@ -75,6 +76,7 @@ def insert_initial_currency_data():
         try:
             db.session.add_all(currencies_to_add)
             db.session.commit()
+            bump_rates_version()
             current_app.logger.info(f"Inserted {len (currencies_to_add)} currencies into the database")
         except Exception as e:
             current_app.logger.error(f"Database error: {e}" )
@@ -1,11 +1,29 @@
 """Utilities for preparing and loading data for the application."""
 
 import os
+import struct
+import numpy as np
 import pandas as pd
 import logging
 
 log = logging.getLogger(__name__)
 
+# Card encoding shared with frontend/card_utils.js: code = rank_index * 4 + suit_index
+CARD_RANKS = "23456789TJQKA"
+CARD_SUITS = "shdc"
+
+# Compact range payload header: count, total_records, page, limit (little-endian uint32)
+COMPACT_RANGE_HEADER = struct.Struct('<4I')
+
+_CARD_LOOKUP = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(CARD_RANKS):
+    _CARD_LOOKUP[ord(_c)] = _i
+    _CARD_LOOKUP[ord(_c.lower())] = _i
+_SUIT_LOOKUP = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(CARD_SUITS):
+    _SUIT_LOOKUP[ord(_c)] = _i
+    _SUIT_LOOKUP[ord(_c.upper())] = _i
+
 def prepare_plo_rankings_data(input_csv_path, output_feather_path):
     """
     Reads the raw evaluated CSV, cleans and transforms the data,
@@ -116,4 +134,130 @@ def sort_hand_string(hand_str: str) -> str:
         log.warning(f"Could not sort hand '{hand_str}'. Invalid character found. Error: {e}")
         return hand_str
 
-    return "".join(sorted_cards)
\ No newline at end of file
+    return "".join(sorted_cards)
+
+def encode_hands_compact(hands) -> np.ndarray:
+    """
+    Packs 4-card hand strings (e.g. 'AsKsQhJh') into one byte per card.
+
+    Each card is encoded as rank_index * 4 + suit_index using CARD_RANKS and
+    CARD_SUITS, so a hand becomes 4 bytes instead of a string.
+
+    Args:
+        hands: An iterable (or pandas Series) of 8-character hand strings.
+
+    Returns:
+        A uint8 array of shape (n, 4).
+
+    Raises:
+        ValueError: If any hand is not 4 valid cards.
+    """
+    raw = np.asarray(hands, dtype='S8')
+    if raw.size == 0:
+        return np.empty((0, 4), dtype=np.uint8)
+
+    chars = raw.view(np.uint8).reshape(-1, 8)
+    ranks = _CARD_LOOKUP[chars[:, 0::2]]
+    suits = _SUIT_LOOKUP[chars[:, 1::2]]
+    if (ranks == 255).any() or (suits == 255).any():
+        raise ValueError("Hands must contain exactly 4 valid cards (e.g. 'AsKsQhJh').")
+    return (ranks * 4 + suits).astype(np.uint8)
+
+
+def pack_range_payload(df, total_records: int, page: int, limit: int) -> bytes:
+    """
+    Serializes a page of range data into the compact typed-array layout.
+
+    Layout (little-endian), decoded by decodeCompactRange() in card_utils.js:
+        header       4 x uint32   count, total_records, page, limit
+        cards        count x 4 x uint8
+        strength     count x float32
+        percentile   count x float32
+        type         count x uint8
+
+    The card block is a multiple of 4 bytes, so both float32 blocks stay
+    aligned for zero-copy Float32Array views on the client.
+
+    Args:
+        df: DataFrame with 'hand', 'strength', 'percentile' and 'type' columns.
+        total_records: Number of hands matching the filter before pagination.
+        page: The page number served.
+        limit: The page size requested (0 means unpaginated).
+
+    Returns:
+        The packed payload as bytes.
+    """
+    count = len(df)
+    header = COMPACT_RANGE_HEADER.pack(count, total_records, page, limit)
+    cards = encode_hands_compact(df['hand'].to_numpy())
+    strength = df['strength'].to_numpy(dtype='<f4')
+    percentile = df['percentile'].to_numpy(dtype='<f4')
+    tiers = pd.to_numeric(df['type'], errors='coerce').fillna(0).to_numpy(dtype=np.uint8)
+    return b''.join((header, cards.tobytes(), strength.tobytes(), percentile.tobytes(), tiers.tobytes()))
+
+
+def build_tier_index(tiers) -> dict:
+    """
+    Groups row positions by tier so hands can be drawn per tier in O(1).
+
+    Args:
+        tiers: An array-like of tier values, one per row of the hand DataFrame.
+
+    Returns:
+        A dict mapping each tier (int) to a sorted int64 array of row positions.
+    """
+    tiers = np.asarray(tiers)
+    order = np.argsort(tiers, kind='stable')
+    unique_tiers, starts = np.unique(tiers[order], return_index=True)
+    return {int(tier): positions.astype(np.int64)
+            for tier, positions in zip(unique_tiers, np.split(order, starts[1:]))}
+
+
+def sample_tier_stratified(tier_index: dict, k: int, rng=None, mix: str = 'uniform') -> list:
+    """
+    Draws k distinct row positions from a tier index, choosing a tier for each draw first.
+
+    Positions are drawn without replacement within each tier, so no hand is picked
+    twice. A tier never gives more draws than it has hands; the rest go to the other
+    tiers, and k is capped at the total number of hands. Cost is O(k) regardless of
+    how many hands are in the dataset.
+
+    Args:
+        tier_index: The mapping returned by build_tier_index().
+        k: The number of hands to draw.
+        rng: An optional numpy Generator (for reproducible draws).
+        mix: 'uniform' to pick each tier equally often, or 'natural' to weight
+             tiers by how many hands they contain.
+
+    Returns:
+        A list of (tier, row_position) tuples.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    tiers = sorted(t for t, positions in tier_index.items() if len(positions))
+    if not tiers or k <= 0:
+        return []
+
+    if mix == 'natural':
+        sizes = np.array([len(tier_index[t]) for t in tiers], dtype=np.float64)
+        weights = sizes / sizes.sum()
+    elif mix == 'uniform':
+        weights = None
+    else:
+        raise ValueError(f"Unknown tier mix '{mix}'. Use 'uniform' or 'natural'.")
+
+    sizes = np.array([len(tier_index[t]) for t in tiers])
+    k = min(k, int(sizes.sum()))
+    counts = np.zeros(len(tiers), dtype=np.int64)
+    while counts.sum() < k:
+        # Draw the missing picks among the tiers that still have unpicked hands
+        open_tiers = np.flatnonzero(counts < sizes)
+        open_weights = None if weights is None else weights[open_tiers] / weights[open_tiers].sum()
+        chosen = rng.choice(open_tiers, size=k - int(counts.sum()), p=open_weights)
+        counts = np.minimum(counts + np.bincount(chosen, minlength=len(tiers)), sizes)
+
+    picks = []
+    for tier, positions, count in zip(tiers, (tier_index[t] for t in tiers), counts):
+        picks.extend((tier, int(position))
+                     for position in positions[rng.choice(len(positions), size=count, replace=False)])
+    # Interleave the tiers instead of asking them in order
+    return [picks[i] for i in rng.permutation(len(picks))]
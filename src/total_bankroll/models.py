@@ -3,7 +3,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_security.utils import hash_password
 import markdown
 import bleach
-from datetime import datetime, UTC
+from datetime import date, datetime, UTC
+from sqlalchemy import func, select
 from sqlalchemy.orm import relationship
 
 db = SQLAlchemy()  # Define db here
@@ -108,6 +109,33 @@ class AssetHistory(db.Model):
     asset = db.relationship('Assets', backref=db.backref('history', lazy='dynamic'))
     user = db.relationship('User', backref=db.backref('asset_history', lazy='dynamic'))
 
+class SiteBalance(db.Model):
+    """Latest, previous and first SiteHistory entry of each site, kept in sync on every history write."""
+    __tablename__ = 'site_balance'
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    current_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    current_currency = db.Column(db.String(3), db.ForeignKey('currency.code'), nullable=False)
+    current_recorded_at = db.Column(db.DateTime, nullable=True)
+    previous_amount = db.Column(db.Numeric(10, 2), nullable=True)
+    previous_currency = db.Column(db.String(3), db.ForeignKey('currency.code'), nullable=True)
+    first_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    first_currency = db.Column(db.String(3), db.ForeignKey('currency.code'), nullable=False)
+
+class AssetBalance(db.Model):
+    """Latest, previous and first AssetHistory entry of each asset, kept in sync on every history write."""
+    __tablename__ = 'asset_balance'
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    current_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    current_currency = db.Column(db.String(3), db.ForeignKey('currency.code'), nullable=False)
+    current_recorded_at = db.Column(db.DateTime, nullable=True)
+    previous_amount = db.Column(db.Numeric(10, 2), nullable=True)
+    previous_currency = db.Column(db.String(3), db.ForeignKey('currency.code'), nullable=True)
+    first_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    first_currency = db.Column(db.String(3), db.ForeignKey('currency.code'), nullable=False)
+
+
 class Currency(db.Model):
     __tablename__ = 'currency'
     id = db.Column(db.Integer, primary_key=True)
@@ -117,6 +145,20 @@ class Currency(db.Model):
     symbol = db.Column(db.String(5), nullable=False)
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
 
+# effective_from of the first rate recorded for a currency, so it covers all older amounts
+RATE_HISTORY_START = datetime(1970, 1, 1)
+
+class CurrencyRateHistory(db.Model):
+    """Rate of a currency (units per USD) in effect from effective_from until the next row."""
+    __tablename__ = 'currency_rate_history'
+    id = db.Column(db.Integer, primary_key=True)
+    currency_code = db.Column(db.String(3), db.ForeignKey('currency.code', ondelete='CASCADE'), nullable=False)
+    rate = db.Column(db.Numeric(10, 6), nullable=False)
+    effective_from = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('currency_code', 'effective_from', name='uq_currency_rate_history_code_from'),
+    )
+
 class CashStakes(db.Model):
     __tablename__ = 'cash_stakes'
     id = db.Column(db.Integer, primary_key=True)
@@ -215,3 +257,251 @@ def on_article_save(mapper, connection, target):
 class Topic(db.Model):
     __tablename__ = 'topics'
     id = db.Column(db.Integer, primary_key=True)
+
+
+# --- Latest balance maintenance ---
+# Maps each history model to its balance model and the column naming the site/asset.
+_BALANCE_MODELS = {
+    SiteHistory: (SiteBalance, 'site_id'),
+    AssetHistory: (AssetBalance, 'asset_id'),
+}
+
+
+def refresh_balance(connection, history_model, item_id):
+    """
+    Rebuilds the balance row of one site or asset from its history.
+
+    Runs on the caller's connection so it commits or rolls back together with the
+    history write that triggered it. The row is removed when no history is left.
+    """
+    balance_model, item_key = _BALANCE_MODELS[history_model]
+    history = history_model.__table__
+    balances = balance_model.__table__
+    columns = (history.c.amount, history.c.currency, history.c.recorded_at, history.c.user_id)
+    for_item = history.c[item_key] == item_id
+
+    newest = connection.execute(
+        select(*columns).where(for_item)
+        .order_by(history.c.recorded_at.desc(), history.c.id.desc()).limit(2)
+    ).all()
+    connection.execute(balances.delete().where(balances.c[item_key] == item_id))
+    if not newest:
+        return
+
+    first = connection.execute(
+        select(*columns).where(for_item)
+        .order_by(history.c.recorded_at.asc(), history.c.id.asc()).limit(1)
+    ).one()
+    current = newest[0]
+    previous = newest[1] if len(newest) > 1 else None
+    connection.execute(balances.insert().values({
+        item_key: item_id,
+        'user_id': current.user_id,
+        'current_amount': current.amount,
+        'current_currency': current.currency,
+        'current_recorded_at': current.recorded_at,
+        'previous_amount': previous.amount if previous else None,
+        'previous_currency': previous.currency if previous else None,
+        'first_amount': first.amount,
+        'first_currency': first.currency,
+    }))
+
+
+# Maps each model that feeds the chart frames (see timeseries.py) to the column holding its event time.
+_EVENT_DATE_COLUMNS = {
+    SiteHistory: 'recorded_at',
+    AssetHistory: 'recorded_at',
+    Deposits: 'date',
+    Drawings: 'date',
+}
+
+
+def _earliest_day(*values):
+    days = [v.date() if isinstance(v, datetime) else v for v in values if v is not None]
+    return min(days) if days else None
+
+
+# Models whose rows feed a user's cached bankroll values (totals, breakdown, balances)
+_BANKROLL_MODELS = (Sites, Assets, *_EVENT_DATE_COLUMNS)
+
+
+def _record_chart_changes(session, changes):
+    """
+    Remembers the earliest changed day per user ({user_id: date}) until the session
+    commits, when the cached chart frames are marked dirty from that day on.
+    """
+    pending = session.info.setdefault('chart_frames_from', {})
+    for user_id, day in changes.items():
+        pending[user_id] = _earliest_day(day, pending.get(user_id))
+
+
+def _record_bankroll_users(session, user_ids):
+    """Remembers the users whose bankroll data changed until the session commits (see on_bankroll_commit)."""
+    session.info.setdefault('bankroll_users_changed', set()).update(
+        user_id for user_id in user_ids if user_id is not None
+    )
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def on_bankroll_flush(session, flush_context):
+    """
+    Refreshes the balances of every site/asset whose history changed in this flush, and
+    records the affected users and their earliest changed day for on_bankroll_commit.
+    """
+    affected_items = set()
+    changed_from = {}
+    renamed = {}
+    changed_users = set()
+    rate_history = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        model = type(obj)
+        state = db.inspect(obj)
+        if model is Currency:
+            # Any currency write invalidates the rate snapshot once committed
+            session.info.setdefault('currency_rates_changed', set()).add(obj.code)
+            rate_changed = obj not in session.new and state.attrs.rate.history.has_changes()
+            if obj in session.new or (rate_changed and obj not in session.deleted):
+                # A new currency's first rate applies to all of its past amounts
+                effective_from = RATE_HISTORY_START if obj in session.new else datetime.now(UTC)
+                rate_history.append({'currency_code': obj.code, 'rate': obj.rate, 'effective_from': effective_from})
+            continue
+        if model in _BANKROLL_MODELS:
+            changed_users.update([obj.user_id, *state.attrs.user_id.history.deleted])
+        if model in (Sites, Assets) and obj not in session.new \
+                and (obj in session.deleted or state.attrs.name.history.has_changes()):
+            # Cached chart frames hold item names; rebuild them fully
+            renamed[obj.user_id] = date.min
+            continue
+        if model in _BALANCE_MODELS:
+            item_key = _BALANCE_MODELS[model][1]
+            for item_id in [getattr(obj, item_key), *state.attrs[item_key].history.deleted]:
+                if item_id is not None:
+                    affected_items.add((model, item_id))
+        if model in _EVENT_DATE_COLUMNS:
+            date_key = _EVENT_DATE_COLUMNS[model]
+            day = _earliest_day(getattr(obj, date_key), *state.attrs[date_key].history.deleted)
+            if obj.user_id is not None and day is not None:
+                changed_from[obj.user_id] = _earliest_day(day, changed_from.get(obj.user_id))
+
+    _record_chart_changes(session, changed_from)
+    _record_chart_changes(session, renamed)
+    _record_bankroll_users(session, changed_users)
+    connection = session.connection()
+    if rate_history:
+        connection.execute(CurrencyRateHistory.__table__.insert(), rate_history)
+    for history_model, item_id in affected_items:
+        refresh_balance(connection, history_model, item_id)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def on_currency_commit(session):
+    """Bumps the rates version after a commit that wrote Currency rows (see rates.py)."""
+    codes = session.info.pop('currency_rates_changed', None)
+    if codes:
+        from .rates import bump_rates_version
+        bump_rates_version(codes)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def on_currency_rollback(session):
+    session.info.pop('currency_rates_changed', None)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def on_bankroll_commit(session):
+    """
+    Invalidates the committed users' cached bankroll values (see cache_scopes.py) and
+    marks their cached chart frames dirty (see timeseries.py).
+    """
+    user_ids = session.info.pop('bankroll_users_changed', None)
+    if user_ids:
+        from .cache_scopes import invalidate, user_scope
+        invalidate(*(user_scope(user_id) for user_id in sorted(user_ids)))
+    changes = session.info.pop('chart_frames_from', None)
+    if changes:
+        from .timeseries import mark_chart_series_dirty
+        mark_chart_series_dirty(changes)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def on_bankroll_rollback(session):
+    session.info.pop('bankroll_users_changed', None)
+    session.info.pop('chart_frames_from', None)
+
+
+@db.event.listens_for(db.session, 'do_orm_execute')
+def on_bankroll_bulk_write(orm_execute_state):
+    """
+    Keeps balances, cached bankroll values and chart frames in sync for bulk inserts
+    (session.execute(insert(...), rows)) and query.delete()/query.update() on history,
+    deposit and withdrawal tables, which bypass the flush.
+    """
+    if not (orm_execute_state.is_insert or orm_execute_state.is_delete or orm_execute_state.is_update):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in _EVENT_DATE_COLUMNS:
+        return None
+
+    model = mapper.class_
+    session = orm_execute_state.session
+    if orm_execute_state.is_insert:
+        return _on_bankroll_bulk_insert(orm_execute_state, model, session)
+    whereclause = orm_execute_state.statement.whereclause
+
+    def affected(*columns, group_by=None):
+        query = select(*columns)
+        if whereclause is not None:
+            query = query.where(whereclause)
+        if group_by is not None:
+            query = query.group_by(group_by)
+        return session.execute(query).all()
+
+    item_ids = set()
+    if model in _BALANCE_MODELS:
+        item_column = getattr(model, _BALANCE_MODELS[model][1])
+        item_ids = {row[0] for row in affected(item_column.distinct())}
+    date_column = getattr(model, _EVENT_DATE_COLUMNS[model])
+    changed_from = {
+        user_id: _earliest_day(first_date)
+        for user_id, first_date in affected(model.user_id, func.min(date_column), group_by=model.user_id)
+    }
+
+    result = orm_execute_state.invoke_statement()
+    connection = session.connection()
+    for item_id in item_ids:
+        refresh_balance(connection, model, item_id)
+    if orm_execute_state.is_update:
+        # A bulk update may move rows to earlier dates, so rebuild those users' frames fully
+        changed_from = dict.fromkeys(changed_from, date.min)
+    _record_chart_changes(session, changed_from)
+    _record_bankroll_users(session, changed_from)
+    return result
+
+
+def _on_bankroll_bulk_insert(orm_execute_state, model, session):
+    """Refreshes each inserted item's balance once and records each user's earliest new day."""
+    rows = orm_execute_state.parameters
+    if isinstance(rows, dict):
+        rows = [rows]
+    if not rows:
+        # insert().values(...) without parameters; nothing to derive the affected rows from
+        return None
+
+    date_key = _EVENT_DATE_COLUMNS[model]
+    item_key = _BALANCE_MODELS[model][1] if model in _BALANCE_MODELS else None
+    item_ids = set()
+    changed_from = {}
+    for row in rows:
+        if item_key is not None:
+            item_ids.add(row[item_key])
+        # Rows without an explicit date get the column default, i.e. now
+        day = _earliest_day(row.get(date_key) or datetime.now(UTC))
+        changed_from[row['user_id']] = _earliest_day(day, changed_from.get(row['user_id']))
+
+    result = orm_execute_state.invoke_statement()
+    connection = session.connection()
+    for item_id in item_ids:
+        refresh_balance(connection, model, item_id)
+    _record_chart_changes(session, changed_from)
+    _record_bankroll_users(session, changed_from)
+    return result
@@ -0,0 +1,246 @@
+"""
+In-process snapshot of the currency exchange rates.
+
+Rates change once a month, but every chart endpoint and the sites/assets pages need
+them on each request. get_rate_snapshot() loads the Currency table once and keeps it
+in the process until the rates version changes. The version is the generation of
+the rates cache scope (see cache_scopes.py), so bump_rates_version() (called by
+update_rates and init-currency) invalidates the snapshot of every worker that
+shares the cache backend, along with every cached value computed with the rates.
+With a per-process cache the snapshot is also reloaded after SNAPSHOT_MAX_AGE seconds.
+
+Past amounts are converted at the rate in effect on their own date. RateHistory
+does this in memory with a binary search over each currency's rate-change dates,
+and rate_windows() gives the same lookup as a join target for SQL aggregates.
+"""
+
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+
+from .cache_scopes import RATES_SCOPE, currency_scope, generation, invalidate
+from .models import db, Currency, CurrencyRateHistory
+
+SNAPSHOT_MAX_AGE = 3600
+DEFAULT_RATE = Decimal('1.0')
+
+CurrencyInfo = namedtuple('CurrencyInfo', ['code', 'name', 'symbol', 'rate'])
+
+
+class RateSnapshot:
+    """
+    Immutable view of the Currency table at one rates version.
+
+    Rates are units per USD, so an amount converts to USD as amount / rate, i.e.
+    amount * usd_factor. Unknown currency codes fall back to a rate of 1.0, like
+    the charts always did.
+
+    Attributes:
+        version: The rates version this snapshot was loaded at
+        currencies: {code: CurrencyInfo} with name, symbol and Decimal rate
+        codes: Currency codes in index order
+        index: {code: position in codes and the factor arrays}
+        usd_factors: {code: Decimal factor to multiply an amount by to get USD}
+        usd_factor_array: float64 array of USD factors aligned with codes
+        cross_rates: float64 matrix, cross_rates[i, j] converts currency codes[i] to codes[j]
+        history: RateHistory for converting past amounts at their own date's rate
+    """
+
+    def __init__(self, version, currencies):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.currencies = {c.code: c for c in currencies}
+        self.codes = tuple(sorted(self.currencies))
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.rates = {code: c.rate for code, c in self.currencies.items()}
+        self.usd_factors = {code: DEFAULT_RATE / rate for code, rate in self.rates.items()}
+        self.usd_factor_array = np.array([float(self.usd_factors[code]) for code in self.codes], dtype=np.float64)
+        self.usd_factor_array.setflags(write=False)
+        rate_array = 1.0 / self.usd_factor_array if len(self.codes) else self.usd_factor_array
+        self.cross_rates = np.outer(self.usd_factor_array, rate_array)
+        self.cross_rates.setflags(write=False)
+        self.history = RateHistory([], self.rates)
+
+    def rate(self, code):
+        """Returns the Decimal rate (units per USD) of code."""
+        return self.rates.get(code, DEFAULT_RATE)
+
+    def to_usd(self, amount, code):
+        """Converts a single amount to USD as a Decimal."""
+        return Decimal(str(amount)) / self.rate(code)
+
+    def cross_rate(self, from_code, to_code):
+        """Returns the Decimal factor converting from_code amounts to to_code."""
+        return self.rate(to_code) / self.rate(from_code)
+
+    def scale_factor(self, from_code, to_code):
+        """Returns the float cross_rates entry for scaling a whole series from_code -> to_code."""
+        if from_code == to_code:
+            return 1.0
+        if from_code in self.index and to_code in self.index:
+            return float(self.cross_rates[self.index[from_code], self.index[to_code]])
+        return float(self.cross_rate(from_code, to_code))
+
+    def convert_series(self, values, from_code, to_code, decimals=2):
+        """Scales a series of amounts to another currency with one vectorized multiply."""
+        scaled = np.asarray(values, dtype=np.float64) * self.scale_factor(from_code, to_code)
+        return np.round(scaled, decimals).tolist()
+
+    def factors_for(self, codes):
+        """Returns a float64 array with the USD factor of each code in codes."""
+        index = self.index
+        positions = np.fromiter((index.get(code, -1) for code in codes), dtype=np.int64)
+        # -1 marks unknown codes; they get a factor of 1.0 through the appended slot
+        return np.append(self.usd_factor_array, 1.0)[positions]
+
+    def to_usd_array(self, amounts, codes):
+        """Converts parallel sequences of amounts and currency codes to a float64 USD array."""
+        return np.asarray(amounts, dtype=np.float64) * self.factors_for(codes)
+
+
+class RateHistory:
+    """
+    Dated rates of every currency, for converting past amounts "as of" their date.
+
+    Each currency's rate-change dates are kept sorted, so the rate in effect at a
+    time is found by binary search. Amounts dated before a currency's first recorded
+    rate use that first rate; currencies without any history use fallback_rates.
+    """
+
+    def __init__(self, rows, fallback_rates=None):
+        """
+        Args:
+            rows: (currency_code, effective_from, Decimal rate) tuples sorted by code and date
+            fallback_rates: {code: Decimal rate} for currencies missing from rows
+        """
+        self.fallback_rates = fallback_rates or {}
+        self._dates = {}
+        self._rates = {}
+        for code, effective_from, rate in rows:
+            self._dates.setdefault(code, []).append(effective_from)
+            self._rates.setdefault(code, []).append(rate)
+        self._date_arrays = {code: np.array(dates, dtype='datetime64[us]') for code, dates in self._dates.items()}
+        self._factor_arrays = {
+            code: np.array([1.0 / float(rate) for rate in rates], dtype=np.float64)
+            for code, rates in self._rates.items()
+        }
+
+    def rate_as_of(self, code, when):
+        """Returns the Decimal rate of code in effect at datetime when."""
+        dates = self._dates.get(code)
+        if not dates:
+            return self.fallback_rates.get(code, DEFAULT_RATE)
+        return self._rates[code][max(bisect_right(dates, when) - 1, 0)]
+
+    def to_usd(self, amount, code, when):
+        """Converts a single amount dated when to USD as a Decimal."""
+        return Decimal(str(amount)) / self.rate_as_of(code, when)
+
+    def to_usd_array(self, amounts, codes, timestamps):
+        """
+        Converts a whole series to USD at the rates in effect on each amount's date.
+
+        One np.searchsorted per currency replaces a lookup per row.
+
+        Args:
+            amounts, codes, timestamps: Parallel sequences (naive datetimes)
+        Returns:
+            float64 array of USD amounts
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        codes = np.asarray(codes, dtype=object)
+        timestamps = np.asarray(timestamps, dtype='datetime64[us]')
+        factors = np.empty(len(amounts), dtype=np.float64)
+        for code in set(codes.tolist()):
+            mask = codes == code
+            dates = self._date_arrays.get(code)
+            if dates is None:
+                factors[mask] = 1.0 / float(self.fallback_rates.get(code, DEFAULT_RATE))
+                continue
+            positions = np.searchsorted(dates, timestamps[mask], side='right') - 1
+            factors[mask] = self._factor_arrays[code][np.maximum(positions, 0)]
+        return amounts * factors
+
+
+def load_rate_history(executor, fallback_rates=None):
+    """Loads a RateHistory with one query on a Session or Connection."""
+    table = CurrencyRateHistory.__table__
+    rows = executor.execute(
+        select(table.c.currency_code, table.c.effective_from, table.c.rate)
+        .order_by(table.c.currency_code, table.c.effective_from)
+    ).all()
+    return RateHistory(
+        [(row.currency_code, row.effective_from, Decimal(str(row.rate))) for row in rows], fallback_rates
+    )
+
+
+def rate_windows():
+    """
+    Returns a subquery of (currency_code, rate, effective_from, effective_to) rows, where
+    effective_to is the next change of the same currency (NULL for the current rate).
+    """
+    table = CurrencyRateHistory.__table__
+    return select(
+        table.c.currency_code, table.c.rate, table.c.effective_from,
+        func.lead(table.c.effective_from).over(
+            partition_by=table.c.currency_code, order_by=table.c.effective_from
+        ).label('effective_to'),
+    ).subquery('rate_windows')
+
+
+def rate_window_matches(windows, currency, when):
+    """Join condition selecting the window of currency that contains when."""
+    return and_(
+        windows.c.currency_code == currency,
+        windows.c.effective_from <= when,
+        or_(windows.c.effective_to.is_(None), windows.c.effective_to > when),
+    )
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def get_rates_version():
+    """Returns the current rates version, creating one if the cache has none."""
+    return generation(RATES_SCOPE)
+
+
+def bump_rates_version(codes=()):
+    """
+    Invalidates every process's rate snapshot and the values cached with the rates,
+    plus those cached for the currencies in codes. Call after committing rate changes.
+    """
+    global _snapshot
+    invalidate(RATES_SCOPE, *(currency_scope(code) for code in codes))
+    _snapshot = None
+
+
+def _load_snapshot(version):
+    rows = db.session.query(Currency.code, Currency.name, Currency.symbol, Currency.rate).all()
+    snapshot = RateSnapshot(version, [
+        CurrencyInfo(row.code, row.name, row.symbol, Decimal(str(row.rate))) for row in rows
+    ])
+    snapshot.history = load_rate_history(db.session, snapshot.rates)
+    return snapshot
+
+
+def get_rate_snapshot():
+    """Returns the current RateSnapshot, reloading it only when the rates version changed."""
+    global _snapshot
+    version = get_rates_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version \
+            and time.monotonic() - snapshot.loaded_at < SNAPSHOT_MAX_AGE:
+        return snapshot
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != version \
+                or time.monotonic() - snapshot.loaded_at >= SNAPSHOT_MAX_AGE:
+            snapshot = _snapshot = _load_snapshot(version)
+    return snapshot
@@ -0,0 +1,65 @@
+"""
+Per-request memo of service method results.
+
+A page often asks for the same value several times: home() loads the bankroll
+breakdown, AchievementService.check_achievements loads it again when it is not
+passed bankroll_data, and the goals and achievement progress code load it once
+more. Each call builds the scoped cache key and reads the cache, which is a
+database read with SQLiteCache. Methods decorated with @request_memo keep their
+result in flask.g, keyed by the method and its arguments, so repeated calls in
+the same request return the first result without touching the cache.
+
+The memo is dropped when the request is torn down (see init_app) and whenever a
+cache scope is invalidated (cache_scopes.invalidate), so a request that writes
+data and then reads it back sees the new values. Memoized results are shared by
+every caller in the request and must not be modified.
+"""
+
+import functools
+import inspect
+
+from flask import g, has_app_context
+
+MEMO_ATTRIBUTE = '_request_memo'
+
+
+def request_memo(method):
+    """
+    Decorator caching a service method's result for the rest of the request.
+
+    Arguments are normalized with the method's signature, so f(1), f(1, 'USD') and
+    f(user_id=1) share an entry. The service instance is not part of the key;
+    services keep no per-instance state. Calls with unhashable arguments and calls
+    outside an app context are not memoized.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not has_app_context():
+            return method(self, *args, **kwargs)
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__qualname__, *tuple(bound.arguments.items())[1:])
+        memo = g.setdefault(MEMO_ATTRIBUTE, {})
+        try:
+            return memo[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return method(self, *args, **kwargs)
+        result = memo[key] = method(self, *args, **kwargs)
+        return result
+
+    return wrapper
+
+
+def clear_request_memo():
+    """Drops every memoized result of the current request."""
+    if has_app_context():
+        g.pop(MEMO_ATTRIBUTE, None)
+
+
+def init_app(app):
+    """Drops the memo at the end of every request, also when the app context outlives it."""
+    app.teardown_request(lambda exception: clear_request_memo())
@@ -14,6 +14,7 @@ from .settings import settings_bp
 # Main features
 from .poker_sites import poker_sites_bp
 from .assets import assets_bp
+from .balances import balances_bp
 from .deposit import deposit_bp
 from .withdrawal import withdrawal_bp
 from .add_deposit import add_deposit_bp
@@ -28,4 +29,5 @@ from .tools import tools_bp
 from .hand_eval import hand_eval_bp
 from .common import common_bp
 from .reset_db import reset_db_bp
-from .import_db import import_db_bp
\ No newline at end of file
+from .import_db import import_db_bp
+from .admin import admin_bp
\ No newline at end of file
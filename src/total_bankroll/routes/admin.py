@@ -0,0 +1,30 @@
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_security import login_required, current_user
+
+from ..cache_metrics import metrics
+
+admin_bp = Blueprint("admin", __name__, url_prefix='/admin')
+
+def admin_required(view):
+    """Allows only the users listed in ADMIN_EMAILS; everyone else gets a 404."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user.email not in current_app.config.get('ADMIN_EMAILS', []):
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route("/cache_metrics")
+@login_required
+@admin_required
+def cache_metrics():
+    """
+    Cache hits, misses, value sizes and latency per key namespace of the worker serving
+    the request (see cache_metrics.py). ?reset=1 starts the counters over after reading them.
+    """
+    snapshot = metrics.snapshot()
+    if request.args.get('reset', type=int):
+        metrics.reset()
+    return jsonify(snapshot)
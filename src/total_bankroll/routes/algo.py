@@ -283,7 +283,59 @@ def find_best_five_card_hand(hole_cards, board_cards):
                 
     return best_hand_cards
 
-def process_hand_data(form_data, button_position):
+def analyze_hands(hero_hand, opponent_hand, board):
+    """
+    Card-dependent part of process_hand_data: hand ranks, outs and simulated equities.
+
+    Depends only on the cards, so callers can cache the result per hand (see hand_eval).
+    """
+    analysis = {}
+    hero_eval_rank = _get_best_plo_rank(hero_hand, board)
+    hero_hand_name = evaluator.class_to_string(evaluator.get_rank_class(hero_eval_rank))
+    hero_best_hand = find_best_five_card_hand(hero_hand, board)
+    hero_current_rank_class = evaluator.get_rank_class(hero_eval_rank)
+    analysis['hero_eval'] = hero_eval_rank
+    analysis['hero_hand_name'] = hero_hand_name
+    analysis['hero_best_hand'] = hero_best_hand
+    analysis['hero_current_rank_class'] = hero_current_rank_class
+
+    opp_eval_rank = _get_best_plo_rank(opponent_hand, board)
+    opp_hand_name = evaluator.class_to_string(evaluator.get_rank_class(opp_eval_rank))
+    opp_best_hand = find_best_five_card_hand(opponent_hand, board)
+    opp_current_rank_class = evaluator.get_rank_class(opp_eval_rank)
+    analysis['opp_eval'] = opp_eval_rank
+    analysis['opp_hand_name'] = opp_hand_name
+    analysis['opp_best_hand'] = opp_best_hand
+    analysis['opp_current_rank_class'] = opp_current_rank_class
+
+    hero_outs_breakdown = calculate_detailed_outs(hero_hand, board)
+    analysis['hero_outs_breakdown'] = hero_outs_breakdown
+
+    opp_outs_breakdown = calculate_detailed_outs(opponent_hand, board)
+    analysis['opp_outs_breakdown'] = opp_outs_breakdown
+
+    # Calculate winning outs for the player who is behind
+    all_known_cards = hero_hand + opponent_hand + board
+    analysis['hero_winning_outs'] = {'total': 0, 'cards': []}
+    analysis['opp_winning_outs'] = {'total': 0, 'cards': []}
+
+    if hero_eval_rank > opp_eval_rank: # Hero is behind
+        winning_outs = calculate_winning_outs(hero_hand, board, opp_eval_rank, all_known_cards)
+        analysis['hero_winning_outs'] = winning_outs
+    elif opp_eval_rank > hero_eval_rank: # Opponent is behind
+        winning_outs = calculate_winning_outs(opponent_hand, board, hero_eval_rank, all_known_cards)
+        analysis['opp_winning_outs'] = winning_outs
+
+    # Run Monte Carlo simulation for hero's equity
+    hero_equity = run_monte_carlo_simulation(hero_hand, opponent_hand, board)
+    analysis['hero_equity'] = hero_equity
+
+    # Run Monte Carlo simulation for hero's improvement equity
+    hero_improvement_equity = run_improvement_simulation(hero_hand, board)
+    analysis['hero_improvement_equity'] = hero_improvement_equity
+    return analysis
+
+def process_hand_data(form_data, button_position, analyze=analyze_hands):
     hero_hand_str = form_data['hero_hand']
     board_cards_str = form_data['board']
     opp_hand_str = form_data['opponent_hand']
@@ -312,50 +364,7 @@ def process_hand_data(form_data, button_position):
         'bet_size': float(form_data.get('bet_size', 0))
     }
 
-    hero_eval_rank = _get_best_plo_rank(hero_hand_list, board_cards_list)
-    hero_hand_name = evaluator.class_to_string(evaluator.get_rank_class(hero_eval_rank))
-    hero_best_hand = find_best_five_card_hand(hero_hand_list, board_cards_list)
-    hero_current_rank_class = evaluator.get_rank_class(hero_eval_rank)
-    processed_data['hero_eval'] = hero_eval_rank
-    processed_data['hero_hand_name'] = hero_hand_name
-    processed_data['hero_best_hand'] = hero_best_hand
-    processed_data['hero_current_rank_class'] = hero_current_rank_class
-
-    opp_eval_rank = _get_best_plo_rank(opp_hand_list, board_cards_list)
-    opp_hand_name = evaluator.class_to_string(evaluator.get_rank_class(opp_eval_rank))
-    opp_best_hand = find_best_five_card_hand(opp_hand_list, board_cards_list)
-    opp_current_rank_class = evaluator.get_rank_class(opp_eval_rank)
-    processed_data['opp_eval'] = opp_eval_rank
-    processed_data['opp_hand_name'] = opp_hand_name
-    processed_data['opp_best_hand'] = opp_best_hand
-    processed_data['opp_current_rank_class'] = opp_current_rank_class
-
-    hero_outs_breakdown = calculate_detailed_outs(hero_hand_list, board_cards_list)
-    processed_data['hero_outs_breakdown'] = hero_outs_breakdown
-
-    opp_outs_breakdown = calculate_detailed_outs(opp_hand_list, board_cards_list)
-    processed_data['opp_outs_breakdown'] = opp_outs_breakdown
-
-    # Calculate winning outs for the player who is behind
-    all_known_cards = hero_hand_list + opp_hand_list + board_cards_list
-    processed_data['hero_winning_outs'] = {'total': 0, 'cards': []}
-    processed_data['opp_winning_outs'] = {'total': 0, 'cards': []}
-
-    if hero_eval_rank > opp_eval_rank: # Hero is behind
-        winning_outs = calculate_winning_outs(hero_hand_list, board_cards_list, opp_eval_rank, all_known_cards)
-        processed_data['hero_winning_outs'] = winning_outs
-    elif opp_eval_rank > hero_eval_rank: # Opponent is behind
-        winning_outs = calculate_winning_outs(opp_hand_list, board_cards_list, hero_eval_rank, all_known_cards)
-        processed_data['opp_winning_outs'] = winning_outs
-
-    # Run Monte Carlo simulation for hero's equity
-    hero_equity = run_monte_carlo_simulation(hero_hand_list, opp_hand_list, board_cards_list)
-    processed_data['hero_equity'] = hero_equity
-
-    # Run Monte Carlo simulation for hero's improvement equity
-    hero_improvement_equity = run_improvement_simulation(hero_hand_list, board_cards_list)
-    processed_data['hero_improvement_equity'] = hero_improvement_equity
-
+    processed_data.update(analyze(hero_hand_list, opp_hand_list, board_cards_list))
 
     smallest_stack = min(processed_data['hero_stack'], processed_data['opponent_stack'])
     current_pot_after_bet = processed_data['pot_size'] + processed_data['bet_size']
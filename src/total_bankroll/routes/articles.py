@@ -1,15 +1,24 @@
+from urllib.parse import urlencode
 from flask import Blueprint, render_template, flash, redirect, url_for, request
 from flask_security import login_required, current_user
 from sqlalchemy import or_
 from ..models import db, Article, UserReadArticle, Tag
 from ..services import AchievementService
-from ..extensions import cache
+from ..cache_scopes import scoped_key
+from ..cache_refresh import cached_view
 
 articles_bp = Blueprint('articles', __name__, url_prefix='/strategy/articles')
 
+def _page_cache_key():
+    """
+    Key of a listing page, varying by the sorted query parameters, in the global cache scope
+    (see cache_scopes.py). The endpoint names the page's cache_metrics namespace.
+    """
+    return scoped_key(f'view/{request.endpoint}/{request.path}?{urlencode(sorted(request.args.items(multi=True)))}')
+
 @articles_bp.route('/')
 @login_required
-@cache.cached(timeout=3600, query_string=True)  # Cache for 1 hour, vary by query params
+@cached_view('articles', _page_cache_key)  # Fresh for 1 hour, then refreshed in the background (see config.py)
 def index():
     """Display a list of articles."""
     page = request.args.get('page', 1, type=int)
@@ -46,7 +55,7 @@ def index():
 
 @articles_bp.route('/tag/<string:tag_name>')
 @login_required
-@cache.cached(timeout=3600, query_string=True)  # Cache for 1 hour
+@cached_view('articles', _page_cache_key)
 def by_tag(tag_name):
     """Display articles filtered by a specific tag."""
     tag = Tag.query.filter_by(name=tag_name).first_or_404()
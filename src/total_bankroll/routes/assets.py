@@ -1,15 +1,15 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_security import login_required, current_user
-from sqlalchemy.orm import aliased
-from sqlalchemy import func, and_, inspect
+from sqlalchemy import and_, inspect
 from decimal import Decimal
 from flask_wtf import FlaskForm
 from wtforms import StringField, DecimalField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Length
 
-from ..models import db, Assets, AssetHistory, Currency
+from ..models import db, Assets, AssetHistory, AssetBalance
 from ..services import AchievementService
 from ..utils import get_sorted_currencies
+from ..rates import get_rate_snapshot
 from datetime import datetime
 
 assets_bp = Blueprint("assets", __name__)
@@ -32,39 +32,16 @@ class RenameAssetForm(FlaskForm):
 @login_required
 def assets_page():
     """Assets page."""
-    # Efficiently query for assets and their last two history records
-    history_ranked = db.session.query(
-        AssetHistory,
-        func.row_number().over(
-            partition_by=AssetHistory.asset_id,
-            order_by=AssetHistory.recorded_at.desc()
-        ).label('rn')
-    ).filter(AssetHistory.user_id == current_user.id).subquery()
-
-    current_history = aliased(history_ranked)
-    previous_history = aliased(history_ranked)
-
-    # Subquery to get the first (chronologically earliest) history record per asset
-    first_history_ranked = db.session.query(
-        AssetHistory,
-        func.row_number().over(
-            partition_by=AssetHistory.asset_id,
-            order_by=AssetHistory.recorded_at.asc()
-        ).label('rn')
-    ).filter(AssetHistory.user_id == current_user.id).subquery()
-    first_history = aliased(first_history_ranked)
-
+    # Current, previous and first balances come from the maintained AssetBalance table
     assets_query = db.session.query(
         Assets,
-        current_history.c.amount.label('current_amount'),
-        current_history.c.currency.label('current_currency_code'),
-        previous_history.c.amount.label('previous_amount'),
-        previous_history.c.currency.label('previous_currency_code'),
-        first_history.c.amount.label('starting_amount'),
-        first_history.c.currency.label('starting_currency_code'),
-    ).outerjoin(current_history, (Assets.id == current_history.c.asset_id) & (current_history.c.rn == 1))\
-     .outerjoin(previous_history, (Assets.id == previous_history.c.asset_id) & (previous_history.c.rn == 2))\
-     .outerjoin(first_history, (Assets.id == first_history.c.asset_id) & (first_history.c.rn == 1))\
+        AssetBalance.current_amount,
+        AssetBalance.current_currency.label('current_currency_code'),
+        AssetBalance.previous_amount,
+        AssetBalance.previous_currency.label('previous_currency_code'),
+        AssetBalance.first_amount.label('starting_amount'),
+        AssetBalance.first_currency.label('starting_currency_code'),
+    ).outerjoin(AssetBalance, Assets.id == AssetBalance.asset_id)\
      .filter(Assets.user_id == current_user.id)\
      .order_by(Assets.display_order)
 
@@ -74,8 +51,8 @@ def assets_page():
     total_previous = Decimal('0.0')
     total_starting = Decimal('0.0')
 
-    # Pre-fetch all currencies to avoid querying in a loop
-    all_currencies = {c.code: c for c in db.session.query(Currency).all()}
+    # Currencies come from the cached rate snapshot, so no query is needed
+    all_currencies = get_rate_snapshot().currencies
 
     for asset, current_amount, current_currency_code, previous_amount, previous_currency_code, starting_amount, starting_currency_code in assets_query:
         curr_currency_obj = all_currencies.get(current_currency_code)
@@ -197,7 +174,7 @@ def asset_history(asset_id):
 
     history_raw = history_query.order_by(AssetHistory.recorded_at.desc()).all()
 
-    all_currencies = {c.code: c for c in db.session.query(Currency).all()}
+    all_currencies = get_rate_snapshot().currencies
     history_data = []
     for record in history_raw:
         record_dict = {c.key: getattr(record, c.key) for c in inspect(record).mapper.column_attrs}
@@ -0,0 +1,99 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask_security import login_required, current_user
+from decimal import Decimal, InvalidOperation
+from flask_wtf import FlaskForm
+from wtforms import DecimalField, HiddenField, SubmitField
+from wtforms.validators import Optional
+
+from ..models import db, Sites, Assets, SiteBalance, AssetBalance
+from ..services import BankrollService
+
+balances_bp = Blueprint("balances", __name__, url_prefix='/balances')
+
+# Pages that open the bulk update form and may be returned to after saving
+RETURN_ENDPOINTS = ('poker_sites.poker_sites_page', 'assets.assets_page')
+
+class BulkBalanceForm(FlaskForm):
+    next = HiddenField()
+    submit = SubmitField('Save Balances')
+
+def build_bulk_balance_form(sites, assets):
+    """Builds a form with one optional amount field per site (site_<id>) and asset (asset_<id>)."""
+    fields = {}
+    for prefix, items in (('site', sites), ('asset', assets)):
+        for item, amount, currency in items:
+            label = f"{item.name} ({currency or 'USD'})"
+            fields[f'{prefix}_{item.id}'] = DecimalField(label, validators=[Optional()], default=amount)
+    return type('BulkBalanceForm', (BulkBalanceForm,), fields)(next=request.args.get('next'))
+
+def _user_items(item_model, balance_model, item_key):
+    """Returns (item, current amount, currency) rows of the current user in display order."""
+    return db.session.query(item_model, balance_model.current_amount, balance_model.current_currency)\
+        .outerjoin(balance_model, getattr(balance_model, item_key) == item_model.id)\
+        .filter(item_model.user_id == current_user.id)\
+        .order_by(item_model.display_order, item_model.id)\
+        .all()
+
+def _return_url(next_endpoint, amounts):
+    """The page the form was opened from, else the assets page if only asset balances changed."""
+    if next_endpoint not in RETURN_ENDPOINTS:
+        only_assets = amounts['asset'] and not amounts['site']
+        next_endpoint = 'assets.assets_page' if only_assets else 'poker_sites.poker_sites_page'
+    return url_for(next_endpoint)
+
+def _parse_amounts(values):
+    """Parses a JSON {id: amount} object into {int id: Decimal amount}; raises ValueError."""
+    if not isinstance(values, dict):
+        raise ValueError('expected an object mapping ids to amounts')
+    try:
+        return {int(item_id): Decimal(str(amount)) for item_id, amount in values.items()}
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError('ids must be integers and amounts numbers')
+
+@balances_bp.route("/bulk_update", methods=['GET', 'POST'])
+@login_required
+def bulk_update():
+    """Update the balances of all sites and assets in one go; blank fields are left unchanged."""
+    sites = _user_items(Sites, SiteBalance, 'site_id')
+    assets = _user_items(Assets, AssetBalance, 'asset_id')
+    form = build_bulk_balance_form(sites, assets)
+
+    if form.validate_on_submit():
+        amounts = {'site': {}, 'asset': {}}
+        for prefix, items in (('site', sites), ('asset', assets)):
+            for item, amount, _ in items:
+                value = form[f'{prefix}_{item.id}'].data
+                if value is not None and value != amount:
+                    amounts[prefix][item.id] = value
+
+        written = BankrollService().record_balances(current_user.id, amounts['site'], amounts['asset'])
+        if written is None:
+            flash('Could not update balances. Please try again.', 'danger')
+        elif written:
+            flash(f'Updated {written} balance{"s" if written != 1 else ""}!', 'success')
+        else:
+            flash('No balances changed.', 'info')
+        return redirect(_return_url(form.next.data, amounts))
+
+    return render_template("partials/_modal_form.html", form=form, title="Update All Balances", action_url=url_for('balances.bulk_update'))
+
+@balances_bp.route("/api/bulk_update", methods=['POST'])
+@login_required
+def bulk_update_api():
+    """
+    JSON variant of bulk_update: {"sites": {"<site_id>": amount}, "assets": {"<asset_id>": value}}.
+    Responds with the number of history rows written.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        site_amounts = _parse_amounts(payload.get('sites', {}))
+        asset_amounts = _parse_amounts(payload.get('assets', {}))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    written = BankrollService().record_balances(current_user.id, site_amounts, asset_amounts)
+    if written is None:
+        return jsonify({'error': 'Unknown site or asset, or the update failed'}), 400
+    return jsonify({'updated': written})
@@ -1,11 +1,194 @@
-from flask import Blueprint, render_template, jsonify, current_app, abort
+from flask import Blueprint, render_template, jsonify, current_app, abort, request
 from flask_security import current_user, login_required
-from datetime import datetime, timedelta
-from decimal import Decimal
-from ..models import db, Currency, SiteHistory, Sites, AssetHistory, Assets, Deposits, Drawings
+from datetime import date
+import gzip
+import numpy as np
+from ..models import db, Sites, Assets, SiteBalance, AssetBalance
+from ..rates import get_rate_snapshot
+from ..timeseries import GRANULARITIES, bucket_sums, chart_window, downsample, get_cached_chart_series, iso_days
 
 charts_bp = Blueprint("charts", __name__)
 
+COLORS = [
+    'rgb(75, 192, 192)',  # Cyan
+    'rgb(255, 99, 132)',   # Red
+    'rgb(54, 162, 235)',   # Blue
+    'rgb(255, 206, 86)',   # Yellow
+    'rgb(153, 102, 255)',  # Purple
+    'rgb(255, 159, 64)'    # Orange
+]
+
+def _display_currency(rates):
+    """
+    Currency to chart in: the ?currency= argument, else the user's default currency.
+    Unknown codes fall back to USD, the currency every series is computed in.
+    """
+    code = (request.args.get('currency') or current_user.default_currency_code or 'USD').upper()
+    return code if code in rates.index else 'USD'
+
+def _max_points():
+    """Longest series to send: the ?max_points= argument, else CHART_MAX_POINTS (0 = all)."""
+    max_points = request.args.get('max_points', type=int)
+    if max_points is None:
+        max_points = current_app.config.get('CHART_MAX_POINTS', 0)
+    return max(max_points, 0)
+
+def _columnar():
+    """Whether ?format=columnar asked for the compact payload format (see _columnar_payload)."""
+    return request.args.get('format') == 'columnar'
+
+def _user_chart_series(rates):
+    """
+    The current user's chart series at ?granularity= (day, week or month; default
+    day), limited to the ?start= and ?end= dates (YYYY-MM-DD) when given.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        granularity = 'day'
+    start = request.args.get('start', type=date.fromisoformat)
+    end = request.args.get('end', type=date.fromisoformat)
+    return chart_window(get_cached_chart_series(current_user.id, rates, granularity), granularity, start, end)
+
+def _current_values(item_model, balance_model, item_key, rates):
+    """
+    Latest amount of each of the user's sites or assets in USD at today's rates, most
+    recently updated first, as (names, values) for the pie charts.
+    """
+    rows = db.session.query(item_model.name, balance_model.current_amount, balance_model.current_currency)\
+        .join(item_model, item_model.id == getattr(balance_model, item_key))\
+        .filter(balance_model.user_id == current_user.id)\
+        .order_by(balance_model.current_recorded_at.desc(), getattr(balance_model, item_key).desc())\
+        .all()
+    amounts = rates.to_usd_array([row.current_amount for row in rows], [row.current_currency for row in rows])
+    return [row.name for row in rows], amounts.tolist()
+
+def _item_datasets(series, rates, currency):
+    """One line dataset per site/asset of a per-item Series, in the display currency."""
+    values = rates.convert_series(series.values, 'USD', currency)
+    return [{
+        'label': name,
+        'data': data,
+        'fill': False,
+        'borderColor': COLORS[index % len(COLORS)],
+        'tension': 0.1
+    } for index, (name, data) in enumerate(zip(series.names, values))]
+
+# --- Payload builders, shared by the single-chart endpoints and dashboard_data ---
+
+def _columnar_payload(days, datasets, currency, points=False):
+    """
+    Compact form of a chart payload: the days once, as a start date and a step in
+    days (or day offsets from the start when unevenly spaced), plain value arrays,
+    and the styling shared by all datasets once in 'style'. chart_utils.js
+    (expandChartData) turns it back into the regular payload; points marks charts
+    whose data are {x, y} points rather than values aligned with labels.
+    """
+    axis = {'start': iso_days(days[:1])[0] if len(days) else None}
+    steps = np.diff(days).astype(np.int64)
+    if len(steps) and (steps != steps[0]).any():
+        # Downsampled or monthly series
+        axis['offsets'] = (days - days[0]).astype(np.int64).tolist()
+    else:
+        axis['step'] = int(steps[0]) if len(steps) else 1
+    shared = {
+        key: value for key, value in datasets[0].items()
+        if key not in ('label', 'data') and all(dataset.get(key) == value for dataset in datasets)
+    } if datasets else {}
+    return {
+        'format': 'columnar',
+        **axis,
+        'points': points,
+        'style': shared,
+        'datasets': [{key: value for key, value in dataset.items() if key not in shared} for dataset in datasets],
+        'currency': currency
+    }
+
+def _point_payload(series, rates, currency, label, color, max_points, columnar=False):
+    """A single {x, y} line dataset (bankroll, profit)."""
+    series = downsample(series, max_points)
+    dataset = {
+        'label': label,
+        'data': rates.convert_series(series.values, 'USD', currency),
+        'fill': False,
+        'borderColor': color,
+        'tension': 0.1
+    }
+    if columnar:
+        return _columnar_payload(series.days, [dataset], currency, points=True)
+    dataset['data'] = [{'x': day, 'y': value} for day, value in zip(iso_days(series.days), dataset['data'])]
+    return {
+        'datasets': [dataset],
+        'currency': currency
+    }
+
+def _bankroll_payload(chart, rates, currency, max_points, columnar=False):
+    # End-of-day totals, starting on the first day with a balance
+    return _point_payload(chart.bankroll, rates, currency, f'Total Bankroll ({currency})',
+                          'rgb(75, 192, 192)', max_points, columnar)
+
+def _profit_payload(chart, rates, currency, max_points, columnar=False):
+    # Profit = bankroll + cumulative withdrawals - cumulative deposits, per day
+    if not len(chart.profit.days):
+        return {'labels': [], 'datasets': []}
+    return _point_payload(chart.profit, rates, currency, f'Profit ({currency})',
+                          'rgb(0, 128, 0)', max_points, columnar) # Green color for profit
+
+def _items_payload(series, rates, currency, max_points, columnar=False):
+    """One forward-filled line per site/asset, valued at each record's own date's rate."""
+    if not series.names:
+        return {'labels': [], 'datasets': []}
+    series = downsample(series, max_points)
+    datasets = _item_datasets(series, rates, currency)
+    if columnar:
+        return _columnar_payload(series.days, datasets, currency)
+    return {
+        'labels': iso_days(series.days),
+        'datasets': datasets,
+        'currency': currency
+    }
+
+def _flow_payload(series, rates, currency, max_points, label, style, columnar=False):
+    """Daily bars of a flow, converted at the rate in effect on each transaction's date
+    (summed per bucket when there are more days than max_points)."""
+    if not len(series.days):
+        return {'labels': [], 'datasets': []}
+    series = bucket_sums(series, max_points)
+    dataset = {
+        'label': label,
+        'data': rates.convert_series(series.values, 'USD', currency), 'yAxisID': 'y',
+        'fill': False,
+        'type': 'bar',
+        'tension': 0.1
+    }
+    dataset.update(style)
+    if columnar:
+        return _columnar_payload(series.days, [dataset], currency)
+    return {
+        'labels': iso_days(series.days),
+        'datasets': [dataset],
+        'currency': currency
+    }
+
+def _deposits_payload(chart, rates, currency, max_points, columnar=False):
+    return _flow_payload(chart.deposits, rates, currency, max_points, f'Daily Deposits ({currency})',
+                         {'backgroundColor': 'rgba(75, 192, 192, 0.5)'}, columnar)
+
+def _withdrawals_payload(chart, rates, currency, max_points, columnar=False):
+    return _flow_payload(chart.withdrawals, rates, currency, max_points, f'Daily Withdrawals ({currency})',
+                         {'borderColor': 'rgb(255, 99, 132)'}, columnar) # Red color for withdrawals
+
+def _pie_payload(names, amounts_usd, rates, currency):
+    """Latest value of each site/asset at today's rates."""
+    return {
+        'labels': list(names),
+        'datasets': [{'data': rates.convert_series(amounts_usd, 'USD', currency)}],
+        'currency': currency
+    }
+
+def _chart_error(name, e):
+    current_app.logger.error(f"Error in {name}: {e}")
+    return jsonify({'error': str(e)}), 500
+
 @charts_bp.route("/charts")
 @login_required
 def charts_page():
@@ -33,576 +216,134 @@ def generic_chart_page(entity, chart_type):
 @login_required
 def get_bankroll_data():
     try:
-        # Get currency rates
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        # Get all site history
-        sites_data = db.session.query(
-            SiteHistory.amount,
-            SiteHistory.currency,
-            SiteHistory.recorded_at,
-            Sites.name
-        ).join(Sites, SiteHistory.site_id == Sites.id)\
-         .filter(SiteHistory.user_id == current_user.id).all()
-
-        # Get all asset history
-        assets_data = db.session.query(
-            AssetHistory.amount,
-            AssetHistory.currency,
-            AssetHistory.recorded_at,
-            Assets.name
-        ).join(Assets, AssetHistory.asset_id == Assets.id)\
-         .filter(AssetHistory.user_id == current_user.id).all()
-
-        all_data_points = []
-        for row in sites_data:
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            all_data_points.append({
-                'date': row.recorded_at,
-                'amount_usd': amount_usd,
-                'name': row.name,
-                'type': 'site'
-            })
-        for row in assets_data:
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            all_data_points.append({
-                'date': row.recorded_at,
-                'amount_usd': amount_usd,
-                'name': row.name,
-                'type': 'asset'
-            })
-
-        # Sort all points by date
-        all_points_sorted = sorted(all_data_points, key=lambda x: x['date'])
-
-        if not all_points_sorted:
-            return jsonify({'datasets': [{'label': 'Total Bankroll (USD)', 'data': [], 'fill': False, 'borderColor': 'rgb(75, 192, 192)', 'tension': 0.1}]})
-
-        # Determine min and max dates
-        min_day = all_points_sorted[0]['date'].date()
-        max_day = all_points_sorted[-1]['date'].date()
-
-        # Initialize charting data
-        chart_data = []
-        latest_values = {}
-        current_total = Decimal('0')
-        i = 0
-        current_day = min_day
-
-        while current_day <= max_day:
-            # Process all updates for this day (update running total)
-            while i < len(all_points_sorted) and all_points_sorted[i]['date'].date() == current_day:
-                point = all_points_sorted[i]
-                key = (point['name'], point['type'])
-                new_value = point['amount_usd']
-                old_value = latest_values.get(key, Decimal('0'))
-                current_total += new_value - old_value
-                latest_values[key] = new_value
-                i += 1
-
-            # Add one point for this day (using end-of-day total, or carried forward)
-            chart_data.append({
-                'x': current_day.isoformat(),
-                'y': float(round(current_total, 2))  # Convert to float for JSON serialization
-            })
-
-            # Move to next day
-            current_day += timedelta(days=1)
-
-        datasets = [{
-            'label': 'Total Bankroll (USD)',
-            'data': chart_data,
-            'fill': False,
-            'borderColor': 'rgb(75, 192, 192)',
-            'tension': 0.1
-        }]
-
-        return jsonify({
-            'datasets': datasets
-        })
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        return jsonify(_bankroll_payload(_user_chart_series(rates), rates, currency, _max_points(), _columnar()))
     except Exception as e:
-        current_app.logger.error(f"Error in get_bankroll_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_bankroll_data', e)
 
 @charts_bp.route("/poker_sites_historical_data")
 @login_required
 def get_poker_sites_historical_data():
     try:
-        # Get currency rates
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        # Get all site history
-        sites_data = db.session.query(
-            SiteHistory.amount, SiteHistory.currency, SiteHistory.recorded_at, Sites.name
-        ).join(Sites, SiteHistory.site_id == Sites.id)\
-         .filter(SiteHistory.user_id == current_user.id)\
-         .order_by(SiteHistory.recorded_at).all()
-
-        if not sites_data:
-            return jsonify({'datasets': []})
-
-        # Group data by site
-        site_data_points = {}
-        all_dates = set()
-        for row in sites_data:
-            site_name = row.name
-            date = row.recorded_at
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            if site_name not in site_data_points:
-                site_data_points[site_name] = []
-            site_data_points[site_name].append({
-                'date': date,
-                'amount_usd': amount_usd
-            })
-            all_dates.add(date.date())
-
-        if not all_dates:
-            return jsonify({'datasets': []})
-
-        # Determine the full date range for the chart's x-axis
-        min_day = min(all_dates)
-        max_day = max(all_dates)
-        
-        # This logic is for Chart.js time cartesian axis, which uses {x, y} data points
-        # instead of separate labels and data arrays. This is more robust for time-series data.
-        # The frontend will need to be adjusted to handle this data format.
-        # However, to minimize changes, we will stick to the labels/data format for now,
-        # but generate it more robustly.
-
-        date_range = []
-        if min_day and max_day:
-            current_day = min_day
-            while current_day <= max_day:
-                date_range.append(current_day)
-                current_day += timedelta(days=1)
-        labels = [d.isoformat() for d in date_range]
-        # Create datasets for each site
-        datasets = []
-        colors = [
-            'rgb(75, 192, 192)',  # Cyan
-            'rgb(255, 99, 132)',   # Red
-            'rgb(54, 162, 235)',   # Blue
-            'rgb(255, 206, 86)',   # Yellow
-            'rgb(153, 102, 255)',  # Purple
-            'rgb(255, 159, 64)'    # Orange
-        ]
-        color_index = 0
-
-        for site_name, points in site_data_points.items():
-            # points are already sorted by recorded_at from the query
-            data = []
-            last_known_value = Decimal('0.0')
-            points_iter = iter(points)
-            next_point = next(points_iter, None)
-
-            for day in date_range:
-                # Process all points for the current day, updating last_known_value
-                while next_point and next_point['date'].date() <= day:
-                    last_known_value = next_point['amount_usd']
-                    next_point = next(points_iter, None)
-                
-                data.append(float(round(last_known_value, 2)))
-            
-            if not data and points: # Handle case where all data is before the chart range
-                data = [float(round(points[-1]['amount_usd'], 2))] * len(labels)
-
-            datasets.append({
-                'label': site_name,
-                'data': data,
-                'fill': False,
-                'borderColor': colors[color_index % len(colors)],
-                'tension': 0.1
-            })
-            color_index += 1
-
-        return jsonify({
-            'labels': labels,
-            'datasets': datasets
-        })
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        return jsonify(_items_payload(_user_chart_series(rates).sites, rates, currency, _max_points(), _columnar()))
     except Exception as e:
-        current_app.logger.error(f"Error in get_poker_sites_historical_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_poker_sites_historical_data', e)
 
 @charts_bp.route("/assets_historical_data")
 @login_required
 def get_assets_historical_data():
     try:
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        assets_data = db.session.query(
-            AssetHistory.amount, AssetHistory.currency, AssetHistory.recorded_at, Assets.name
-        ).join(Assets, AssetHistory.asset_id == Assets.id)\
-         .filter(AssetHistory.user_id == current_user.id)\
-         .order_by(AssetHistory.recorded_at).all()
-
-        if not assets_data:
-            return jsonify({'labels': [], 'datasets': []})
-
-        asset_data_points = {}
-        dates = set()
-        all_dates = set()
-        for row in assets_data:
-            asset_name = row.name
-            date = row.recorded_at
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            if asset_name not in asset_data_points:
-                asset_data_points[asset_name] = []
-            asset_data_points[asset_name].append({
-                'date': date,
-                'amount_usd': amount_usd
-            })
-            all_dates.add(date.date())
-
-        if not all_dates:
-            return jsonify({'labels': [], 'datasets': []})
-
-        min_day = min(all_dates)
-        max_day = max(all_dates)
-        date_range = []
-        if min_day and max_day:
-            current_day = min_day
-            while current_day <= max_day:
-                date_range.append(current_day)
-                current_day += timedelta(days=1)
-        labels = [d.isoformat() for d in date_range]
-
-        datasets = []
-        colors = [
-            'rgb(75, 192, 192)', 'rgb(255, 99, 132)', 'rgb(54, 162, 235)',
-            'rgb(255, 206, 86)', 'rgb(153, 102, 255)', 'rgb(255, 159, 64)'
-        ]
-        color_index = 0
-        
-        for asset_name, points in asset_data_points.items():
-            data = []
-            last_known_value = Decimal('0.0')
-            points_iter = iter(points)
-            next_point = next(points_iter, None)
-
-            for day in date_range:
-                while next_point and next_point['date'].date() <= day:
-                    last_known_value = next_point['amount_usd']
-                    next_point = next(points_iter, None)
-                data.append(float(round(last_known_value, 2)))
-
-            datasets.append({
-                'label': asset_name,
-                'data': data,
-                'fill': False,
-                'borderColor': colors[color_index % len(colors)],
-                'tension': 0.1
-            })
-            color_index += 1
-
-        return jsonify({'labels': labels, 'datasets': datasets})
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        return jsonify(_items_payload(_user_chart_series(rates).assets, rates, currency, _max_points(), _columnar()))
     except Exception as e:
-        current_app.logger.error(f"Error in get_assets_historical_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_assets_historical_data', e)
 
 @charts_bp.route("/assets_pie_data")
 @login_required
 def get_assets_pie_data():
     try:
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        assets_data = db.session.query(
-            AssetHistory.asset_id, AssetHistory.amount, AssetHistory.currency, Assets.name
-        ).join(Assets, AssetHistory.asset_id == Assets.id)\
-         .filter(AssetHistory.user_id == current_user.id)\
-         .order_by(AssetHistory.recorded_at.desc()).all()
-
-        latest_asset_values = {}
-        for row in assets_data:
-            asset_id = row.asset_id
-            if asset_id not in latest_asset_values:
-                latest_asset_values[asset_id] = {
-                    'name': row.name,
-                    'amount_usd': Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-                }
-
-        labels = [value['name'] for value in latest_asset_values.values()]
-        data = [float(round(value['amount_usd'], 2)) for value in latest_asset_values.values()]
-
-        return jsonify({'labels': labels, 'datasets': [{'data': data}]})
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
 
+        return jsonify(_pie_payload(*_current_values(Assets, AssetBalance, 'asset_id', rates), rates, currency))
     except Exception as e:
-        current_app.logger.error(f"Error in get_assets_pie_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_assets_pie_data', e)
 
 @charts_bp.route("/profit_data")
 @login_required
 def get_profit_data():
     try:
-        # Get currency rates
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        # Get all site history
-        sites_data = db.session.query(
-            SiteHistory.amount, SiteHistory.currency, SiteHistory.recorded_at, Sites.name
-        ).join(Sites, SiteHistory.site_id == Sites.id)\
-         .filter(SiteHistory.user_id == current_user.id).all()
-
-        # Get all asset history
-        assets_data = db.session.query(
-            AssetHistory.amount, AssetHistory.currency, AssetHistory.recorded_at, Assets.name
-        ).join(Assets, AssetHistory.asset_id == Assets.id)\
-         .filter(AssetHistory.user_id == current_user.id).all()
-
-        # Get all deposits
-        deposits_data = db.session.query(Deposits.amount, Deposits.currency, Deposits.date)\
-            .filter(Deposits.user_id == current_user.id).all()
-
-        # Get all withdrawals
-        withdrawals_data = db.session.query(Drawings.amount, Drawings.currency, Drawings.date)\
-            .filter(Drawings.user_id == current_user.id).all()
-
-        all_financial_events = []
-
-        # Add site history
-        for row in sites_data:
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            all_financial_events.append({
-                'date': row.recorded_at,
-                'type': 'bankroll_update',
-                'name': row.name,
-                'entity_type': 'site',
-                'amount_usd': amount_usd
-            })
-
-        # Add asset history as bankroll changes
-        for row in assets_data:
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            all_financial_events.append({
-                'date': row.recorded_at,
-                'type': 'bankroll_update',
-                'name': row.name,
-                'entity_type': 'asset',
-                'amount_usd': amount_usd
-            })
-
-        # Add deposits
-        for row in deposits_data:
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            all_financial_events.append({
-                'date': row.date,
-                'type': 'deposit',
-                'amount_usd': amount_usd
-            })
-
-        # Add withdrawals
-        for row in withdrawals_data:
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            all_financial_events.append({
-                'date': row.date,
-                'type': 'withdrawal',
-                'amount_usd': amount_usd
-            })
-
-        # Sort all events by date
-        all_financial_events_sorted = sorted(all_financial_events, key=lambda x: x['date'])
-
-        if not all_financial_events_sorted:
-            return jsonify({'labels': [], 'datasets': []})
-
-        profit_data = []
-        current_bankroll = Decimal('0')
-        total_deposits = Decimal('0')
-        total_withdrawals = Decimal('0')
-        latest_bankroll_values = {} # To track latest value for each site/asset
-
-        # Determine min and max dates
-        min_day = all_financial_events_sorted[0]['date'].date()
-        max_day = all_financial_events_sorted[-1]['date'].date()
-
-        current_day = min_day
-        event_index = 0
-
-        while current_day <= max_day:
-            # Process all events for the current day
-            while (event_index < len(all_financial_events_sorted) and
-                   all_financial_events_sorted[event_index]['date'].date() == current_day):
-                
-                event = all_financial_events_sorted[event_index]
-                
-                if event['type'] == 'deposit':
-                    total_deposits += event['amount_usd']
-                elif event['type'] == 'withdrawal':
-                    total_withdrawals += event['amount_usd']
-                elif event['type'] == 'bankroll_update':
-                    key = (event['name'], event['entity_type'])
-                    new_value = event['amount_usd']
-                    old_value = latest_bankroll_values.get(key, Decimal('0'))
-                    current_bankroll += new_value - old_value
-                    latest_bankroll_values[key] = new_value
-                    
-                event_index += 1
-
-            # Calculate profit for the current day
-            profit_for_day = (current_bankroll + total_withdrawals) - total_deposits
-            
-            profit_data.append({
-                'x': current_day.isoformat(),
-                'y': float(round(profit_for_day, 2))
-            })
-            
-            current_day += timedelta(days=1)
-
-        datasets = [{
-            'label': 'Profit (USD)',
-            'data': profit_data,
-            'fill': False,
-            'borderColor': 'rgb(0, 128, 0)', # Green color for profit
-            'tension': 0.1
-        }]
-
-        return jsonify({
-            'datasets': datasets
-        })
-
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        return jsonify(_profit_payload(_user_chart_series(rates), rates, currency, _max_points(), _columnar()))
     except Exception as e:
-        current_app.logger.error(f"Error in get_profit_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_profit_data', e)
 
 @charts_bp.route("/withdrawals_data")
 @login_required
 def get_withdrawals_data():
     try:
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        withdrawals_raw = db.session.query(Drawings.amount, Drawings.currency, Drawings.date)\
-            .filter(Drawings.user_id == current_user.id).order_by(Drawings.date).all()
-
-        if not withdrawals_raw:
-            return jsonify({'labels': [], 'datasets': []})
-
-        withdrawals_by_date = {}
-        dates = set()
-        for row in withdrawals_raw:
-            date = row.date.date()
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            
-            if date not in withdrawals_by_date:
-                withdrawals_by_date[date] = Decimal('0')
-            withdrawals_by_date[date] += amount_usd
-
-        min_day = min(withdrawals_by_date.keys())
-        max_day = max(withdrawals_by_date.keys())
-
-        date_range = []
-        current_day = min_day
-        while current_day <= max_day:
-            date_range.append(current_day)
-            current_day += timedelta(days=1)
-
-        labels = [d.isoformat() for d in date_range]
-        data = [float(round(withdrawals_by_date.get(d, Decimal('0')), 2)) for d in date_range]
-
-        cumulative_data = [sum(data[:i+1]) for i in range(len(data))]
-
-        datasets = [{
-            'label': 'Daily Withdrawals (USD)',
-            'data': data, 'yAxisID': 'y',
-            'fill': False,
-            'borderColor': 'rgb(255, 99, 132)', # Red color for withdrawals
-            'type': 'bar',
-            'tension': 0.1
-        }]
-
-        return jsonify({
-            'labels': labels,
-            'datasets': datasets
-        })
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        return jsonify(_withdrawals_payload(_user_chart_series(rates), rates, currency, _max_points(), _columnar()))
     except Exception as e:
-        current_app.logger.error(f"Error in get_withdrawals_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_withdrawals_data', e)
 
 @charts_bp.route("/deposits_data")
 @login_required
 def get_deposits_data():
     try:
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
-
-        deposits_raw = db.session.query(Deposits.amount, Deposits.currency, Deposits.date)\
-            .filter(Deposits.user_id == current_user.id).order_by(Deposits.date).all()
-
-        if not deposits_raw:
-            return jsonify({'labels': [], 'datasets': []})
-
-        deposits_by_date = {}
-        dates = set()
-        for row in deposits_raw:
-            date = row.date.date()
-            amount_usd = Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-            
-            if date not in deposits_by_date:
-                deposits_by_date[date] = Decimal('0')
-            deposits_by_date[date] += amount_usd
-
-        min_day = min(deposits_by_date.keys())
-        max_day = max(deposits_by_date.keys())
-
-        date_range = []
-        current_day = min_day
-        while current_day <= max_day:
-            date_range.append(current_day)
-            current_day += timedelta(days=1)
-
-        labels = [d.isoformat() for d in date_range]
-        data = [float(round(deposits_by_date.get(d, Decimal('0')), 2)) for d in date_range]
-
-        cumulative_data = [sum(data[:i+1]) for i in range(len(data))]
-
-        datasets = [{
-            'label': 'Daily Deposits (USD)',
-            'data': data, 'yAxisID': 'y',
-            'fill': False,
-            'backgroundColor': 'rgba(75, 192, 192, 0.5)',
-            'type': 'bar',
-            'tension': 0.1
-        }]
-
-        return jsonify({
-            'labels': labels,
-            'datasets': datasets
-        })
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        return jsonify(_deposits_payload(_user_chart_series(rates), rates, currency, _max_points(), _columnar()))
     except Exception as e:
-        current_app.logger.error(f"Error in get_deposits_data: {e}")
-        return jsonify({'error': str(e)}), 500
+        return _chart_error('get_deposits_data', e)
 
 @charts_bp.route("/poker_sites_pie_data")
 @login_required
 def get_poker_sites_pie_data():
     try:
-        currency_rates_query = db.session.query(Currency.code, Currency.rate).all()
-        currency_rates = {row.code: Decimal(str(row.rate)) for row in currency_rates_query}
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
 
-        sites_data = db.session.query(
-            SiteHistory.site_id, SiteHistory.amount, SiteHistory.currency, Sites.name
-        ).join(Sites, SiteHistory.site_id == Sites.id)\
-         .filter(SiteHistory.user_id == current_user.id)\
-         .order_by(SiteHistory.recorded_at.desc()).all()
+        return jsonify(_pie_payload(*_current_values(Sites, SiteBalance, 'site_id', rates), rates, currency))
+    except Exception as e:
+        return _chart_error('get_poker_sites_pie_data', e)
 
-        latest_site_values = {}
-        for row in sites_data:
-            site_id = row.site_id
-            if site_id not in latest_site_values:
-                latest_site_values[site_id] = {
-                    'name': row.name,
-                    'amount_usd': Decimal(str(row.amount)) / currency_rates.get(row.currency, Decimal('1.0'))
-                }
+# Every dataset dashboard_data can return, in response order
+DASHBOARD_FIELDS = ('bankroll', 'profit', 'poker_sites', 'assets', 'poker_sites_pie', 'assets_pie',
+                    'deposits', 'withdrawals')
 
-        labels = [value['name'] for value in latest_site_values.values()]
-        data = [float(round(value['amount_usd'], 2)) for value in latest_site_values.values()]
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 500
 
-        return jsonify({'labels': labels, 'datasets': [{'data': data}]})
+def _compressed_json(payload):
+    """jsonify(payload), gzip-encoded when the client accepts it and the body is large enough."""
+    response = jsonify(payload)
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] and response.content_length >= COMPRESS_MIN_SIZE:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
+@charts_bp.route("/dashboard_data")
+@login_required
+def get_dashboard_data():
+    """
+    Every chart dataset in one response, built from one read of the user's cached chart series.
+
+    ?fields= selects a comma-separated subset of DASHBOARD_FIELDS (default: all);
+    currency, granularity, start, end, max_points and format work as for the single charts.
+    Each field holds the same payload as the matching single-chart endpoint.
+    """
+    try:
+        rates = get_rate_snapshot()
+        currency = _display_currency(rates)
+        max_points = _max_points()
+        columnar = _columnar()
+        requested = request.args.get('fields')
+        fields = [field for field in DASHBOARD_FIELDS
+                  if requested is None or field in requested.split(',')]
+
+        chart = _user_chart_series(rates)
+        builders = {
+            'bankroll': lambda: _bankroll_payload(chart, rates, currency, max_points, columnar),
+            'profit': lambda: _profit_payload(chart, rates, currency, max_points, columnar),
+            'poker_sites': lambda: _items_payload(chart.sites, rates, currency, max_points, columnar),
+            'assets': lambda: _items_payload(chart.assets, rates, currency, max_points, columnar),
+            'poker_sites_pie': lambda: _pie_payload(
+                *_current_values(Sites, SiteBalance, 'site_id', rates), rates, currency),
+            'assets_pie': lambda: _pie_payload(
+                *_current_values(Assets, AssetBalance, 'asset_id', rates), rates, currency),
+            'deposits': lambda: _deposits_payload(chart, rates, currency, max_points, columnar),
+            'withdrawals': lambda: _withdrawals_payload(chart, rates, currency, max_points, columnar),
+        }
+        payload = {field: builders[field]() for field in fields}
+        payload['currency'] = currency
+        return _compressed_json(payload)
     except Exception as e:
-        current_app.logger.error(f"Error in get_poker_sites_pie_data: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return _chart_error('get_dashboard_data', e)
@@ -15,7 +15,13 @@ from wtforms import IntegerField, StringField, SubmitField, SelectField, RadioFi
 from wtforms.validators import DataRequired, Optional, ValidationError
 from operator import itemgetter
 from . import algo
-from ..data_utils import prepare_plo_rankings_data, sort_hand_string
+from ..cache_refresh import get_or_compute
+from ..cache_scopes import scoped_key
+from ..data_utils import (
+    prepare_plo_rankings_data, sort_hand_string, pack_range_payload,
+    build_tier_index, sample_tier_stratified,
+)
+import numpy as np
 import pandas as pd  # Added for optimization
 
 hand_eval_bp = Blueprint('hand_eval', __name__)
@@ -511,6 +517,11 @@ def switch_button_position():
         session['button_position'] = request.form.get('button_position', 1, type=int)
     return redirect(url_for('hand_eval.plo_hand_form'))
 
+def _cached_hand_analysis(hero_hand, opponent_hand, board):
+    """algo.analyze_hands, computed once per combination of cards (see the 'hand_analysis' policy)."""
+    key = scoped_key(f"hand_analysis_{''.join(hero_hand)}_{''.join(opponent_hand)}_{''.join(board)}")
+    return get_or_compute('hand_analysis', key, lambda: algo.analyze_hands(hero_hand, opponent_hand, board))
+
 @hand_eval_bp.route('/hand_details', methods=['POST', 'GET'])
 def submit_form():
     """Handles form submission and processes data."""
@@ -525,7 +536,7 @@ def submit_form():
     # If it's a POST request (form submission), validate and process.
     if hand_form.validate_on_submit():
         logging.debug(f"Request form data: {request.form}")
-        form_data = algo.process_hand_data(request.form, button_position)  # Assuming this is the full line; replace truncated part if needed
+        form_data = algo.process_hand_data(request.form, button_position, analyze=_cached_hand_analysis)  # Assuming this is the full line; replace truncated part if needed
         session['form_data'] = form_data
         return redirect(url_for('hand_eval.submit_form'))  # Redirect to GET to show details
 
@@ -557,6 +568,8 @@ def load_plo_hand_rankings_data(app):
         if df.index.name != 'Hand':
             df = df.set_index('Hand')
         app.config['PLO_HAND_DF'] = df
+        # Row positions per tier, used by the quiz to sample in O(k)
+        app.config['PLO_TIER_INDEX'] = build_tier_index(df['Tier'].to_numpy())
         app.logger.info(f"Successfully loaded optimized PLO hand data from {feather_path} ({len(df)} rows)")
         if df.empty:
             app.logger.warning(f"Loaded PLO hand data is empty from {feather_path}.")
@@ -664,6 +677,10 @@ def plo_range_data():
     API endpoint to serve PLO hand data for the range visualizer tool.
     Loads pre-processed data and returns it as JSON.
     Accepts 'start' and 'end' query parameters for percentile filtering.
+
+    With 'format=compact' the page is returned as a binary typed-array payload
+    (see data_utils.pack_range_payload) instead of JSON, and 'limit=0' returns
+    the whole filtered range in a single response.
     """
     try:
         start_percent = request.args.get('start', 0, type=float)
@@ -675,6 +692,11 @@ def plo_range_data():
         end_percent = 10
         page = 1
         limit = 50
+    response_format = request.args.get('format', 'json').lower()
+    compact = response_format == 'compact'
+    if limit <= 0 and not compact:
+        limit = 50
+    page = max(page, 1)
 
     current_app.logger.debug(f"Received request for PLO range: start={start_percent}%, end={end_percent}%, page={page}, limit={limit}")
 
@@ -707,9 +729,16 @@ def plo_range_data():
 
         # Paginate the filtered data
         total_records = len(filtered_df)
-        start_index = (page - 1) * limit
-        end_index = start_index + limit
-        paginated_df = filtered_df.iloc[start_index:end_index]
+        if limit > 0:
+            start_index = (page - 1) * limit
+            end_index = start_index + limit
+            paginated_df = filtered_df.iloc[start_index:end_index]
+        else:
+            paginated_df = filtered_df
+
+        if compact:
+            payload = pack_range_payload(paginated_df, total_records, page, max(limit, 0))
+            return current_app.response_class(payload, mimetype='application/octet-stream')
 
         # Data is already in the correct format, just need to add the HTML version of the hand
         df_out = paginated_df.copy()
@@ -728,6 +757,106 @@ def plo_range_data():
         current_app.logger.error(f"Error loading or processing PLO range data: {e}")
         return jsonify({'error': 'Internal server error while loading hand data.'}), 500
 
+# Bits used per question to store the chosen answer index in the session quiz state
+QUIZ_ANSWER_BITS = 3
+
+
+def _load_hud_quiz_data():
+    """Loads the HUD player type data used by the HUD stats quiz."""
+    with current_app.open_resource('data/hud_player_types.json', 'r') as f:
+        return json.load(f)
+
+
+def _generate_hand_strength_questions(seed, num_questions):
+    """Builds the hand strength quiz questions for a seed from the loaded hand data."""
+    df = current_app.config.get('PLO_HAND_DF')
+    if df is None or df.empty:
+        raise ValueError("Hand strength data is not loaded.")
+
+    tier_index = current_app.config.get('PLO_TIER_INDEX')
+    if tier_index is None:
+        tier_index = build_tier_index(df['Tier'].to_numpy())
+        current_app.config['PLO_TIER_INDEX'] = tier_index
+
+    # Always show all 5 tiers as answer options, as (value, label) tuples for the form
+    answers = [(str(tier), f"{tier} - {TIER_MAP.get(tier, 'Unknown')}") for tier in TIER_MAP]
+
+    # Draw an equal mix of tiers so the quiz isn't dominated by Trash/Marginal hands
+    rng = np.random.default_rng(seed)
+    questions = []
+    for correct_tier, position in sample_tier_stratified(tier_index, num_questions, rng=rng, mix='uniform'):
+        questions.append({
+            'question': df.index[position], # The hand string is the question
+            'answers': answers,
+            'correct_answer': str(correct_tier),
+            'is_hand_strength_quiz': True # Flag for the template
+        })
+    return questions
+
+
+def _generate_hud_stats_questions(seed, num_questions):
+    """Builds the HUD stats quiz questions for a seed."""
+    data = _load_hud_quiz_data()
+    rng = random.Random(seed)
+    player_types = data['player_types']
+    stats = data['stats']
+
+    questions = []
+    for _ in range(num_questions):
+        stat = rng.choice(stats)
+        player_type = rng.choice(player_types)
+        correct_answer = stat['values'][player_type['name']]
+
+        answers = [correct_answer]
+        while len(answers) < 4:
+            random_stat = rng.choice(stats)
+            random_player_type = rng.choice(player_types)
+            random_answer = random_stat['values'][random_player_type['name']]
+            if random_answer not in answers:
+                answers.append(random_answer)
+
+        rng.shuffle(answers)
+
+        questions.append({
+            'question': f"What is the typical {stat['name']} of a {player_type['name']}?",
+            'answers': answers,
+            'correct_answer': correct_answer
+        })
+    return questions
+
+
+def _generate_quiz_questions(state):
+    """
+    Regenerates the questions for a quiz state stored in the session.
+
+    Questions are derived deterministically from the state's seed, so only the
+    seed, quiz type, position and results need to be kept in the session cookie.
+    """
+    if state['t'] == 'plo_hand_strength':
+        return _generate_hand_strength_questions(state['s'], state['n'])
+    return _generate_hud_stats_questions(state['s'], state['n'])
+
+
+def _answer_values(question):
+    """Returns the submitted values for a question's answer choices, in display order."""
+    return [str(a[0]) if isinstance(a, (list, tuple)) else str(a) for a in question['answers']]
+
+
+def _start_quiz(quiz_type, num_questions):
+    """Stores a new compact quiz state in the session and redirects to the first question."""
+    session.pop('quiz_questions', None)
+    session.pop('incorrect_answers', None)
+    session['quiz'] = {
+        't': quiz_type,                 # quiz type
+        's': random.getrandbits(32),    # seed the questions are generated from
+        'n': num_questions,             # number of questions
+        'i': 0,                         # index of the current question
+        'r': 0,                         # bitmask of correctly answered questions
+        'a': 0,                         # chosen answer indexes, QUIZ_ANSWER_BITS per question
+    }
+    return redirect(url_for('hand_eval.quiz'))
+
+
 @hand_eval_bp.route('/plo-hand-strength-quiz', methods=['GET', 'POST'])
 def plo_hand_strength_quiz():
     """PLO Hand Strength Quiz page route."""
@@ -750,36 +879,7 @@ def plo_hand_strength_quiz():
             flash(f"Error loading data for quiz: {e}", "error")
             return redirect(url_for('hand_eval.plo_hand_strength_quiz'))
 
-        questions = []
-
-        # Use pandas.sample for efficient random selection
-        sampled_hands = df.sample(n=min(num_questions, len(df)))
-
-        for hand_str, hand_data in sampled_hands.iterrows():
-            correct_tier = hand_data['Tier']
-
-            # Always show all 5 tiers as answer options
-            all_answer_tiers = list(TIER_MAP.keys())
-
-            # Create the (value, label) tuples for the form
-            answers = []
-            for tier in all_answer_tiers:
-                label = f"{tier} - {TIER_MAP.get(tier, 'Unknown')}"
-                answers.append((str(tier), label))
-
-            questions.append({
-                'question': hand_str, # The hand string is the question
-                'answers': answers, # List of (value, label) tuples
-                'correct_answer': str(correct_tier),
-                'is_hand_strength_quiz': True # Flag for the template
-            })
-
-        session['quiz_questions'] = questions
-        session['current_question'] = 0
-        session['score'] = 0
-        session['incorrect_answers'] = []
-
-        return redirect(url_for('hand_eval.quiz'))
+        return _start_quiz('plo_hand_strength', num_questions)
     
     # If it's a GET request or validation fails, render the form page
     return render_template('quiz/plo_hand_strength_quiz.html', title='PLO Hand Strength Quiz', form=form, action_url=url_for('hand_eval.plo_hand_strength_quiz'))
@@ -810,90 +910,39 @@ def hud_stats_quiz():
     if form.validate_on_submit():
         num_questions = int(form.num_questions.data)
         try:
-            with current_app.open_resource('data/hud_player_types.json', 'r') as f:
-                data = json.load(f)
+            _load_hud_quiz_data()
         except (FileNotFoundError, json.JSONDecodeError) as e:
             flash(f"Could not load HUD player type data: {e}", "error")
             return redirect(url_for('hand_eval.hud_stats_quiz'))
 
-        questions = []
-        player_types = data['player_types']
-        stats = data['stats']
-
-        for _ in range(num_questions):
-            stat = random.choice(stats)
-            player_type = random.choice(player_types)
-            correct_answer = stat['values'][player_type['name']]
-
-            answers = [correct_answer]
-            while len(answers) < 4:
-                random_stat = random.choice(stats)
-                random_player_type = random.choice(player_types)
-                random_answer = random_stat['values'][random_player_type['name']]
-                if random_answer not in answers:
-                    answers.append(random_answer)
-            
-            random.shuffle(answers)
-
-            questions.append({
-                'question': f"What is the typical {stat['name']} of a {player_type['name']}?",
-                'answers': answers,
-                'correct_answer': correct_answer
-            })
-
-        session['quiz_questions'] = questions
-        session['current_question'] = 0
-        session['score'] = 0
-        session['incorrect_answers'] = []
-
-        return redirect(url_for('hand_eval.quiz'))
+        return _start_quiz('hud_stats', num_questions)
     
     # If it's a GET request or validation fails, render the form page
     return render_template('quiz/hud_stats_quiz.html', title='HUD Stats Quiz', form=form, action_url=url_for('hand_eval.hud_stats_quiz'))
 
 
+def _load_quiz_state():
+    """Returns the session quiz state and its regenerated questions, or (None, None)."""
+    state = session.get('quiz')
+    if not state:
+        return None, None
+    try:
+        return state, _generate_quiz_questions(state)
+    except (OSError, ValueError, KeyError) as e:
+        current_app.logger.error(f"Could not regenerate quiz questions: {e}")
+        flash("Could not load the quiz. Please start a new one.", "error")
+        session.pop('quiz', None)
+        return None, None
 
 
-
-    questions = []
-    player_types = data['player_types']
-    stats = data['stats']
-
-    for _ in range(num_questions):
-        stat = random.choice(stats)
-        player_type = random.choice(player_types)
-        correct_answer = stat['values'][player_type['name']]
-
-        answers = [correct_answer]
-        while len(answers) < 4:
-            random_stat = random.choice(stats)
-            random_player_type = random.choice(player_types)
-            random_answer = random_stat['values'][random_player_type['name']]
-            if random_answer not in answers:
-                answers.append(random_answer)
-        
-        random.shuffle(answers)
-
-        questions.append({
-            'question': f"What is the typical {stat['name']} of a {player_type['name']}?",
-            'answers': answers,
-            'correct_answer': correct_answer
-        })
-
-    session['quiz_questions'] = questions
-    session['current_question'] = 0
-    session['score'] = 0
-
-    return redirect(url_for('hand_eval.quiz'))
-
 @hand_eval_bp.route('/quiz', methods=['GET', 'POST'])
 def quiz():
     """Displays the current quiz question and handles answer submission."""
-    if 'quiz_questions' not in session:
+    state, questions = _load_quiz_state()
+    if state is None:
         return redirect(url_for('hand_eval.hud_stats_quiz'))
 
-    current_question_index = session.get('current_question', 0)
-    questions = session.get('quiz_questions', [])
+    current_question_index = state['i']
 
     if current_question_index >= len(questions):
         return redirect(url_for('hand_eval.quiz_results'))
@@ -904,18 +953,12 @@ def quiz():
 
     if form.validate_on_submit():
         user_answer = form.answer.data
+        choice_index = _answer_values(question).index(user_answer)
+        state['a'] |= choice_index << (QUIZ_ANSWER_BITS * current_question_index)
         if str(question['correct_answer']) == user_answer:
-            session['score'] = session.get('score', 0) + 1
-        else:
-            is_hand_quiz = question.get('is_hand_strength_quiz', False)
-            incorrect = {
-                'question': question['question'],
-                'your_answer': user_answer,
-                'correct_answer': question['correct_answer'],
-                'is_hand_strength_quiz': is_hand_quiz
-            }
-            session['incorrect_answers'].append(incorrect)
-        session['current_question'] = current_question_index + 1
+            state['r'] |= 1 << current_question_index
+        state['i'] = current_question_index + 1
+        session['quiz'] = state
         return redirect(url_for('hand_eval.quiz'))
 
     # Prepare the question for display (render hand images if needed)
@@ -937,19 +980,16 @@ def quiz():
 @hand_eval_bp.route('/quiz-results')
 def quiz_results():
     """Displays the quiz results."""
-    if 'quiz_questions' not in session:
+    state, questions = _load_quiz_state()
+    if state is None:
         return redirect(url_for('hand_eval.hud_stats_quiz'))
 
-    score = session.get('score', 0)
-    questions = session.get('quiz_questions', [])
+    score = bin(state['r']).count('1')
     total_questions = len(questions)
     percentage = (score / total_questions) * 100 if total_questions > 0 else 0
 
     # Determine which quiz was taken to set the correct 'Try Again' link
-    quiz_type = 'hud_stats' # default
-    if questions and questions[0].get('is_hand_strength_quiz'):
-        quiz_type = 'plo_hand_strength'
-
+    quiz_type = state['t']
 
     ratings = [
         {'name': 'Crusher', 'icon': 'bi-star-fill', 'min_score': 90},
@@ -970,7 +1010,19 @@ def quiz_results():
             user_rating = r
             break
 
-    incorrect_answers = session.get('incorrect_answers', [])
+    # Rebuild the incorrect answers from the stored answer choices
+    answer_mask = (1 << QUIZ_ANSWER_BITS) - 1
+    incorrect_answers = []
+    for i, question in enumerate(questions[:state['i']]):
+        if state['r'] >> i & 1:
+            continue
+        choice_index = (state['a'] >> (QUIZ_ANSWER_BITS * i)) & answer_mask
+        incorrect_answers.append({
+            'question': question['question'],
+            'your_answer': _answer_values(question)[choice_index],
+            'correct_answer': question['correct_answer'],
+            'is_hand_strength_quiz': question.get('is_hand_strength_quiz', False)
+        })
     
     # Prepare incorrect answers for display with card images
     for item in incorrect_answers:
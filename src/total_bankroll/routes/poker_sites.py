@@ -1,15 +1,15 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_security import login_required, current_user
-from sqlalchemy.orm import aliased
-from sqlalchemy import func, and_, inspect
+from sqlalchemy import and_, inspect
 from decimal import Decimal
 from flask_wtf import FlaskForm
 from wtforms import StringField, DecimalField, SelectField, SubmitField, DateTimeField
 from wtforms.validators import DataRequired, Length, Optional
 
-from ..models import db, Sites, SiteHistory, Currency
+from ..models import db, Sites, SiteHistory, SiteBalance
 from ..services import AchievementService
 from ..utils import get_sorted_currencies
+from ..rates import get_rate_snapshot
 from datetime import datetime, UTC
 import json, os
 
@@ -39,39 +39,16 @@ class EditSiteHistoryForm(FlaskForm):
 @login_required
 def poker_sites_page():
     """Poker Sites page."""
-    # Efficiently query for sites and their last two history records
-    history_ranked = db.session.query(
-        SiteHistory,
-        func.row_number().over(
-            partition_by=SiteHistory.site_id,
-            order_by=SiteHistory.recorded_at.desc()
-        ).label('rn')
-    ).filter(SiteHistory.user_id == current_user.id).subquery()
-
-    current_history = aliased(history_ranked)
-    previous_history = aliased(history_ranked)
-
-    # Subquery to get the first (chronologically earliest) history record per site
-    first_history_ranked = db.session.query(
-        SiteHistory,
-        func.row_number().over(
-            partition_by=SiteHistory.site_id,
-            order_by=SiteHistory.recorded_at.asc()
-        ).label('rn')
-    ).filter(SiteHistory.user_id == current_user.id).subquery()
-    first_history = aliased(first_history_ranked)
-
+    # Current, previous and first balances come from the maintained SiteBalance table
     sites_query = db.session.query(
         Sites,
-        current_history.c.amount.label('current_amount'),
-        current_history.c.currency.label('current_currency_code'),
-        previous_history.c.amount.label('previous_amount'),
-        previous_history.c.currency.label('previous_currency_code'),
-        first_history.c.amount.label('starting_amount'),
-        first_history.c.currency.label('starting_currency_code'),
-    ).outerjoin(current_history, (Sites.id == current_history.c.site_id) & (current_history.c.rn == 1))\
-     .outerjoin(previous_history, (Sites.id == previous_history.c.site_id) & (previous_history.c.rn == 2))\
-     .outerjoin(first_history, (Sites.id == first_history.c.site_id) & (first_history.c.rn == 1))\
+        SiteBalance.current_amount,
+        SiteBalance.current_currency.label('current_currency_code'),
+        SiteBalance.previous_amount,
+        SiteBalance.previous_currency.label('previous_currency_code'),
+        SiteBalance.first_amount.label('starting_amount'),
+        SiteBalance.first_currency.label('starting_currency_code'),
+    ).outerjoin(SiteBalance, Sites.id == SiteBalance.site_id)\
      .filter(Sites.user_id == current_user.id)\
      .order_by(Sites.display_order)
 
@@ -81,8 +58,8 @@ def poker_sites_page():
     total_previous = Decimal('0.0')
     total_starting = Decimal('0.0')
 
-    # Pre-fetch all currencies to avoid querying in a loop
-    all_currencies = {c.code: c for c in db.session.query(Currency).all()}
+    # Currencies come from the cached rate snapshot, so no query is needed
+    all_currencies = get_rate_snapshot().currencies
 
     for site, current_amount, current_currency_code, previous_amount, previous_currency_code, starting_amount, starting_currency_code in sites_query:
         curr_currency_obj = all_currencies.get(current_currency_code)
@@ -288,9 +265,8 @@ def site_history(site_id):
 
     history_raw = history_query.order_by(SiteHistory.recorded_at.desc()).all()
 
-    # This is a bit inefficient, but we need currency info.
-    # A better approach would be to join Currency in the main query.
-    all_currencies = {c.code: c for c in db.session.query(Currency).all()}
+    # Currency names and symbols come from the cached rate snapshot
+    all_currencies = get_rate_snapshot().currencies
     history_data = []
     for record in history_raw:
         record_dict = {c.key: getattr(record, c.key) for c in inspect(record).mapper.column_attrs}
@@ -14,13 +14,19 @@ This service encapsulates the core financial logic of the application.
 from typing import Optional, Dict, List, Any
 from datetime import datetime, UTC
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from .base import BaseService
+from .achievement_service import AchievementService
 from ..models import (
-    User, Sites, Assets, Deposits, Drawings,
-    SiteHistory, AssetHistory, Currency, db
+    User, Sites, Assets, Deposits, Drawings, Goal,
+    SiteHistory, AssetHistory, SiteBalance, AssetBalance, Currency, db
 )
 from ..extensions import cache
+from ..cache_scopes import RATES_SCOPE, invalidate, scoped_key, user_scope
+from ..cache_refresh import get_or_compute
+from ..request_memo import request_memo
+from ..utils import get_user_bankroll_data
+from ..rates import get_rate_snapshot
 
 
 class BankrollService(BaseService):
@@ -40,19 +46,33 @@ class BankrollService(BaseService):
         Invalidate cached bankroll data for a user.
         
         Called after any mutation (add/update/delete) to ensure fresh data.
+        Starts a new generation of the user's cache scope, which covers every
+        currency the values were cached in. Commits that write sites, assets,
+        their history, deposits or withdrawals do this on their own (see
+        on_bankroll_commit in models.py), including those made outside this service.
         
         Args:
             user_id: The user's ID
         """
-        cache.delete(f'bankroll_total_{user_id}')
-        cache.delete(f'bankroll_breakdown_{user_id}')
+        invalidate(user_scope(user_id))
         self._log_debug(f"Invalidated bankroll cache for user {user_id}")
     
+    @staticmethod
+    def _cache_key(prefix: str, user_id: int, currency_code: str) -> str:
+        """
+        Cache key for a per-user value in a currency (USD keeps the plain name), in the
+        user's scope and the rates scope, since every total is converted at current rates.
+        """
+        name = f'{prefix}_{user_id}' if currency_code == 'USD' else f'{prefix}_{user_id}_{currency_code}'
+        return scoped_key(name, user_scope(user_id), RATES_SCOPE)
+    
+    @request_memo
     def calculate_total_bankroll(self, user_id: int, currency_code: str = 'USD') -> Decimal:
         """
         Calculate the total bankroll for a user in the specified currency.
         
-        Cached for 5 minutes to improve dashboard performance.
+        Cached for 5 minutes to improve dashboard performance, and for the rest of
+        the request (see request_memo).
         
         Args:
             user_id: The user's ID
@@ -67,30 +87,37 @@ class BankrollService(BaseService):
             >>> print(f"Total: ${total}")
         """
         # Check cache first
-        cache_key = f'bankroll_total_{user_id}'
+        cache_key = self._cache_key('bankroll_total', user_id, currency_code)
         cached_value = cache.get(cache_key)
         if cached_value is not None:
             return cached_value
         
-        self._log_debug(f"Calculating total bankroll for user {user_id}")
+        self._log_debug(f"Calculating total bankroll for user {user_id} in {currency_code}")
         
-        data = self.get_bankroll_breakdown(user_id)
+        data = self.get_bankroll_breakdown(user_id, currency_code)
         result = data['total_bankroll']
         
         # Cache the result
         cache.set(cache_key, result, timeout=300)
         return result
     
-    def get_bankroll_breakdown(self, user_id: int) -> Dict[str, Decimal]:
+    @request_memo
+    def get_bankroll_breakdown(self, user_id: int, currency_code: str = 'USD') -> Dict[str, Decimal]:
         """
         Get complete bankroll breakdown for a user.
         
-        Calculates all key financial metrics with a single, efficient database query.
-        Uses conditional aggregation to sum up different types of records
-        (poker sites, assets, deposits, withdrawals) in one pass.
+        Calculates all key financial metrics with a single, efficient database query
+        (see utils.get_user_bankroll_data), so an uncached call is one round trip.
+        Other currencies are derived from the cached USD breakdown with one cross rate,
+        and cached under their own key. Only one worker at a time computes a missing
+        breakdown, and an expired one is refreshed in the background while it is still
+        served (see cache_refresh and the 'bankroll_breakdown' policy). Repeated calls
+        in one request return the same dictionary without reading the cache (see
+        request_memo); do not modify it.
         
         Args:
             user_id: The user's ID
+            currency_code: Currency code for the amounts (default: USD)
         
         Returns:
             Dictionary containing:
@@ -108,90 +135,61 @@ class BankrollService(BaseService):
             >>> data = service.get_bankroll_breakdown(user_id=1)
             >>> print(f"Profit: ${data['total_profit']}")
         """
-        # Check cache first
-        cache_key = f'bankroll_breakdown_{user_id}'
-        cached_value = cache.get(cache_key)
-        if cached_value is not None:
-            return cached_value
-        
-        self._log_debug(f"Getting bankroll breakdown for user {user_id}")
-        
-        # Subquery to rank site history records for each site
-        site_history_ranked = db.session.query(
-            SiteHistory,
-            func.row_number().over(
-                partition_by=SiteHistory.site_id,
-                order_by=SiteHistory.recorded_at.desc()
-            ).label('rn')
-        ).filter(SiteHistory.user_id == user_id).subquery()
-
-        # Subquery to rank asset history records for each asset
-        asset_history_ranked = db.session.query(
-            AssetHistory,
-            func.row_number().over(
-                partition_by=AssetHistory.asset_id,
-                order_by=AssetHistory.recorded_at.desc()
-            ).label('rn')
-        ).filter(AssetHistory.user_id == user_id).subquery()
-
-        # Calculate current and previous poker totals
-        current_poker_total = db.session.query(
-            func.sum(site_history_ranked.c.amount / Currency.rate)
-        ).select_from(site_history_ranked)\
-            .join(Currency, site_history_ranked.c.currency == Currency.code)\
-            .filter(site_history_ranked.c.rn == 1).scalar() or Decimal('0.0')
-        
-        previous_poker_total = db.session.query(
-            func.sum(site_history_ranked.c.amount / Currency.rate)
-        ).select_from(site_history_ranked)\
-            .join(Currency, site_history_ranked.c.currency == Currency.code)\
-            .filter(site_history_ranked.c.rn == 2).scalar() or Decimal('0.0')
-        
-        # Calculate current and previous asset totals
-        current_asset_total = db.session.query(
-            func.sum(asset_history_ranked.c.amount / Currency.rate)
-        ).select_from(asset_history_ranked)\
-            .join(Currency, asset_history_ranked.c.currency == Currency.code)\
-            .filter(asset_history_ranked.c.rn == 1).scalar() or Decimal('0.0')
-        
-        previous_asset_total = db.session.query(
-            func.sum(asset_history_ranked.c.amount / Currency.rate)
-        ).select_from(asset_history_ranked)\
-            .join(Currency, asset_history_ranked.c.currency == Currency.code)\
-            .filter(asset_history_ranked.c.rn == 2).scalar() or Decimal('0.0')
+        cache_key = self._cache_key('bankroll_breakdown', user_id, currency_code)
+        return get_or_compute('bankroll_breakdown', cache_key,
+                              lambda: self._compute_bankroll_breakdown(user_id, currency_code))
+    
+    def _compute_bankroll_breakdown(self, user_id: int, currency_code: str) -> Dict[str, Decimal]:
+        """Computes the uncached breakdown for get_bankroll_breakdown."""
+        self._log_debug(f"Getting bankroll breakdown for user {user_id} in {currency_code}")
+        
+        if currency_code == 'USD':
+            # All eight metrics come from one statement shared with utils
+            result = get_user_bankroll_data(user_id)
+        else:
+            cross_rate = get_rate_snapshot().cross_rate('USD', currency_code)
+            usd = self.get_bankroll_breakdown(user_id)
+            result = {key: value * cross_rate for key, value in usd.items()}
+        return result
+    
+    # Users per IN (...) list in the bulk queries, well below database parameter limits
+    BULK_CHUNK_SIZE = 500
 
-        # Calculate deposit and withdrawal totals
-        total_deposits = db.session.query(
-            func.sum(Deposits.amount / Currency.rate)
-        ).join(Currency, Deposits.currency == Currency.code)\
-            .filter(Deposits.user_id == user_id)\
-            .scalar() or Decimal('0.0')
+    def _balance_rows(self, item_model, balance_model, item_key, user_ids):
+        """
+        Fetches the latest balance of every site or asset owned by user_ids in one query.
 
-        total_withdrawals = db.session.query(
-            func.sum(Drawings.amount / Currency.rate)
-        ).join(Currency, Drawings.currency == Currency.code)\
-            .filter(Drawings.user_id == user_id)\
-            .scalar() or Decimal('0.0')
+        Joins the item with its maintained balance row and the balance's currency,
+        so no per-item history or rate lookups are needed.
 
-        # Calculate derived metrics
-        total_bankroll = current_poker_total + current_asset_total
-        total_profit = total_bankroll - total_deposits + total_withdrawals
+        Returns:
+            List of (item, balance, rate) rows ordered by user and display order.
+        """
+        item_id = getattr(balance_model, item_key)
+        return db.session.query(item_model, balance_model, Currency.rate)\
+            .join(balance_model, item_id == item_model.id)\
+            .outerjoin(Currency, Currency.code == balance_model.current_currency)\
+            .filter(item_model.user_id.in_(user_ids))\
+            .order_by(item_model.user_id, item_model.display_order, item_model.id)\
+            .all()
 
-        result = {
-            'current_poker_total': current_poker_total,
-            'previous_poker_total': previous_poker_total,
-            'current_asset_total': current_asset_total,
-            'previous_asset_total': previous_asset_total,
-            'total_deposits': total_deposits,
-            'total_withdrawals': total_withdrawals,
-            'total_bankroll': total_bankroll,
-            'total_profit': total_profit,
-        }
-        
-        # Cache the result
-        cache.set(cache_key, result, timeout=300)
+    def _group_balances(self, item_model, balance_model, item_key, value_key, user_ids):
+        """Builds {user_id: [balance dict, ...]} for user_ids, chunking large id lists."""
+        user_ids = list(dict.fromkeys(user_ids))
+        result = {user_id: [] for user_id in user_ids}
+        for offset in range(0, len(user_ids), self.BULK_CHUNK_SIZE):
+            chunk = user_ids[offset:offset + self.BULK_CHUNK_SIZE]
+            for item, balance, rate in self._balance_rows(item_model, balance_model, item_key, chunk):
+                result[item.user_id].append({
+                    'id': item.id,
+                    'name': item.name,
+                    value_key: balance.current_amount / (rate or Decimal('1.0')),
+                    'currency': balance.current_currency,
+                    'original_amount': balance.current_amount,
+                    'last_updated': balance.current_recorded_at,
+                })
         return result
-    
+
     def get_site_balances(self, user_id: int) -> List[Dict[str, Any]]:
         """
         Get all site balances for a user with their current values.
@@ -209,37 +207,22 @@ class BankrollService(BaseService):
             ...     print(f"{site['name']}: ${site['balance']}")
         """
         self._log_debug(f"Getting site balances for user {user_id}")
+        return self.get_site_balances_for_users([user_id])[user_id]
+    
+    def get_site_balances_for_users(self, user_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Get site balances for many users at once, e.g. for admin reports.
         
-        # Get sites with their latest history entry
-        sites = db.session.query(Sites).filter(Sites.user_id == user_id)\
-            .order_by(Sites.display_order).all()
-        
-        result = []
-        for site in sites:
-            # Get latest history entry for this site
-            latest_history = db.session.query(SiteHistory)\
-                .filter(SiteHistory.site_id == site.id)\
-                .order_by(SiteHistory.recorded_at.desc())\
-                .first()
-            
-            if latest_history:
-                # Convert to USD
-                currency_rate = db.session.query(Currency.rate)\
-                    .filter(Currency.code == latest_history.currency)\
-                    .scalar() or Decimal('1.0')
-                
-                balance_usd = latest_history.amount / currency_rate
-                
-                result.append({
-                    'id': site.id,
-                    'name': site.name,
-                    'balance': balance_usd,
-                    'currency': latest_history.currency,
-                    'original_amount': latest_history.amount,
-                    'last_updated': latest_history.recorded_at,
-                })
+        Issues one query per BULK_CHUNK_SIZE users.
         
-        return result
+        Args:
+            user_ids: The users' IDs
+        
+        Returns:
+            Dictionary mapping every requested user ID to its list of site balances
+            (same format as get_site_balances; empty for users without sites)
+        """
+        return self._group_balances(Sites, SiteBalance, 'site_id', 'balance', user_ids)
     
     def get_asset_values(self, user_id: int) -> List[Dict[str, Any]]:
         """
@@ -252,37 +235,22 @@ class BankrollService(BaseService):
             List of dictionaries containing asset information and values
         """
         self._log_debug(f"Getting asset values for user {user_id}")
+        return self.get_asset_values_for_users([user_id])[user_id]
+    
+    def get_asset_values_for_users(self, user_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Get asset values for many users at once, e.g. for admin reports.
         
-        # Get assets with their latest history entry
-        assets = db.session.query(Assets).filter(Assets.user_id == user_id)\
-            .order_by(Assets.display_order).all()
-        
-        result = []
-        for asset in assets:
-            # Get latest history entry for this asset
-            latest_history = db.session.query(AssetHistory)\
-                .filter(AssetHistory.asset_id == asset.id)\
-                .order_by(AssetHistory.recorded_at.desc())\
-                .first()
-            
-            if latest_history:
-                # Convert to USD
-                currency_rate = db.session.query(Currency.rate)\
-                    .filter(Currency.code == latest_history.currency)\
-                    .scalar() or Decimal('1.0')
-                
-                value_usd = latest_history.amount / currency_rate
-                
-                result.append({
-                    'id': asset.id,
-                    'name': asset.name,
-                    'value': value_usd,
-                    'currency': latest_history.currency,
-                    'original_amount': latest_history.amount,
-                    'last_updated': latest_history.recorded_at,
-                })
+        Issues one query per BULK_CHUNK_SIZE users.
         
-        return result
+        Args:
+            user_ids: The users' IDs
+        
+        Returns:
+            Dictionary mapping every requested user ID to its list of asset values
+            (same format as get_asset_values; empty for users without assets)
+        """
+        return self._group_balances(Assets, AssetBalance, 'asset_id', 'value', user_ids)
     
     def calculate_profit(self, user_id: int, start_date: Optional[datetime] = None,
                         end_date: Optional[datetime] = None) -> Decimal:
@@ -512,6 +480,98 @@ class BankrollService(BaseService):
             self.rollback()
             return False
     
+    def record_balances(self, user_id: int, site_amounts: Dict[int, Decimal],
+                        asset_amounts: Dict[int, Decimal],
+                        recorded_at: Optional[datetime] = None) -> Optional[int]:
+        """
+        Record new balances for many sites and assets at once, e.g. at the end of a session.
+        
+        All history rows are written with one bulk INSERT per table in a single
+        transaction; the balance listeners then refresh every touched item once.
+        Each amount keeps the currency of its item's latest balance (USD for items
+        without history), like a single update does. The cache is invalidated once,
+        and goals, streak and achievements are evaluated once for the whole batch.
+        
+        Args:
+            user_id: The user's ID
+            site_amounts: {site_id: new amount}
+            asset_amounts: {asset_id: new value}
+            recorded_at: Timestamp for every new row (default: now)
+        
+        Returns:
+            int: Number of history rows written, or None if an item is not owned
+            by the user or the write failed
+        """
+        self._log_info(f"Recording {len(site_amounts)} site and {len(asset_amounts)} asset balances "
+                       f"for user {user_id}")
+        recorded_at = recorded_at or datetime.now(UTC)
+        
+        try:
+            inserts = []
+            for item_model, history_model, balance_model, item_key, amounts in (
+                (Sites, SiteHistory, SiteBalance, 'site_id', site_amounts),
+                (Assets, AssetHistory, AssetBalance, 'asset_id', asset_amounts),
+            ):
+                if not amounts:
+                    continue
+                currencies = dict(
+                    db.session.query(item_model.id, balance_model.current_currency)
+                    .outerjoin(balance_model, getattr(balance_model, item_key) == item_model.id)
+                    .filter(item_model.user_id == user_id, item_model.id.in_(list(amounts)))
+                    .all()
+                )
+                missing = set(amounts) - set(currencies)
+                if missing:
+                    self._log_error(f"{item_model.__tablename__} {sorted(missing)} not found for user {user_id}")
+                    return None
+                inserts.append((history_model, [
+                    {item_key: item_id, 'user_id': user_id, 'amount': amount,
+                     'currency': currencies[item_id] or 'USD', 'recorded_at': recorded_at}
+                    for item_id, amount in amounts.items()
+                ]))
+            
+            if not inserts:
+                return 0
+            for history_model, rows in inserts:
+                db.session.execute(insert(history_model), rows)
+            if not self.commit():
+                return None
+        except Exception as e:
+            self._log_error(f"Failed to record balances: {str(e)}")
+            self.rollback()
+            return None
+        
+        self._invalidate_cache(user_id)
+        self._after_balances_recorded(user_id)
+        return sum(len(rows) for _, rows in inserts)
+    
+    def _after_balances_recorded(self, user_id: int) -> None:
+        """
+        Follow-up work for a batch of balance updates: completes reached goals, then
+        advances the streak and checks achievements, all against one fresh breakdown.
+        """
+        user = db.session.get(User, user_id)
+        if user is None:
+            return
+        
+        bankroll_data = self.get_bankroll_breakdown(user_id)
+        current_values = {
+            'bankroll_target': bankroll_data['total_bankroll'],
+            'profit_target': bankroll_data['total_profit'],
+        }
+        for goal in Goal.query.filter_by(user_id=user_id, status='active'):
+            current_value = current_values.get(goal.goal_type, bankroll_data['total_bankroll'])
+            if goal.target_value > 0 and current_value >= goal.target_value:
+                goal.status = 'completed'
+                goal.completed_at = datetime.now(UTC)
+                self._log_info(f"Goal {goal.id} completed for user {user_id}")
+        
+        # update_streak checks achievements itself when the streak advances
+        achievement_service = AchievementService()
+        if not achievement_service.update_streak(user):
+            achievement_service.check_achievements(user, bankroll_data=bankroll_data)
+        self.commit()
+    
     def record_deposit(self, user_id: int, amount: Decimal, 
                       currency: str, date: datetime) -> bool:
         """
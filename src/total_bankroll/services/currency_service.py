@@ -18,6 +18,9 @@ from datetime import datetime, UTC
 from .base import BaseService
 from ..models import Currency
 from ..extensions import cache
+from ..cache_scopes import RATES_SCOPE, currency_scope, scoped_key
+from ..rates import bump_rates_version, get_rate_snapshot
+from ..request_memo import request_memo
 
 
 class CurrencyService(BaseService):
@@ -32,6 +35,7 @@ class CurrencyService(BaseService):
         """Initialize the CurrencyService."""
         super().__init__()
     
+    @request_memo
     def convert(
         self,
         amount: Decimal,
@@ -59,7 +63,8 @@ class CurrencyService(BaseService):
             >>> print(f"€{euros}")
         """
         # Check cache first
-        cache_key = f'currency_convert_{from_currency}_{to_currency}_{amount}'
+        cache_key = scoped_key(f'currency_convert_{from_currency}_{to_currency}_{amount}',
+                               currency_scope(from_currency), currency_scope(to_currency))
         cached_value = cache.get(cache_key)
         if cached_value is not None:
             return cached_value
@@ -78,6 +83,7 @@ class CurrencyService(BaseService):
         cache.set(cache_key, result, timeout=86400)
         return result
     
+    @request_memo
     def get_exchange_rate(self, from_currency: str, to_currency: str) -> Decimal:
         """
         Get the current exchange rate between two currencies.
@@ -90,7 +96,8 @@ class CurrencyService(BaseService):
             Decimal: Exchange rate (1 from_currency = X to_currency)
         """
         # Check cache first
-        cache_key = f'currency_rate_{from_currency}_{to_currency}'
+        cache_key = scoped_key(f'currency_rate_{from_currency}_{to_currency}',
+                               currency_scope(from_currency), currency_scope(to_currency))
         cached_value = cache.get(cache_key)
         if cached_value is not None:
             return cached_value
@@ -116,9 +123,8 @@ class CurrencyService(BaseService):
         # TODO: Implement exchange rate API integration
         # Uses the EXCHANGE_RATE_API_KEY from config
         self._log_info("Updating exchange rates from API")
-        # Clear currency caches when rates are updated
-        # Use pattern matching to clear all currency-related caches
-        cache.clear()  # For SimpleCache, clear all (no pattern matching support)
+        # Invalidate the values cached with the old rates; other cached data is kept
+        bump_rates_version(get_rate_snapshot().codes)
         return False
     
     def get_all_currencies(self) -> Dict[str, Dict[str, any]]:
@@ -132,7 +138,7 @@ class CurrencyService(BaseService):
                 - rate: Exchange rate to USD
         """
         # Check cache first
-        cache_key = 'currency_all_currencies'
+        cache_key = scoped_key('currency_all_currencies', RATES_SCOPE)
         cached_value = cache.get(cache_key)
         if cached_value is not None:
             return cached_value
@@ -0,0 +1,250 @@
+"""
+Cache backend shared by every worker process on one machine.
+
+SimpleCache keeps its entries inside each worker, so after a write the other
+workers keep serving their own copy (for example bankroll_breakdown_{user_id})
+until it times out. SQLiteCache stores the entries in one SQLite database in WAL
+mode instead: every worker reads and writes the same file, a set or delete is
+visible to all of them as soon as it returns, and no external service such as
+Redis is needed (PythonAnywhere hosting has none).
+
+Entries expire after their timeout like in the other backends. When the cache
+holds more than threshold entries, expired ones are removed first and then the
+least recently used. The access time of an entry is refreshed at most once per
+ACCESS_RESOLUTION seconds, so most reads do not write to the database.
+
+Enable it with CACHE_TYPE=SQLiteCache (see create_app). The database file is
+CACHE_DIR/cache.sqlite3, or cache.sqlite3 in the instance folder if CACHE_DIR
+is not set; CACHE_THRESHOLD is the number of entries kept.
+
+scripts/benchmark_cache.py compares it with SimpleCache.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from time import time
+
+from cachelib.serializers import SimpleSerializer
+from flask_caching.backends.base import BaseCache
+
+logger = logging.getLogger(__name__)
+
+FILE_NAME = 'cache.sqlite3'
+
+# Seconds between two updates of an entry's access time
+ACCESS_RESOLUTION = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# Entries without an expiry time never expire
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    """
+    Flask-Caching backend storing pickled values in a SQLite database in WAL mode.
+
+    Args:
+        path: Database file, created if missing
+        threshold: Number of entries kept before the least recently used ones are evicted
+        default_timeout: Timeout in seconds of entries set without one (0 = never expire)
+        busy_timeout: Seconds to wait for another worker's write to finish
+    """
+
+    serializer = SimpleSerializer()
+
+    def __init__(self, path, threshold=500, default_timeout=300, ignore_delete_many_errors=False,
+                 busy_timeout=5.0):
+        super().__init__(default_timeout=default_timeout, ignore_delete_many_errors=ignore_delete_many_errors)
+        self.path = path
+        self._threshold = threshold or 500
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().execute(SCHEMA)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        directory = config.get('CACHE_DIR') or app.instance_path
+        args.insert(0, os.path.join(directory, FILE_NAME))
+        kwargs.update(threshold=config['CACHE_THRESHOLD'])
+        return cls(*args, **kwargs)
+
+    def _connection(self):
+        """Returns this thread's connection, opening a new one in forked worker processes."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            # isolation_level=None: statements commit on their own unless run in _transaction()
+            connection = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # With WAL, NORMAL only syncs at checkpoints; a crash can lose recent entries, never corrupt the file
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the enclosed statements as one write transaction, rolled back on errors.
+
+        BEGIN IMMEDIATE takes the write lock up front, so read-modify-write sequences
+        such as inc() cannot interleave with another worker's.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time() + timeout if timeout > 0 else None
+
+    def _prune(self, connection, now):
+        """Removes expired entries, then the least recently used, while over the threshold."""
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._threshold:
+            return
+        connection.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (now,))
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT '
+            '(SELECT MAX(COUNT(*) - ?, 0) FROM cache))', (self._threshold,)
+        )
+
+    def _touch(self, connection, keys, now):
+        """Marks keys as used now; skipped if another worker holds the write lock."""
+        try:
+            connection.execute(f"UPDATE cache SET accessed = ? WHERE key IN ({', '.join('?' * len(keys))})",
+                               (now, *keys))
+        except sqlite3.OperationalError:
+            pass
+
+    def get(self, key):
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys):
+        if not keys:
+            return []
+        now = time()
+        try:
+            connection = self._connection()
+            rows = connection.execute(
+                f"SELECT key, value, accessed FROM cache WHERE key IN ({', '.join('?' * len(keys))}) AND {LIVE}",
+                (*keys, now),
+            ).fetchall()
+            stale = [key for key, _, accessed in rows if accessed < now - ACCESS_RESOLUTION]
+            if stale:
+                self._touch(connection, stale, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed: {e}")
+            return [None] * len(keys)
+        values = {key: value for key, value, _ in rows}
+        return [self.serializer.loads(values[key]) if key in values else None for key in keys]
+
+    def set(self, key, value, timeout=None):
+        return bool(self.set_many({key: value}, timeout))
+
+    def set_many(self, mapping, timeout=None):
+        now = time()
+        expires = self._expires(timeout)
+        rows = [(key, self.serializer.dumps(value), expires, now) for key, value in mapping.items()]
+        try:
+            with self._transaction() as connection:
+                connection.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows)
+                self._prune(connection, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed: {e}")
+            return []
+        return list(mapping)
+
+    def add(self, key, value, timeout=None):
+        now = time()
+        try:
+            with self._transaction() as connection:
+                # Replaces an expired entry, keeps a live one
+                added = connection.execute(
+                    'INSERT INTO cache VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET '
+                    'value = excluded.value, expires = excluded.expires, accessed = excluded.accessed '
+                    'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                    (key, self.serializer.dumps(value), self._expires(timeout), now, now),
+                ).rowcount == 1
+                if added:
+                    self._prune(connection, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed: {e}")
+            return False
+        return added
+
+    def delete(self, key):
+        return bool(self.delete_many(key))
+
+    def delete_many(self, *keys):
+        if not keys:
+            return []
+        try:
+            with self._transaction() as connection:
+                connection.executemany('DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+        except sqlite3.Error as e:
+            if not self.ignore_delete_many_errors:
+                raise RuntimeError(f"Failed to delete keys: {list(keys)}") from e
+            logger.warning(f"Cache delete failed: {e}")
+            return []
+        return list(keys)
+
+    def has(self, key):
+        try:
+            return self._connection().execute(
+                f"SELECT 1 FROM cache WHERE key = ? AND {LIVE}", (key, time())
+            ).fetchone() is not None
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed: {e}")
+            return False
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM cache')
+        except sqlite3.Error as e:
+            logger.warning(f"Cache clear failed: {e}")
+            return False
+        return True
+
+    def inc(self, key, delta=1):
+        """Atomically adds delta to the value of key (missing or expired counts as 0), keeping its expiry."""
+        now = time()
+        try:
+            with self._transaction() as connection:
+                row = connection.execute(
+                    f"SELECT value, expires FROM cache WHERE key = ? AND {LIVE}", (key, now)
+                ).fetchone()
+                if row is None:
+                    value, expires = delta, self._expires(None)
+                else:
+                    value, expires = (self.serializer.loads(row[0]) or 0) + delta, row[1]
+                connection.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                                   (key, self.serializer.dumps(value), expires, now))
+                if row is None:
+                    self._prune(connection, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed: {e}")
+            return None
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
+
@@ -38,4 +38,77 @@ function displayCards(hand, container, cardImagePath) {
     img.style.width = 'auto';
     container.appendChild(img);
   });
-}
\ No newline at end of file
+}
+
+// Card encoding used by the compact range payload: code = rankIndex * 4 + suitIndex
+const COMPACT_RANKS = '23456789TJQKA';
+const COMPACT_SUITS = 'shdc';
+const SUIT_SYMBOLS = { s: '♠', h: '♥', d: '♦', c: '♣' };
+const COMPACT_HEADER_BYTES = 16;
+
+/**
+ * Decodes the binary payload served by /plo-range-data?format=compact.
+ * The typed arrays are views over the original buffer, so no data is copied.
+ * @param {ArrayBuffer} buffer - The response body.
+ * @returns {object} count, totalRecords, page, limit and the cards, strength,
+ *   percentile and type arrays (cards holds 4 bytes per hand).
+ */
+function decodeCompactRange(buffer) {
+  const header = new DataView(buffer, 0, COMPACT_HEADER_BYTES);
+  const count = header.getUint32(0, true);
+  let offset = COMPACT_HEADER_BYTES;
+
+  const cards = new Uint8Array(buffer, offset, count * 4);
+  offset += count * 4;
+  const strength = new Float32Array(buffer, offset, count);
+  offset += count * 4;
+  const percentile = new Float32Array(buffer, offset, count);
+  offset += count * 4;
+  const type = new Uint8Array(buffer, offset, count);
+
+  return {
+    count,
+    totalRecords: header.getUint32(4, true),
+    page: header.getUint32(8, true),
+    limit: header.getUint32(12, true),
+    cards,
+    strength,
+    percentile,
+    type,
+  };
+}
+
+/**
+ * Returns the hand string (e.g. 'AsKsQhJh') for row i of a decoded compact range.
+ * @param {object} range - The result of decodeCompactRange().
+ * @param {number} i - The row index.
+ * @returns {string} The hand string.
+ */
+function compactHandAt(range, i) {
+  let hand = '';
+  for (let j = i * 4; j < i * 4 + 4; j++) {
+    const code = range.cards[j];
+    hand += COMPACT_RANKS[code >> 2] + COMPACT_SUITS[code & 3];
+  }
+  return hand;
+}
+
+/**
+ * Formats a hand string with suit symbols, matching _pretty_print_hand on the server.
+ * @param {string} hand - The hand string (e.g. 'AsKsQhJh').
+ * @returns {string} The HTML markup for the hand.
+ */
+function handToHtml(hand) {
+  let html = '';
+  for (let i = 0; i < hand.length; i += 2) {
+    const rank = hand[i];
+    const suit = hand[i + 1].toLowerCase();
+    html += `<span class="suit-${suit}">${rank}${SUIT_SYMBOLS[suit] || suit}</span>`;
+  }
+  return html;
+}
+
+// Make the helpers globally available for inline scripts in templates
+window.decodeCompactRange = decodeCompactRange;
+window.compactHandAt = compactHandAt;
+window.handToHtml = handToHtml;
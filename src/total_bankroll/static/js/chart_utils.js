@@ -26,18 +26,13 @@ function getBackgroundColor(color) {
 }
 
 /**
- * Creates a Chart.js instance with enhanced default options.
- * @param {CanvasRenderingContext2D} ctx - The context of the canvas element.
+ * Applies the color palette to a chart's datasets.
  * @param {string} chartType - The type of chart (e.g., 'line', 'bar', 'pie').
- * @param {object} chartData - The data object for the chart (labels, datasets).
- * @param {object} customOptions - Custom options to merge with the defaults.
+ * @param {object[]} datasets - The chart's datasets, updated in place.
+ * @param {boolean} isDarkMode - Whether the dark theme is active.
  */
-function createChart(ctx, chartType, chartData, customOptions = {}) {
-    const isDarkMode = document.body.classList.contains('dark-mode');
-
-
-    // Apply the color palette to the datasets
-    chartData.datasets.forEach((dataset, index) => {
+function applyChartColors(chartType, datasets, isDarkMode) {
+    datasets.forEach((dataset, index) => {
         if (chartType === 'pie' || chartType === 'polarArea' || chartType === 'doughnut') {
             // For these chart types, each data point gets a color from the palette.
             dataset.backgroundColor = dataset.data.map((_, i) => getColor(i));
@@ -54,6 +49,22 @@ function createChart(ctx, chartType, chartData, customOptions = {}) {
             dataset.fill = (chartType === 'line' || chartType === 'radar'); // Fill area under line/radar
         }
     });
+}
+
+/**
+ * Creates a Chart.js instance with enhanced default options.
+ * @param {CanvasRenderingContext2D} ctx - The context of the canvas element.
+ * @param {string} chartType - The type of chart (e.g., 'line', 'bar', 'pie').
+ * @param {object} chartData - The data object for the chart (labels, datasets, and the
+ *                             optional currency code the chart endpoints return).
+ * @param {object} customOptions - Custom options to merge with the defaults.
+ */
+function createChart(ctx, chartType, chartData, customOptions = {}) {
+    const isDarkMode = document.body.classList.contains('dark-mode');
+    const currency = chartData.currency || 'USD';
+
+
+    applyChartColors(chartType, chartData.datasets, isDarkMode);
 
     const defaultOptions = {
         responsive: true,
@@ -95,7 +106,7 @@ function createChart(ctx, chartType, chartData, customOptions = {}) {
                             label += ': ';
                         }
                         if (context.parsed.y !== null) {
-                            label += new Intl.NumberFormat('en-US', { style: 'currency', currency: 'USD' }).format(context.parsed.y);
+                            label += new Intl.NumberFormat('en-US', { style: 'currency', currency: currency }).format(context.parsed.y);
                         }
                         return label;
                     }
@@ -134,6 +145,12 @@ function createChart(ctx, chartType, chartData, customOptions = {}) {
         finalOptions.plugins.title.color = isDarkMode ? '#f5f5f5' : '#343a40';
     }
 
+    // Axis titles are written as "Amount (USD)"; show the currency the data is in.
+    ['x', 'y'].forEach(axis => {
+        const title = finalOptions.scales?.[axis]?.title;
+        if (title?.text) title.text = title.text.replace('(USD)', `(${currency})`);
+    });
+
     // If no custom scale colors are provided, apply theme defaults.
     // This prevents the default theme from overwriting specific colors passed from a page.
     ['x', 'y', 'r'].forEach(axis => {
@@ -151,5 +168,123 @@ function createChart(ctx, chartType, chartData, customOptions = {}) {
     });
 }
 
-// Make the function globally available for inline scripts in templates
-window.createChart = createChart;
\ No newline at end of file
+/**
+ * Adds the optional chart data parameters (start, end, granularity, max_points, ...)
+ * to a chart data URL, skipping empty values.
+ * @param {string} url - The chart data endpoint.
+ * @param {object} params - Query parameters to add.
+ * @returns {string} The URL with the query string.
+ */
+function chartDataUrl(url, params = {}) {
+    const target = new URL(url, window.location.origin);
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') target.searchParams.set(key, value);
+    });
+    return target.pathname + target.search;
+}
+
+/**
+ * Expands a chart payload sent with format=columnar into the regular one: labels
+ * (or {x, y} points) rebuilt from the start date and step or day offsets, and the
+ * shared style copied into every dataset. Other payloads are returned unchanged.
+ * @param {object} payload - A chart endpoint payload.
+ * @returns {object} The payload with labels and datasets as Chart.js expects them.
+ */
+function expandChartData(payload) {
+    if (!payload || payload.format !== 'columnar') return payload;
+    const start = Date.parse(payload.start);
+    const dayMs = 24 * 60 * 60 * 1000;
+    const length = payload.datasets.length ? payload.datasets[0].data.length : 0;
+    const offsets = payload.offsets || Array.from({ length }, (_, i) => i * payload.step);
+    const days = offsets.map(offset => new Date(start + offset * dayMs).toISOString().slice(0, 10));
+    const datasets = payload.datasets.map(dataset => {
+        const expanded = { ...payload.style, ...dataset };
+        if (payload.points) expanded.data = dataset.data.map((y, i) => ({ x: days[i], y }));
+        return expanded;
+    });
+    return payload.points
+        ? { datasets, currency: payload.currency }
+        : { labels: days, datasets, currency: payload.currency };
+}
+
+/**
+ * Fetches a chart endpoint in the compact columnar format and expands it.
+ * @param {string} url - The chart data endpoint.
+ * @param {object} params - Optional currency, granularity, start, end and max_points.
+ * @returns {Promise<object>} Resolves to the regular chart payload.
+ */
+function fetchChartData(url, params = {}) {
+    return fetch(chartDataUrl(url, { ...params, format: 'columnar' }))
+        .then(response => response.json())
+        .then(expandChartData);
+}
+
+/**
+ * Fetches several chart datasets in one request from /charts/dashboard_data.
+ * @param {string[]} fields - Datasets to load (e.g. ['bankroll', 'profit', 'poker_sites_pie']).
+ * @param {object} params - Optional currency, granularity, start, end and max_points.
+ * @returns {Promise<object>} Resolves to { currency, <field>: <chart endpoint payload>, ... }.
+ */
+function fetchDashboardData(fields, params = {}) {
+    return fetch(chartDataUrl('/charts/dashboard_data', { ...params, fields: fields.join(','), format: 'columnar' }))
+        .then(response => response.json())
+        .then(data => {
+            fields.forEach(field => { if (data[field]) data[field] = expandChartData(data[field]); });
+            return data;
+        });
+}
+
+/**
+ * Adds zoom controls (granularity and date range) above a chart's canvas.
+ * Each change fetches only the requested window at the requested granularity
+ * from the server and redraws the chart with it.
+ * @param {Chart} chart - The chart created by createChart.
+ * @param {string} url - The chart data endpoint the chart was loaded from.
+ * @param {function} toChartData - Maps the endpoint's JSON to { labels, datasets }.
+ */
+function attachZoomControls(chart, url, toChartData) {
+    const controls = document.createElement('div');
+    controls.className = 'row g-2 align-items-end mb-3';
+    controls.innerHTML = `
+        <div class="col-auto">
+            <label class="form-label mb-0">Granularity</label>
+            <select class="form-select" data-param="granularity">
+                <option value="day">Daily</option>
+                <option value="week">Weekly</option>
+                <option value="month">Monthly</option>
+            </select>
+        </div>
+        <div class="col-auto">
+            <label class="form-label mb-0">From</label>
+            <input type="date" class="form-control" data-param="start">
+        </div>
+        <div class="col-auto">
+            <label class="form-label mb-0">To</label>
+            <input type="date" class="form-control" data-param="end">
+        </div>`;
+    chart.canvas.parentNode.insertBefore(controls, chart.canvas);
+
+    controls.addEventListener('change', () => {
+        const params = {};
+        controls.querySelectorAll('[data-param]').forEach(input => { params[input.dataset.param] = input.value; });
+        fetchChartData(url, params)
+            .then(data => {
+                const chartData = toChartData(data);
+                applyChartColors(chart.config.type, chartData.datasets, document.body.classList.contains('dark-mode'));
+                chart.data.labels = chartData.labels;
+                chart.data.datasets = chartData.datasets;
+                const time = chart.options.scales?.x?.time;
+                if (time) time.unit = params.granularity || 'day';
+                chart.update();
+            })
+            .catch(error => console.error('Error fetching chart data:', error));
+    });
+}
+
+// Make the functions globally available for inline scripts in templates
+window.createChart = createChart;
+window.chartDataUrl = chartDataUrl;
+window.expandChartData = expandChartData;
+window.fetchChartData = fetchChartData;
+window.fetchDashboardData = fetchDashboardData;
+window.attachZoomControls = attachZoomControls;
\ No newline at end of file
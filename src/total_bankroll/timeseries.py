@@ -0,0 +1,524 @@
+"""
+Daily chart series built from one load of a user's events.
+
+load_events() reads every site/asset history row, deposit and withdrawal of a user
+with a single UNION ALL query and converts all amounts to USD in one vectorized
+call (at the rate in effect on each row's date, see rates.py). build_chart_series()
+then resamples the events to calendar days with pandas: balances are the last
+record of each day forward-filled per item, flows are daily sums. The six chart
+datasets (bankroll, profit, poker sites, assets, deposits, withdrawals) all come
+out of that one pass, so no per-day Python loop is left in the chart endpoints.
+
+The daily values are kept per user in the cache as a DailyFrame, the only
+incrementally maintained per-day copy of these series, together with the
+generations of the global and user cache scopes it was built at (see
+cache_scopes.py). Every commit to the source tables invalidates the user scope
+and marks the user's frame dirty from the earliest day it touched (see
+models.py). get_daily_frame() then reloads and rebuilds only the days from that
+day on, splicing them onto the unchanged prefix: recording today's balance reads
+one day of events instead of the whole history. A frame whose scopes were
+invalidated without a marker (by the invalidate-cache command, say) is rebuilt
+in full. Frames are kept for CHART_FRAME_TIMEOUT only on a shared cache backend;
+with SimpleCache another worker's writes never reach this worker's copy, so there
+they expire after CACHE_DEFAULT_TIMEOUT like other cached values.
+
+Weekly and monthly views are rolled up from the daily series (balances keep the
+period's last value, flows its sum). The rollups are cached next to the frame and
+maintained with it: after a rebuild from a changed day, the periods before the
+one containing that day are kept and only the rest is rolled up again.
+chart_window() cuts out the requested date window with a binary search, so a
+zoomed chart only serializes the buckets in view.
+Long histories are thinned before they are sent: downsample() keeps the visual
+shape of line series (Largest-Triangle-Three-Buckets), bucket_sums() merges bars of
+daily flows so bucket totals are preserved.
+"""
+
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import literal, null, select, union_all
+
+from flask import current_app
+
+from .cache_scopes import GLOBAL_SCOPE, generations, shared_backend, user_scope
+from .extensions import cache
+from .models import db, SiteHistory, AssetHistory, Sites, Assets, Deposits, Drawings
+
+EVENT_COLUMNS = ['kind', 'item_id', 'name', 'amount', 'currency', 'at', 'id']
+
+# A daily series: days is a datetime64[D] array, values a float64 array aligned with
+# it (one row per item in names for per-item series, names is None otherwise).
+Series = namedtuple('Series', ['days', 'values', 'names'])
+
+ChartSeries = namedtuple('ChartSeries', ['bankroll', 'profit', 'sites', 'assets', 'deposits', 'withdrawals'])
+
+EMPTY_DAYS = np.array([], dtype='datetime64[D]')
+
+EVENT_KINDS = ('site', 'asset', 'deposit', 'withdrawal')
+
+# Balances of one item kind: ids and names in first-seen order, the day of each
+# item's first record, and a (len(ids), len(days)) float64 array of USD values.
+ItemBlock = namedtuple('ItemBlock', ['ids', 'names', 'first', 'values'])
+
+# All of a user's daily values in USD over a dense run of days. deposits and
+# withdrawals are daily sums; active[i, j] tells if days[j] has events of EVENT_KINDS[i].
+DailyFrame = namedtuple('DailyFrame', ['days', 'sites', 'assets', 'deposits', 'withdrawals', 'active'])
+
+# Cached DailyFrame of a user with the rates version and cache scope generations it
+# was built at and its rollups, and the marker holding the earliest day changed since
+# (see get_daily_frame)
+CHART_FRAME_KEY = 'chart_frame_{}'
+CHART_DIRTY_KEY = 'chart_frame_dirty_{}'
+CHART_FRAME_TIMEOUT = 86400
+
+# Chart granularities and the pandas period each one groups days by (weeks start on Monday)
+GRANULARITIES = {'day': None, 'week': 'W-SUN', 'month': 'M'}
+
+# How each chart series rolls up: end-of-period value or sum over the period
+ROLLUP_METHODS = ChartSeries(bankroll='last', profit='last', sites='last', assets='last',
+                             deposits='sum', withdrawals='sum')
+
+
+def _empty(names=None):
+    values = np.zeros((0, 0)) if names is not None else np.zeros(0)
+    return Series(EMPTY_DAYS, values, names)
+
+
+def iso_days(days):
+    """Formats a datetime64[D] array as a list of YYYY-MM-DD strings."""
+    return np.datetime_as_string(days, unit='D').tolist()
+
+
+def load_events(user_id, since=None):
+    """
+    Returns a user's bankroll events as a DataFrame with EVENT_COLUMNS, sorted by
+    time. One query for the four source tables; since (a date) limits it to events
+    on or after that day.
+    """
+    since = datetime.combine(since, datetime.min.time()) if since is not None else None
+    parts = []
+    for kind, model, item_model, item_key, date_key in (
+        ('site', SiteHistory, Sites, 'site_id', 'recorded_at'),
+        ('asset', AssetHistory, Assets, 'asset_id', 'recorded_at'),
+        ('deposit', Deposits, None, None, 'date'),
+        ('withdrawal', Drawings, None, None, 'date'),
+    ):
+        at = getattr(model, date_key)
+        if item_model is not None:
+            item_id = getattr(model, item_key)
+            part = select(literal(kind).label('kind'), item_id.label('item_id'), item_model.name.label('name'),
+                          model.amount, model.currency, at.label('at'), model.id)\
+                .join(item_model, item_model.id == item_id)
+        else:
+            part = select(literal(kind).label('kind'), null().label('item_id'), null().label('name'),
+                          model.amount, model.currency, at.label('at'), model.id)
+        part = part.where(model.user_id == user_id)
+        if since is not None:
+            part = part.where(at >= since)
+        parts.append(part)
+    union = union_all(*parts).subquery()
+    rows = db.session.execute(select(union).order_by(union.c.at, union.c.id)).all()
+    return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+
+def _empty_block():
+    return ItemBlock([], [], EMPTY_DAYS, np.zeros((0, 0)))
+
+
+EMPTY_FRAME = DailyFrame(EMPTY_DAYS, _empty_block(), _empty_block(), np.zeros(0), np.zeros(0),
+                         np.zeros((len(EVENT_KINDS), 0), dtype=bool))
+
+
+def _balances(events, kind, days, carried):
+    """
+    Per-item end-of-day values over days: the last record of each day, carried
+    forward. Items of carried (an ItemBlock ending the day before days) keep their
+    position and start from their last value; new items follow in first-seen order
+    and are 0 before their first record.
+    """
+    part = events[events['kind'] == kind]
+    new = part.drop_duplicates('item_id')
+    new = new[~new['item_id'].isin(carried.ids)]
+    ids = list(carried.ids) + new['item_id'].tolist()
+    if part.empty:
+        wide = pd.DataFrame(np.nan, index=days, columns=ids)
+    else:
+        daily = part.groupby(['day', 'item_id'], sort=True)['usd'].last().unstack('item_id')
+        wide = daily.reindex(index=days, columns=ids).ffill()
+    if len(carried.ids):
+        wide = wide.fillna(dict(zip(carried.ids, carried.values[:, -1])))
+    return ItemBlock(
+        ids=ids,
+        names=list(carried.names) + new['name'].tolist(),
+        first=np.concatenate([carried.first, new['day'].values.astype('datetime64[D]')]),
+        values=wide.fillna(0.0).to_numpy().T.reshape(len(ids), len(days)),
+    )
+
+
+def _flows(events, kind, days):
+    """Daily totals of a flow kind over days (0 on days without transactions)."""
+    part = events[events['kind'] == kind]
+    return part.groupby('day')['usd'].sum().reindex(days, fill_value=0.0).to_numpy()
+
+
+def build_daily_frame(events, rates, prefix=None):
+    """
+    Resamples a user's events (see load_events) to a DailyFrame in USD.
+
+    With a prefix (a DailyFrame, usually from truncate_frame), events must all fall
+    after the prefix's last day: the new days are appended to it, its sites and
+    assets carry their balances over, and trailing days without events are dropped,
+    so the result equals a frame built from all events at once.
+
+    Args:
+        events: DataFrame from load_events
+        rates: RateSnapshot whose history converts amounts at their own date's rate
+        prefix: Optional DailyFrame to extend
+    """
+    prefix = prefix if prefix is not None else EMPTY_FRAME
+    events = events.assign(
+        usd=rates.history.to_usd_array(events['amount'], events['currency'], events['at']),
+        day=pd.to_datetime(events['at']).dt.normalize(),
+    )
+    if events.empty:
+        days = pd.DatetimeIndex([])
+    else:
+        start = prefix.days[-1] + 1 if len(prefix.days) else events['day'].min()
+        days = pd.date_range(start, events['day'].max(), freq='D')
+    day_array = days.values.astype('datetime64[D]')
+
+    sites = _balances(events, 'site', days, prefix.sites)
+    assets = _balances(events, 'asset', days, prefix.assets)
+    active = np.array([
+        np.isin(day_array, events.loc[events['kind'] == kind, 'day'].values) for kind in EVENT_KINDS
+    ]).reshape(len(EVENT_KINDS), len(days))
+
+    def pad(block, count):
+        # Items first seen in the new days are 0 on every prefix day
+        return np.vstack([block.values, np.zeros((count - len(block.ids), block.values.shape[1]))])
+
+    frame = DailyFrame(
+        days=np.concatenate([prefix.days, day_array]),
+        sites=sites._replace(values=np.hstack([pad(prefix.sites, len(sites.ids)), sites.values])),
+        assets=assets._replace(values=np.hstack([pad(prefix.assets, len(assets.ids)), assets.values])),
+        deposits=np.concatenate([prefix.deposits, _flows(events, 'deposit', days)]),
+        withdrawals=np.concatenate([prefix.withdrawals, _flows(events, 'withdrawal', days)]),
+        active=np.hstack([prefix.active, active]),
+    )
+    event_days = np.flatnonzero(frame.active.any(axis=0))
+    if not len(event_days):
+        return EMPTY_FRAME
+    return truncate_frame(frame, frame.days[event_days[-1]] + 1)
+
+
+def truncate_frame(frame, before):
+    """Cuts a DailyFrame down to the days before a day, dropping items first seen on or after it."""
+    before = np.datetime64(before, 'D')
+    cut = int(np.searchsorted(frame.days, before, 'left'))
+
+    def block(items):
+        keep = np.flatnonzero(items.first < before)
+        return ItemBlock([items.ids[i] for i in keep], [items.names[i] for i in keep],
+                         items.first[keep], items.values[keep, :cut])
+
+    return DailyFrame(frame.days[:cut], block(frame.sites), block(frame.assets), frame.deposits[:cut],
+                      frame.withdrawals[:cut], frame.active[:, :cut])
+
+
+def series_from_frame(frame):
+    """
+    The six daily chart series of a DailyFrame.
+
+    Bankroll and profit span the user's first to last event of any kind, with the
+    bankroll starting on its first non-zero day. Sites, assets, deposits and
+    withdrawals each span their own first to last event.
+    """
+    days = frame.days
+    if not len(days):
+        return ChartSeries(_empty(), _empty(), _empty([]), _empty([]), _empty(), _empty())
+
+    bankroll = frame.sites.values.sum(axis=0) + frame.assets.values.sum(axis=0)
+    profit = bankroll + frame.withdrawals.cumsum() - frame.deposits.cumsum()
+
+    def own_range(kind):
+        event_days = np.flatnonzero(frame.active[EVENT_KINDS.index(kind)])
+        return slice(event_days[0], event_days[-1] + 1) if len(event_days) else slice(0, 0)
+
+    def per_item(block, kind):
+        if not block.ids:
+            return _empty([])
+        span = own_range(kind)
+        return Series(days[span], block.values[:, span], list(block.names))
+
+    def flow(values, kind):
+        span = own_range(kind)
+        if span.stop == 0:
+            return _empty()
+        return Series(days[span], values[span], None)
+
+    nonzero = np.flatnonzero(np.round(bankroll, 2) != 0)
+    start = nonzero[0] if len(nonzero) else len(bankroll)
+    return ChartSeries(
+        bankroll=Series(days[start:], bankroll[start:], None),
+        profit=Series(days, profit, None),
+        sites=per_item(frame.sites, 'site'),
+        assets=per_item(frame.assets, 'asset'),
+        deposits=flow(frame.deposits, 'deposit'),
+        withdrawals=flow(frame.withdrawals, 'withdrawal'),
+    )
+
+
+def build_chart_series(events, rates):
+    """
+    Resamples a user's events (see load_events) to the six daily chart series in USD.
+
+    Args:
+        events: DataFrame from load_events
+        rates: RateSnapshot whose history converts amounts at their own date's rate
+    Returns:
+        ChartSeries of Series
+    """
+    return series_from_frame(build_daily_frame(events, rates))
+
+
+def get_chart_series(user_id, rates):
+    """Loads a user's events once and returns all six chart series in USD."""
+    return build_chart_series(load_events(user_id), rates)
+
+
+def _frame_timeout():
+    """A day on a shared cache backend, the default cache timeout on a per-process one."""
+    if shared_backend():
+        return CHART_FRAME_TIMEOUT
+    return current_app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+
+
+def mark_chart_series_dirty(changes):
+    """
+    Records that history changed on or after a day, for {user_id: date} changes.
+
+    Called after a commit (see models.py). Markers only move back in time until the
+    next get_daily_frame() consumes them; date.min forces a full rebuild.
+    """
+    for user_id, day in changes.items():
+        key = CHART_DIRTY_KEY.format(user_id)
+        marked = cache.get(key)
+        if marked is not None:
+            day = min(day, marked[0])
+        # The token tells apart two markers for the same day
+        cache.set(key, (day, time.time_ns()), timeout=_frame_timeout())
+
+
+def _rollup_from(previous, series, granularity, how, since):
+    """
+    Rolls a daily Series up like rollup(), reusing the buckets of its previous rollup
+    that end before since, the first changed day, and before the last bucket of
+    either (a series may end earlier or, over a gap, later than before).
+    """
+    if not len(previous.days) or not len(series.days):
+        return rollup(series, granularity, how)
+    changed = period_starts(np.array([since, series.days[-1]], dtype='datetime64[D]'), granularity)
+    start = min(changed.min(), previous.days[-1])
+    keep = int(np.searchsorted(previous.days, start, 'left'))
+    rest = rollup(window(series, start), granularity, how)
+    head = previous.values[..., :keep]
+    if series.names is not None:
+        # Items first seen from since on were dropped and re-added after the kept ones,
+        # and are 0 in every earlier bucket
+        head = head[:len(series.names)]
+        head = np.vstack([head, np.zeros((len(series.names) - len(head), keep))])
+    return Series(np.concatenate([previous.days[:keep], rest.days]), np.concatenate([head, rest.values], axis=-1),
+                  series.names)
+
+
+def _rollups(frame, previous=None, since=None):
+    """
+    {granularity: ChartSeries} of the frame's series for every granularity but 'day'.
+
+    With previous, the rollups of the frame this one was rebuilt from since (see
+    get_daily_frame), only the periods from the one containing since are rolled up.
+    """
+    chart = series_from_frame(frame)
+    rollups = {}
+    for granularity, period in GRANULARITIES.items():
+        if period is None:
+            continue
+        if previous is None:
+            rollups[granularity] = rollup_chart(chart, granularity)
+        else:
+            rollups[granularity] = ChartSeries(*(
+                _rollup_from(old, series, granularity, how, since)
+                for old, series, how in zip(previous[granularity], chart, ROLLUP_METHODS)
+            ))
+    return rollups
+
+
+def _get_cached_chart(user_id, rates):
+    """
+    Returns a user's DailyFrame and its rollups from the cache, bringing them up to date first.
+
+    A cached frame built at the current rates version and scope generations is
+    reused as is when no write marked it dirty. Otherwise only the days from the
+    earliest changed day onward are reloaded and rebuilt on top of the unchanged
+    prefix, and the rollups from the period containing that day; a missing frame,
+    new rates, invalidated scopes without a marker or a change on or before the
+    first day rebuild both from all events.
+    """
+    frame_key, dirty_key = CHART_FRAME_KEY.format(user_id), CHART_DIRTY_KEY.format(user_id)
+    # Read before the events, so writes committed while rebuilding leave the frame outdated
+    scopes = tuple(generations(GLOBAL_SCOPE, user_scope(user_id)))
+    cached = cache.get(frame_key)
+    dirty = cache.get(dirty_key)
+    frame, rollups = cached[2:] if cached is not None and cached[0] == rates.version else (None, None)
+    if frame is not None and cached[1] == scopes and dirty is None:
+        return frame, rollups
+
+    if frame is not None and dirty is not None and len(frame.days) \
+            and np.datetime64(dirty[0], 'D') > frame.days[0]:
+        since = dirty[0]
+        frame = build_daily_frame(load_events(user_id, since), rates, truncate_frame(frame, since))
+        rollups = _rollups(frame, rollups, since)
+    else:
+        frame = build_daily_frame(load_events(user_id), rates)
+        rollups = _rollups(frame)
+    cache.set(frame_key, (rates.version, scopes, frame, rollups), timeout=_frame_timeout())
+    # Writes committed while rebuilding left a newer marker; keep it for the next read
+    if dirty is not None and cache.get(dirty_key) == dirty:
+        cache.delete(dirty_key)
+    return frame, rollups
+
+
+def get_daily_frame(user_id, rates):
+    """Returns a user's DailyFrame from the cache, bringing it up to date first (see _get_cached_chart)."""
+    return _get_cached_chart(user_id, rates)[0]
+
+
+def get_cached_chart_series(user_id, rates, granularity='day'):
+    """Like chart_view(get_chart_series(...), granularity), served from the cached frame and rollups."""
+    frame, rollups = _get_cached_chart(user_id, rates)
+    if GRANULARITIES[granularity] is None:
+        return series_from_frame(frame)
+    return rollups[granularity]
+
+
+def lttb_indices(values, max_points):
+    """
+    Picks at most max_points positions of a series with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket. For several series sharing one x-axis (a 2-D values
+    array, one row per series) the triangle areas are summed over the rows, so all
+    series keep the same days.
+
+    Args:
+        values: float array of shape (n,) or (series, n)
+        max_points: Maximum number of positions to keep (at least 3)
+    Returns:
+        Sorted int64 array of the kept positions
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    n = values.shape[1]
+    if n <= max_points:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    # max_points - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_start, next_stop = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = values[:, next_start:next_stop].mean(axis=1, keepdims=True)
+        a_y = values[:, a:a + 1]
+        areas = np.abs(
+            (x[a] - avg_x) * (values[:, start:stop] - a_y) - (x[a] - x[start:stop]) * (avg_y - a_y)
+        ).sum(axis=0)
+        a = start + int(np.argmax(areas))
+        kept[bucket + 1] = a
+    return kept
+
+
+def downsample(series, max_points):
+    """Thins a line Series (single or per-item) to at most max_points days with LTTB."""
+    if not max_points or len(series.days) <= max_points:
+        return series
+    kept = lttb_indices(series.values, max(max_points, 3))
+    return Series(series.days[kept], series.values[..., kept], series.names)
+
+
+def bucket_sums(series, max_points):
+    """
+    Merges a daily flow Series into at most max_points consecutive buckets, each
+    labelled with its first day and holding the sum of its days.
+    """
+    count = len(series.days)
+    if not max_points or count <= max_points:
+        return series
+    starts = np.linspace(0, count, max_points + 1).astype(np.int64)[:-1]
+    return Series(series.days[starts], np.add.reduceat(series.values, starts, axis=-1), series.names)
+
+
+def period_starts(days, granularity):
+    """Returns the first day of the granularity period containing each of days."""
+    if GRANULARITIES[granularity] is None or not len(days):
+        return np.asarray(days, dtype='datetime64[D]')
+    periods = pd.PeriodIndex(pd.DatetimeIndex(days), freq=GRANULARITIES[granularity])
+    return periods.start_time.values.astype('datetime64[D]')
+
+
+def rollup(series, granularity, how='last'):
+    """
+    Rolls a daily Series up to weeks or months, labelled with each period's first day.
+
+    Args:
+        series: Daily Series
+        granularity: 'day', 'week' or 'month'
+        how: 'last' for balances (end-of-period value), 'sum' for flows
+    """
+    if GRANULARITIES[granularity] is None or not len(series.days):
+        return series
+    starts = period_starts(series.days, granularity)
+    # Days are sorted, so every period is one contiguous run
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    if how == 'sum':
+        values = np.add.reduceat(series.values, first, axis=-1)
+    else:
+        values = series.values[..., np.r_[first[1:] - 1, len(starts) - 1]]
+    return Series(starts[first], values, series.names)
+
+
+def window(series, start=None, end=None):
+    """Returns the part of series whose days fall within [start, end] (dates, either optional)."""
+    days = series.days
+    lo = np.searchsorted(days, np.datetime64(start, 'D'), 'left') if start is not None else 0
+    hi = np.searchsorted(days, np.datetime64(end, 'D'), 'right') if end is not None else len(days)
+    return Series(days[lo:hi], series.values[..., lo:hi], series.names)
+
+
+def rollup_chart(chart, granularity):
+    """Rolls every series of a daily ChartSeries up to granularity (see ROLLUP_METHODS)."""
+    return ChartSeries(*(rollup(series, granularity, how) for series, how in zip(chart, ROLLUP_METHODS)))
+
+
+def chart_window(chart, granularity='day', start=None, end=None):
+    """
+    Limits every series of a ChartSeries already at granularity to [start, end].
+
+    A start inside a week or month keeps that whole period, so zooming never
+    truncates the first bucket.
+    """
+    if start is not None:
+        start = period_starts(np.array([start], dtype='datetime64[D]'), granularity)[0]
+    return ChartSeries(*(window(series, start, end) for series in chart))
+
+
+def chart_view(chart, granularity='day', start=None, end=None):
+    """Returns every series of a daily ChartSeries at granularity, limited to [start, end]."""
+    return chart_window(rollup_chart(chart, granularity), granularity, start, end)
@@ -1,5 +1,6 @@
 from .models import db
-from .models import SiteHistory, AssetHistory, Deposits, Drawings, Currency, User
+from .models import SiteBalance, AssetBalance, Deposits, Drawings, Currency, User
+from .rates import rate_window_matches, rate_windows
 from sqlalchemy import func, case, literal_column
 from decimal import Decimal
 from itsdangerous import URLSafeTimedSerializer
@@ -12,13 +13,44 @@ def get_sorted_currencies():
     currencies = Currency.query.order_by(Currency.name).all()
     return [{'code': c.code, 'name': c.name, 'symbol': c.symbol} for c in currencies]
 
+def _bankroll_metric_rows(user_id):
+    """
+    Returns a UNION ALL of (metric, amount_usd) rows for every balance, deposit and
+    withdrawal of the user, already converted to USD.
+
+    Balances are valued at the current rate. Deposits and withdrawals are converted at
+    the rate in effect on their date, joined from the rate history windows.
+    """
+    def rows(metric, model, amount, currency, dated_by=None):
+        if dated_by is None:
+            rate = Currency.rate
+        else:
+            windows = rate_windows()
+            rate = func.coalesce(windows.c.rate, Currency.rate)
+        query = db.session.query(literal_column(f"'{metric}'").label('metric'),
+                                 (amount / rate).label('amount_usd'))\
+            .select_from(model)\
+            .join(Currency, currency == Currency.code)
+        if dated_by is not None:
+            query = query.outerjoin(windows, rate_window_matches(windows, currency, dated_by))
+        return query.filter(model.user_id == user_id)
+
+    return rows('current_poker', SiteBalance, SiteBalance.current_amount, SiteBalance.current_currency).union_all(
+        rows('previous_poker', SiteBalance, SiteBalance.previous_amount, SiteBalance.previous_currency),
+        rows('current_asset', AssetBalance, AssetBalance.current_amount, AssetBalance.current_currency),
+        rows('previous_asset', AssetBalance, AssetBalance.previous_amount, AssetBalance.previous_currency),
+        rows('deposits', Deposits, Deposits.amount, Deposits.currency, dated_by=Deposits.date),
+        rows('withdrawals', Drawings, Drawings.amount, Drawings.currency, dated_by=Drawings.date),
+    ).subquery()
+
+
 def get_user_bankroll_data(user_id):
     """
     Calculates all key financial metrics for a user with a single, efficient database query.
 
-    This function uses conditional aggregation to sum up different types of records
-    (poker sites, assets, deposits, withdrawals) in one pass, significantly improving
-    performance by reducing database round trips.
+    This function uses conditional aggregation over the unioned balance, deposit and
+    withdrawal rows, so all eight metrics come back in one database round trip.
+    BankrollService.get_bankroll_breakdown caches this result.
 
     Args:
         user_id: The ID of the user for whom to calculate the data.
@@ -26,62 +58,23 @@ def get_user_bankroll_data(user_id):
     Returns:
         A dictionary containing all calculated financial metrics.
     """
-    # Subquery to rank site history records for each site
-    site_history_ranked = db.session.query(
-        SiteHistory,
-        func.row_number().over(partition_by=SiteHistory.site_id, order_by=SiteHistory.recorded_at.desc()).label('rn')
-    ).filter(SiteHistory.user_id == user_id).subquery()
-
-    # Subquery to rank asset history records for each asset
-    asset_history_ranked = db.session.query(
-        AssetHistory,
-        func.row_number().over(partition_by=AssetHistory.asset_id, order_by=AssetHistory.recorded_at.desc()).label('rn')
-    ).filter(AssetHistory.user_id == user_id).subquery()
-
-    # Calculate totals using the ranked subqueries
-    current_poker_total = db.session.query(func.sum(site_history_ranked.c.amount / Currency.rate))\
-        .select_from(site_history_ranked)\
-        .join(Currency, site_history_ranked.c.currency == Currency.code)\
-        .filter(site_history_ranked.c.rn == 1).scalar() or Decimal('0.0')
-    previous_poker_total = db.session.query(func.sum(site_history_ranked.c.amount / Currency.rate))\
-        .select_from(site_history_ranked)\
-        .join(Currency, site_history_ranked.c.currency == Currency.code)\
-        .filter(site_history_ranked.c.rn == 2).scalar() or Decimal('0.0')
-    
-    current_asset_total = db.session.query(func.sum(asset_history_ranked.c.amount / Currency.rate))\
-        .select_from(asset_history_ranked)\
-        .join(Currency, asset_history_ranked.c.currency == Currency.code)\
-        .filter(asset_history_ranked.c.rn == 1).scalar() or Decimal('0.0')
-    previous_asset_total = db.session.query(func.sum(asset_history_ranked.c.amount / Currency.rate))\
-        .select_from(asset_history_ranked)\
-        .join(Currency, asset_history_ranked.c.currency == Currency.code)\
-        .filter(asset_history_ranked.c.rn == 2).scalar() or Decimal('0.0')
-
-    # Calculate deposit and withdrawal totals
-    total_deposits = db.session.query(func.sum(Deposits.amount / Currency.rate))\
-        .join(Currency, Deposits.currency == Currency.code)\
-        .filter(Deposits.user_id == user_id)\
-        .scalar() or Decimal('0.0')
+    metrics = _bankroll_metric_rows(user_id)
 
-    total_withdrawals = db.session.query(func.sum(Drawings.amount / Currency.rate))\
-        .join(Currency, Drawings.currency == Currency.code)\
-        .filter(Drawings.user_id == user_id)\
-        .scalar() or Decimal('0.0')
+    def total(*names):
+        return func.coalesce(func.sum(case((metrics.c.metric.in_(names), metrics.c.amount_usd), else_=0)), 0)
 
-    # Calculate derived metrics
-    total_bankroll = current_poker_total + current_asset_total
-    total_profit = total_bankroll - total_deposits + total_withdrawals
+    row = db.session.query(
+        total('current_poker').label('current_poker_total'),
+        total('previous_poker').label('previous_poker_total'),
+        total('current_asset').label('current_asset_total'),
+        total('previous_asset').label('previous_asset_total'),
+        total('deposits').label('total_deposits'),
+        total('withdrawals').label('total_withdrawals'),
+        total('current_poker', 'current_asset').label('total_bankroll'),
+        (total('current_poker', 'current_asset', 'withdrawals') - total('deposits')).label('total_profit'),
+    ).one()
 
-    return {
-        'current_poker_total': current_poker_total,
-        'previous_poker_total': previous_poker_total,
-        'current_asset_total': current_asset_total,
-        'previous_asset_total': previous_asset_total,
-        'total_deposits': total_deposits,
-        'total_withdrawals': total_withdrawals,
-        'total_bankroll': total_bankroll,
-        'total_profit': total_profit,
-    }
+    return {key: Decimal(str(value)) for key, value in row._asdict().items()}
 
 def generate_token(email):
     """Generates a secure token for password reset or email confirmation."""
@@ -27,13 +27,6 @@ def pytest_addoption(parser):
     )
 
 
-def pytest_generate_tests(metafunc):
-    """Parametrizes a test to run multiple times based on the --num-tests option."""
-    if "iteration" in metafunc.fixturenames:
-        num_tests_to_run = metafunc.config.getoption("num_tests")
-        metafunc.parametrize("iteration", range(num_tests_to_run))
-
-
 @pytest.fixture(scope='session')
 def app():
     """Create application for testing."""
@@ -318,7 +318,7 @@ class TestServiceIntegration:
 class TestServiceErrorHandling:
     """Test error handling across services."""
     
-    def test_bankroll_service_invalid_user(self, app):
+    def test_bankroll_service_invalid_user(self, app, db):
         """Test BankrollService with invalid user ID."""
         with app.app_context():
             service = BankrollService()
@@ -81,7 +81,7 @@ class TestBankrollService:
             assert hasattr(service, 'calculate_total_bankroll')
             assert hasattr(service, 'get_site_balances')
     
-    def test_calculate_total_bankroll_returns_decimal(self, app):
+    def test_calculate_total_bankroll_returns_decimal(self, app, db):
         """Test that calculate_total_bankroll returns a Decimal."""
         from src.total_bankroll.services import BankrollService
         
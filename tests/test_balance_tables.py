@@ -0,0 +1,260 @@
+"""Tests for the SiteBalance/AssetBalance tables maintained on history writes."""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from src.total_bankroll.models import (
+    Sites, Assets, SiteHistory, AssetHistory, SiteBalance, AssetBalance, Currency,
+)
+from src.total_bankroll.services import BankrollService
+from src.total_bankroll.utils import get_user_bankroll_data
+from tests.factories import UserFactory
+
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def site(db):
+    user = UserFactory()
+    db.session.commit()
+    site = Sites(name='PokerStars', user_id=user.id)
+    db.session.add(site)
+    db.session.commit()
+    return site
+
+
+def _record(db, site, amount, days, currency='USD'):
+    record = SiteHistory(site_id=site.id, user_id=site.user_id, amount=Decimal(amount),
+                         currency=currency, recorded_at=START + timedelta(days=days))
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def _balance(db, site):
+    db.session.expire_all()
+    return db.session.get(SiteBalance, site.id)
+
+
+def test_first_record_creates_balance(db, site):
+    _record(db, site, '100.00', 0)
+    balance = _balance(db, site)
+    assert balance.current_amount == Decimal('100.00')
+    assert balance.previous_amount is None
+    assert balance.first_amount == Decimal('100.00')
+    assert balance.user_id == site.user_id
+
+
+def test_balance_tracks_current_previous_and_first(db, site):
+    _record(db, site, '100.00', 0)
+    _record(db, site, '150.00', 1)
+    _record(db, site, '120.00', 2)
+    balance = _balance(db, site)
+    assert balance.current_amount == Decimal('120.00')
+    assert balance.previous_amount == Decimal('150.00')
+    assert balance.first_amount == Decimal('100.00')
+
+
+def test_backdated_record_only_changes_first(db, site):
+    _record(db, site, '100.00', 5)
+    _record(db, site, '150.00', 6)
+    _record(db, site, '50.00', 0)
+    balance = _balance(db, site)
+    assert balance.current_amount == Decimal('150.00')
+    assert balance.previous_amount == Decimal('100.00')
+    assert balance.first_amount == Decimal('50.00')
+
+
+def test_editing_and_deleting_history_refreshes_balance(db, site):
+    _record(db, site, '100.00', 0)
+    latest = _record(db, site, '150.00', 1)
+
+    latest.amount = Decimal('175.00')
+    latest.currency = 'EUR'
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    db.session.commit()
+    balance = _balance(db, site)
+    assert (balance.current_amount, balance.current_currency) == (Decimal('175.00'), 'EUR')
+
+    db.session.delete(db.session.get(SiteHistory, latest.id))
+    db.session.commit()
+    balance = _balance(db, site)
+    assert balance.current_amount == Decimal('100.00')
+    assert balance.previous_amount is None
+
+
+def test_bulk_delete_removes_balance(db, site):
+    _record(db, site, '100.00', 0)
+    SiteHistory.query.filter_by(site_id=site.id).delete()
+    db.session.commit()
+    assert _balance(db, site) is None
+
+
+def test_rollback_discards_balance_changes(db, site):
+    _record(db, site, '100.00', 0)
+    db.session.add(SiteHistory(site_id=site.id, user_id=site.user_id, amount=Decimal('999.00'),
+                               currency='USD', recorded_at=START + timedelta(days=1)))
+    db.session.flush()
+    db.session.rollback()
+    assert _balance(db, site).current_amount == Decimal('100.00')
+
+
+def test_totals_read_from_balance_tables(db, site):
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    asset = Assets(name='Wallet', user_id=site.user_id)
+    db.session.add(asset)
+    db.session.commit()
+    _record(db, site, '100.00', 0)
+    _record(db, site, '150.00', 1)
+    db.session.add(AssetHistory(asset_id=asset.id, user_id=site.user_id, amount=Decimal('20.00'),
+                                currency='EUR', recorded_at=START))
+    db.session.commit()
+    assert db.session.get(AssetBalance, asset.id).current_amount == Decimal('20.00')
+
+    data = get_user_bankroll_data(site.user_id)
+    assert data['current_poker_total'] == Decimal('150')
+    assert data['previous_poker_total'] == Decimal('100')
+    assert data['current_asset_total'] == Decimal('40')
+    assert data['previous_asset_total'] == Decimal('0')
+    assert data['total_bankroll'] == Decimal('190')
+
+    breakdown = BankrollService().get_bankroll_breakdown(site.user_id)
+    assert breakdown['total_bankroll'] == data['total_bankroll']
+
+
+def test_breakdown_is_one_round_trip(db, site):
+    from sqlalchemy import event
+    from src.total_bankroll.models import Deposits, Drawings
+
+    _record(db, site, '100.00', 0)
+    _record(db, site, '90.00', 1)
+    db.session.add_all([
+        Deposits(user_id=site.user_id, amount=Decimal('50.00'), currency='USD', date=START, last_updated=START),
+        Drawings(user_id=site.user_id, amount=Decimal('20.00'), currency='USD', date=START, last_updated=START),
+    ])
+    db.session.commit()
+    user_id = site.user_id
+
+    statements = []
+    engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        data = get_user_bankroll_data(user_id)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert len(statements) == 1
+    assert data['total_deposits'] == Decimal('50')
+    assert data['total_withdrawals'] == Decimal('20')
+    assert data['total_profit'] == Decimal('60')
+
+
+def test_site_and_asset_listing_for_many_users(db, site):
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    other = UserFactory()
+    db.session.commit()
+    second = Sites(name='GGPoker', user_id=site.user_id, display_order=2)
+    other_site = Sites(name='Party', user_id=other.id)
+    empty = Sites(name='Unused', user_id=site.user_id)
+    asset = Assets(name='Wallet', user_id=other.id)
+    db.session.add_all([second, other_site, empty, asset])
+    db.session.commit()
+    _record(db, site, '100.00', 0)
+    _record(db, site, '120.00', 1)
+    _record(db, second, '10.00', 0, currency='EUR')
+    _record(db, other_site, '5.00', 0)
+    db.session.add(AssetHistory(asset_id=asset.id, user_id=other.id, amount=Decimal('7.00'),
+                                currency='USD', recorded_at=START))
+    db.session.commit()
+
+    service = BankrollService()
+    balances = service.get_site_balances(site.user_id)
+    assert [(b['name'], b['balance'], b['currency']) for b in balances] == [
+        ('PokerStars', Decimal('120'), 'USD'), ('GGPoker', Decimal('20'), 'EUR'),
+    ]
+    assert balances[0]['last_updated'] == START + timedelta(days=1)
+
+    by_user = service.get_site_balances_for_users([site.user_id, other.id, 999])
+    assert [b['name'] for b in by_user[other.id]] == ['Party']
+    assert by_user[999] == []
+    assert len(by_user[site.user_id]) == 2
+
+    values = service.get_asset_values_for_users([site.user_id, other.id])
+    assert values[site.user_id] == []
+    assert [(v['name'], v['value']) for v in values[other.id]] == [('Wallet', Decimal('7'))]
+
+
+def test_record_balances_writes_batch_once(db, site):
+    from sqlalchemy import event
+    from src.total_bankroll.extensions import cache
+    from src.total_bankroll.models import Goal
+
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    second = Sites(name='GGPoker', user_id=site.user_id)
+    asset = Assets(name='Wallet', user_id=site.user_id)
+    db.session.add_all([second, asset])
+    db.session.commit()
+    _record(db, site, '100.00', 0, currency='EUR')
+    goal = Goal(user_id=site.user_id, target_value=Decimal('500'), end_date=START + timedelta(days=365))
+    db.session.add(goal)
+    db.session.commit()
+    cache.clear()
+    user_id, site_id, second_id, asset_id, goal_id = site.user_id, site.id, second.id, asset.id, goal.id
+
+    inserts = []
+    listener = lambda *args: inserts.append(args[2]) if args[2].startswith('INSERT INTO site_history') else None
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        written = BankrollService().record_balances(
+            user_id, {site_id: Decimal('300.00'), second_id: Decimal('50.00')}, {asset_id: Decimal('200.00')},
+            recorded_at=START + timedelta(days=2),
+        )
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert written == 3
+    assert len(inserts) == 1
+    db.session.expire_all()
+    # Each row keeps its item's latest currency
+    assert db.session.get(SiteBalance, site_id).current_currency == 'EUR'
+    assert db.session.get(SiteBalance, site_id).previous_amount == Decimal('100.00')
+    assert db.session.get(SiteBalance, second_id).current_currency == 'USD'
+    assert db.session.get(AssetBalance, asset_id).current_amount == Decimal('200.00')
+    assert BankrollService().calculate_total_bankroll(user_id) == Decimal('850')
+    assert db.session.get(Goal, goal_id).status == 'completed'
+
+
+def test_record_balances_rejects_other_users_items(db, site):
+    other = UserFactory()
+    db.session.commit()
+    other_site = Sites(name='Party', user_id=other.id)
+    db.session.add(other_site)
+    db.session.commit()
+
+    assert BankrollService().record_balances(site.user_id, {other_site.id: Decimal('1.00')}, {}) is None
+    assert BankrollService().record_balances(site.user_id, {}, {}) == 0
+    assert db.session.query(SiteHistory).count() == 0
+
+
+def test_bulk_update_returns_to_the_page_it_was_opened_from(app, db, site):
+    from flask_login import login_user
+    from src.total_bankroll.models import User
+    from src.total_bankroll.routes.balances import bulk_update
+
+    asset = Assets(name='Wallet', user_id=site.user_id)
+    db.session.add(asset)
+    db.session.commit()
+
+    def post(data):
+        with app.test_request_context('/balances/bulk_update', method='POST', data=data):
+            login_user(db.session.get(User, site.user_id))
+            return bulk_update().location
+
+    assert post({f'asset_{asset.id}': '10', 'next': 'poker_sites.poker_sites_page'}) == '/poker_sites'
+    assert post({f'asset_{asset.id}': '20'}) == '/assets'
+    assert post({f'site_{site.id}': '30', 'next': 'https://example.com/'}) == '/poker_sites'
+    assert db.session.get(AssetBalance, asset.id).current_amount == Decimal('20')
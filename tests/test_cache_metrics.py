@@ -0,0 +1,63 @@
+"""Tests for the per-namespace cache metrics."""
+
+from decimal import Decimal
+
+import pytest
+from flask_login import login_user
+from werkzeug.exceptions import NotFound
+
+from src.total_bankroll.cache_metrics import key_namespace, metrics
+from src.total_bankroll.extensions import cache
+from src.total_bankroll.models import User
+from src.total_bankroll.routes.admin import cache_metrics
+from src.total_bankroll.services import BankrollService
+from tests.factories import UserFactory
+
+
+def test_key_namespaces():
+    assert key_namespace('bankroll_total_1@17.18.19') == 'bankroll_total'
+    assert key_namespace('bankroll_breakdown_1_EUR@17') == 'bankroll_breakdown'
+    assert key_namespace('currency_convert_USD_EUR_100.50@17') == 'currency_convert'
+    assert key_namespace('cache_generation_global') == 'cache_generation_global'
+    assert key_namespace('view/articles.index//strategy/articles/?page=2@17') == 'view/articles.index'
+
+
+def test_cache_calls_are_counted_per_namespace(app, db):
+    user = UserFactory()
+    db.session.commit()
+    cache.clear()
+    metrics.reset()
+
+    service = BankrollService()
+    with app.test_request_context('/'):
+        service.calculate_total_bankroll(user.id)
+    with app.test_request_context('/'):
+        service.calculate_total_bankroll(user.id)
+    cache.set('currency_convert_USD_EUR_1', Decimal('0.9'))
+
+    namespaces = metrics.snapshot()['namespaces']
+    assert namespaces['bankroll_total']['hits'] == 1
+    assert namespaces['bankroll_total']['misses'] == 1
+    assert namespaces['bankroll_total']['sets'] == 1
+    assert namespaces['bankroll_breakdown']['gets'] == 1
+    assert namespaces['bankroll_total']['get_ms_avg'] >= 0
+    assert namespaces['currency_convert']['set_bytes_avg'] > 0
+
+
+def test_metrics_endpoint_is_for_admins_only(app, db, monkeypatch):
+    user = UserFactory(email='admin@example.com')
+    db.session.commit()
+    cache.get('bankroll_total_1')
+
+    with app.test_request_context('/admin/cache_metrics'):
+        login_user(db.session.get(User, user.id))
+        with pytest.raises(NotFound):
+            cache_metrics()
+
+    monkeypatch.setitem(app.config, 'ADMIN_EMAILS', ['admin@example.com'])
+    with app.test_request_context('/admin/cache_metrics?reset=1'):
+        login_user(db.session.get(User, user.id))
+        payload = cache_metrics().get_json()
+
+    assert payload['namespaces']['bankroll_total']['misses'] >= 1
+    assert 'bankroll_total' not in metrics.snapshot()['namespaces']
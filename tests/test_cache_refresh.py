@@ -0,0 +1,86 @@
+"""Tests for single-flight computation and stale-while-revalidate of cached values."""
+
+import threading
+import time
+
+import pytest
+
+from src.total_bankroll import cache_refresh
+from src.total_bankroll.cache_refresh import LOCK_KEY, get_or_compute, get_policy
+from src.total_bankroll.extensions import cache
+from src.total_bankroll.routes import algo
+from src.total_bankroll.routes.hand_eval import _cached_hand_analysis
+
+
+@pytest.fixture
+def policies(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CACHE_REFRESH_POLICIES', {
+        'fresh': {'fresh': 60, 'max_stale': 60, 'lock_timeout': 5},
+        'stale': {'fresh': 0, 'max_stale': 60, 'lock_timeout': 5},
+    })
+    with app.app_context():
+        cache.clear()
+        yield
+
+
+def test_values_are_computed_once(policies):
+    calls = []
+    compute = lambda: calls.append(1) or 'value'
+
+    assert get_or_compute('fresh', 'key', compute) == 'value'
+    assert get_or_compute('fresh', 'key', compute) == 'value'
+    assert len(calls) == 1
+    assert not cache.has(LOCK_KEY.format('key'))
+
+
+def test_waits_for_the_worker_holding_the_lock(policies):
+    cache.add(LOCK_KEY.format('key'), 'other worker', timeout=5)
+    threading.Timer(0.2, lambda: cache.set('key', ('computed elsewhere', time.time() + 60))).start()
+
+    assert get_or_compute('fresh', 'key', lambda: pytest.fail('computed twice')) == 'computed elsewhere'
+
+
+def test_stale_values_are_served_while_one_refresh_runs(policies, monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(cache_refresh, '_in_background', refreshes.append)
+    get_or_compute('stale', 'key', lambda: 'old')
+
+    assert get_or_compute('stale', 'key', lambda: 'new') == 'old'
+    assert get_or_compute('stale', 'key', lambda: 'newer') == 'old'
+    assert len(refreshes) == 1
+
+    refreshes[0]()
+    assert cache.get('key')[0] == 'new'
+    assert not cache.has(LOCK_KEY.format('key'))
+
+
+def test_background_refresh_runs_in_the_app_context(policies):
+    get_or_compute('stale', 'key', lambda: 'old')
+    assert get_or_compute('stale', 'key', lambda: get_policy('stale').max_stale) == 'old'
+
+    deadline = time.time() + 5
+    while cache.get('key')[0] == 'old' and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.get('key')[0] == 60
+
+
+def test_hand_analysis_is_cached_per_hand(app, monkeypatch):
+    calls = []
+    analyze_hands = algo.analyze_hands
+    monkeypatch.setattr(algo, 'analyze_hands', lambda *cards: calls.append(cards) or analyze_hands(*cards))
+    form = {
+        'small_blind': '1', 'big_blind': '2', 'hero_stack': '200', 'hero_position': 'BTN',
+        'hero_hand': 'AsKsQdJd', 'board': '2c7h9s', 'opponent_stack': '150', 'opponent_position': 'BB',
+        'opponent_hand': 'TcTd8h8c', 'pot_size': '20', 'bet_size': '10',
+    }
+    with app.app_context():
+        cache.clear()
+
+    with app.test_request_context('/'):
+        first = algo.process_hand_data(form, 1, analyze=_cached_hand_analysis)
+        second = algo.process_hand_data({**form, 'opponent_stack': '100'}, 1, analyze=_cached_hand_analysis)
+
+    assert len(calls) == 1
+    assert second['hero_equity'] == first['hero_equity']
+    assert second['actual_spr'] != first['actual_spr']
+
@@ -0,0 +1,105 @@
+"""Tests for generation-based cache scopes."""
+
+from datetime import datetime
+from decimal import Decimal
+
+from src.total_bankroll.cache_scopes import (
+    GLOBAL_SCOPE, RATES_SCOPE, currency_scope, generation, invalidate, scoped_key, user_scope,
+)
+from src.total_bankroll.extensions import cache
+from src.total_bankroll.models import Currency, Deposits, SiteHistory, Sites
+from src.total_bankroll.services import BankrollService, CurrencyService
+from tests.factories import UserFactory
+
+
+def test_invalidating_a_scope_changes_only_its_keys(app):
+    with app.app_context():
+        user_key = scoped_key('total_1', user_scope(1))
+        other_key = scoped_key('total_2', user_scope(2))
+        cache.set(user_key, 'old')
+
+        invalidate(user_scope(1))
+        assert scoped_key('total_1', user_scope(1)) != user_key
+        assert cache.get(scoped_key('total_1', user_scope(1))) is None
+        assert scoped_key('total_2', user_scope(2)) == other_key
+
+        invalidate(GLOBAL_SCOPE)
+        assert scoped_key('total_2', user_scope(2)) != other_key
+
+
+def test_generations_survive_eviction_without_repeating(app):
+    with app.app_context():
+        before = generation(user_scope(3))
+        cache.delete('cache_generation_user_3')
+        assert generation(user_scope(3)) > before
+
+
+def test_bankroll_writes_invalidate_every_currency_of_the_user(db):
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    user, other = UserFactory(), UserFactory()
+    db.session.commit()
+    user_id, other_id = user.id, other.id
+
+    service = BankrollService()
+    assert service.calculate_total_bankroll(user_id, 'EUR') == Decimal('0')
+    other_key = service._cache_key('bankroll_total', other_id, 'USD')
+
+    db.session.add(Deposits(user_id=user_id, amount=Decimal('100'), currency='USD', date=datetime(2025, 1, 1),
+                            last_updated=datetime(2025, 1, 1)))
+    db.session.commit()
+    service._invalidate_cache(user_id)
+
+    assert service.get_bankroll_breakdown(user_id, 'EUR')['total_deposits'] == Decimal('50')
+    assert service._cache_key('bankroll_total', other_id, 'USD') == other_key
+
+
+def test_rate_updates_keep_unrelated_cache_entries(db):
+    service = BankrollService()
+    user = UserFactory()
+    db.session.commit()
+    cache.set('view//strategy/articles/', 'page')
+    page_key = scoped_key('view//strategy/articles/')
+    bankroll_key = service._cache_key('bankroll_total', user.id, 'USD')
+    convert_key = scoped_key('currency_convert_USD_USD_1', currency_scope('USD'))
+    rates_version = generation(RATES_SCOPE)
+
+    CurrencyService().update_exchange_rates()
+
+    assert cache.get('view//strategy/articles/') == 'page'
+    assert scoped_key('view//strategy/articles/') == page_key
+    assert generation(RATES_SCOPE) == rates_version + 1
+    assert service._cache_key('bankroll_total', user.id, 'USD') != bankroll_key
+    assert scoped_key('currency_convert_USD_USD_1', currency_scope('USD')) != convert_key
+
+
+def test_currency_commit_invalidates_only_that_currency(db):
+    usd_key = scoped_key('currency_rate_USD_USD', currency_scope('USD'))
+    gbp_key = scoped_key('currency_rate_GBP_USD', currency_scope('GBP'), currency_scope('USD'))
+
+    db.session.add(Currency(code='GBP', name='British Pound', symbol='£', rate=Decimal('0.8')))
+    db.session.commit()
+
+    assert scoped_key('currency_rate_USD_USD', currency_scope('USD')) == usd_key
+    assert scoped_key('currency_rate_GBP_USD', currency_scope('GBP'), currency_scope('USD')) != gbp_key
+
+
+def test_direct_commits_invalidate_the_user_scope(db):
+    user, other = UserFactory(), UserFactory()
+    db.session.commit()
+    user_id, other_id = user.id, other.id
+
+    service = BankrollService()
+    assert service.calculate_total_bankroll(user_id) == Decimal('0')
+    other_key = service._cache_key('bankroll_total', other_id, 'USD')
+
+    # A route writing the models itself, without going through BankrollService
+    site = Sites(name='Stars', user_id=user_id)
+    db.session.add(site)
+    db.session.flush()
+    db.session.add(SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('250'), currency='USD',
+                               recorded_at=datetime(2025, 1, 1)))
+    db.session.commit()
+
+    assert service.calculate_total_bankroll(user_id) == Decimal('250')
+    assert service.get_bankroll_breakdown(user_id)['total_bankroll'] == Decimal('250')
+    assert service._cache_key('bankroll_total', other_id, 'USD') == other_key
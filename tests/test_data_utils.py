@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from total_bankroll.data_utils import (
+    COMPACT_RANGE_HEADER, CARD_RANKS, CARD_SUITS,
+    encode_hands_compact, pack_range_payload,
+    build_tier_index, sample_tier_stratified,
+)
+
+
+def _decode_hand(codes):
+    return "".join(CARD_RANKS[c >> 2] + CARD_SUITS[c & 3] for c in codes)
+
+
+def test_encode_hands_compact_round_trip():
+    hands = ['AsKsQhJh', '2c2d3h3s', 'TdTc9s8h']
+    codes = encode_hands_compact(hands)
+    assert codes.shape == (3, 4)
+    assert codes.dtype == np.uint8
+    assert [_decode_hand(row) for row in codes] == hands
+
+
+def test_encode_hands_compact_rejects_invalid_cards():
+    with pytest.raises(ValueError):
+        encode_hands_compact(['AsKsQhXx'])
+
+
+def test_pack_range_payload_layout():
+    df = pd.DataFrame({
+        'hand': ['AsAdKsKd', 'AhAcKhKc'],
+        'type': [1, 2],
+        'strength': [213.5, 201.0],
+        'percentile': [0.0, 0.5],
+    })
+    payload = pack_range_payload(df, total_records=10, page=1, limit=2)
+
+    count, total, page, limit = COMPACT_RANGE_HEADER.unpack_from(payload)
+    assert (count, total, page, limit) == (2, 10, 1, 2)
+    assert len(payload) == COMPACT_RANGE_HEADER.size + count * (4 + 4 + 4 + 1)
+
+    offset = COMPACT_RANGE_HEADER.size
+    cards = np.frombuffer(payload, dtype=np.uint8, count=8, offset=offset).reshape(2, 4)
+    strength = np.frombuffer(payload, dtype='<f4', count=2, offset=offset + 8)
+    percentile = np.frombuffer(payload, dtype='<f4', count=2, offset=offset + 16)
+    tiers = np.frombuffer(payload, dtype=np.uint8, count=2, offset=offset + 24)
+
+    assert [_decode_hand(row) for row in cards] == ['AsAdKsKd', 'AhAcKhKc']
+    assert strength.tolist() == [213.5, 201.0]
+    assert percentile.tolist() == [0.0, 0.5]
+    assert tiers.tolist() == [1, 2]
+
+
+def test_build_tier_index_groups_positions():
+    index = build_tier_index([5, 1, 5, 3, 5])
+    assert sorted(index) == [1, 3, 5]
+    assert index[5].tolist() == [0, 2, 4]
+    assert index[1].tolist() == [1]
+
+
+def test_sample_tier_stratified_uniform_mix():
+    tiers = np.array([5] * 9000 + [4] * 2000 + [1] * 1500)
+    index = build_tier_index(tiers)
+    rng = np.random.default_rng(42)
+
+    picks = sample_tier_stratified(index, 3000, rng=rng)
+
+    assert len(picks) == 3000
+    assert all(tiers[pos] == tier for tier, pos in picks)
+    counts = {t: sum(1 for tier, _ in picks if tier == t) for t in (1, 4, 5)}
+    # Each tier should get roughly a third of the draws despite the skewed data
+    assert all(800 < c < 1200 for c in counts.values())
+
+
+def test_sample_tier_stratified_is_reproducible():
+    index = build_tier_index([1, 2, 3, 4, 5] * 10)
+    first = sample_tier_stratified(index, 10, rng=np.random.default_rng(7))
+    second = sample_tier_stratified(index, 10, rng=np.random.default_rng(7))
+    assert first == second
+
+
+def test_sample_tier_stratified_never_repeats_a_hand():
+    tiers = np.array([5] * 1000 + [3] * 4 + [1] * 2)
+    index = build_tier_index(tiers)
+
+    for seed in range(20):
+        picks = sample_tier_stratified(index, 30, rng=np.random.default_rng(seed))
+        positions = [pos for _, pos in picks]
+        assert len(picks) == 30
+        assert len(set(positions)) == 30
+        assert all(tiers[pos] == tier for tier, pos in picks)
+
+    everything = sample_tier_stratified(index, 2000, rng=np.random.default_rng(0))
+    assert sorted(pos for _, pos in everything) == list(range(len(tiers)))
+
+
+def test_sample_tier_stratified_unknown_mix():
+    with pytest.raises(ValueError):
+        sample_tier_stratified(build_tier_index([1, 2]), 1, mix='bogus')
@@ -1,83 +1,101 @@
 import os
-import json
-import random
 import pytest
-from treys import Card
 
-# To test the simulation function, we need to import it from the script.
-# This requires adding the project root to the Python path so the import works.
+# To test the verification harness, we need to import it from the scripts directory.
 import sys
 
-# Add the project root directory to the Python path
+# Add the project root and the scripts directory to the Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'resources', 'useful_scripts'))
 
-# Now we can import the function to be tested
-from monte_carlo_plo_hand_eval import simulate_hand_equity, ITERATIONS_PER_HAND
+# Now we can import the functions to be tested
+import numpy as np
+from plo_batch_eval import card_from_str, simulate_equity_batched
+from plo_equity_store import open_store, sample_hand_equities
+from verify_simulations import chi2_sf, homogeneity_test, verify_dataset, verify_hand
 
-STATS_DIR = os.path.join(project_root, 'plo_hand_stats')
-TOLERANCE = 1.0  # Allowable margin of error in percent (e.g., 1.0 for +/- 1%)
+STORE_FILE = os.path.join(project_root, 'plo_hand_stats.sqlite')
 
 
-@pytest.fixture
-def random_hand_data_from_files():
-    """Pytest fixture to find data files, and pick a random one and a random hand from it."""
-    # Ensure the stats directory exists
-    if not os.path.isdir(STATS_DIR):
-        pytest.skip(f"Statistics directory not found: {STATS_DIR}")
+def _record(hand, wins, ties, losses, hand_id=0, class_id=0):
+    iterations = wins + ties + losses
+    return {
+        'hand_id': hand_id, 'class_id': class_id, 'hand': hand,
+        'wins': wins, 'ties': ties, 'losses': losses,
+        'win_pct': wins / iterations * 100, 'split_pct': ties / iterations * 100,
+    }
 
-    # Find all valid hand data files
-    json_files = [f for f in os.listdir(STATS_DIR) if f.startswith('hands_') and f.endswith('.json')]
-    if not json_files:
-        pytest.skip("No hand data files found in the stats directory.")
 
-    # Pick a random file and load its content
-    random_file = random.choice(json_files)
-    file_path = os.path.join(STATS_DIR, random_file)
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+@pytest.mark.parametrize('x, df, expected', [
+    (3.841459, 1, 0.05),
+    (5.991465, 2, 0.05),
+    (18.307038, 10, 0.05),
+    (0.0, 3, 1.0),
+])
+def test_chi2_sf_matches_known_quantiles(x, df, expected):
+    assert chi2_sf(x, df) == pytest.approx(expected, abs=1e-6)
 
-    # Pick a random hand record from the file
-    random_record = random.choice(data)
-    return random_record
 
+def test_homogeneity_test_identical_samples():
+    statistic, df, p_value = homogeneity_test((700, 10, 290), (700, 10, 290))
+    assert statistic == 0
+    assert df == 2
+    assert p_value == 1.0
 
-def test_simulation_verification(random_hand_data_from_files, iteration):
-    """
-    Tests that re-running a simulation for a specific hand produces results
-    that are statistically close to the pre-calculated results.
-    This test is parametrized by the --num-tests command line option.
-    """
-    print(f"\n--- Verification Run: {iteration + 1} ---")
-    stored_record = random_hand_data_from_files
 
-    # Extract the hand and its stored results
-    hand_str = stored_record['hand']
-    stored_win_pct = stored_record['win_pct']
-    stored_split_pct = stored_record['split_pct']
+def test_homogeneity_test_drops_empty_outcomes():
+    _, df, _ = homogeneity_test((700, 0, 300), (690, 0, 310))
+    assert df == 1
 
-    print(f"Verifying hand: {hand_str}")
-    print(f"Stored Win %: {stored_win_pct:.2f}")
-    print(f"Running new simulation with {ITERATIONS_PER_HAND} iterations...")
 
-    # Re-create the hand tuple from the string, ensuring canonical order
-    hero_hand_tuple = tuple(sorted([hand_str[i:i+2] for i in range(0, len(hand_str), 2)], key=Card.new))
+def test_verify_hand_passes_consistent_record():
+    hand = [card_from_str(c) for c in ('As', 'Ah', 'Ks', 'Kh')]
+    wins, ties, losses = simulate_equity_batched(hand, 20000, rng=np.random.default_rng(0))
+    result = verify_hand(_record('AsAhKsKh', wins, ties, losses), tolerance=3.0,
+                         batch_size=5000, max_iterations=20000)
+    assert result['status'] == 'pass'
+    # The equivalence check should stop before the trial cap
+    assert result['iterations'] < 20000
 
-    # Re-run the simulation for this hand to get fresh results
-    new_results = simulate_hand_equity(hero_hand_tuple)
-    new_win_pct = new_results['win_pct']
-    new_split_pct = new_results['split_pct']
 
-    print(f"New Win %: {new_win_pct:.2f}")
+def test_verify_hand_fails_corrupted_record_early():
+    # AAKK double-suited wins about 70%, not 90%
+    result = verify_hand(_record('AsAhKsKh', 90000, 300, 9700), batch_size=2000, max_iterations=20000)
+    assert result['status'] == 'fail'
+    assert result['iterations'] == 2000
 
-    # Assert that the new results are within the tolerance margin of the stored results
-    # We use pytest.approx to handle floating point comparisons and statistical variance.
-    assert new_win_pct == pytest.approx(stored_win_pct, abs=TOLERANCE), \
-        f"Win % deviation is too high. Stored: {stored_win_pct:.2f}, New: {new_win_pct:.2f}"
 
-    assert new_split_pct == pytest.approx(stored_split_pct, abs=TOLERANCE), \
-        f"Split % deviation is too high. Stored: {stored_split_pct:.2f}, New: {new_split_pct:.2f}"
+def test_verify_dataset_dedupes_classes_and_reports():
+    hand = [card_from_str(c) for c in ('As', 'Ah', 'Ks', 'Kh')]
+    wins, ties, losses = simulate_equity_batched(hand, 5000, rng=np.random.default_rng(1))
+    records = [
+        _record('AsAhKsKh', wins, ties, losses, hand_id=0, class_id=0),
+        _record('AdAcKdKc', wins, ties, losses, hand_id=1, class_id=0),
+    ]
+    report = verify_dataset(records, workers=1, batch_size=2500, max_iterations=5000)
+    assert report['hands'] == 1
+    assert report['passed']
+    assert 0 <= report['dataset_p_value'] <= 1
 
-    # The loss is just the remainder, so checking win/split is sufficient
-    # loss_pct = 100 - win_pct - split_pct
 
+def test_stored_simulations_verify(request):
+    """
+    Re-checks a sample of the stored simulations against fresh batched runs.
+    The sample size is set with the --num-tests command line option.
+    """
+    if not os.path.exists(STORE_FILE):
+        pytest.skip(f"Equity store not found: {STORE_FILE}")
+
+    conn = open_store(STORE_FILE)
+    try:
+        records = sample_hand_equities(conn, request.config.getoption("num_tests"))
+    finally:
+        conn.close()
+    if not records:
+        pytest.skip("No simulated hands found in the equity store.")
+
+    report = verify_dataset(records)
+    assert report['passed'], (
+        f"{len(report['failed_hands'])} hand(s) failed; dataset p = {report['dataset_p_value']:.4f}"
+    )
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The offline simulation scripts live outside the package, so add them to the path
+scripts_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'resources', 'useful_scripts'))
+sys.path.insert(0, scripts_dir)
+
+from plo_equity_store import (
+    completed_shards, export_json, get_hand_equity, open_store, populate_hands,
+    record_shard, sample_hand_equities,
+)
+from monte_carlo_plo_hand_eval import make_shards, simulate_class_equity
+
+
+@pytest.fixture
+def store(tmp_path):
+    conn = open_store(str(tmp_path / 'equity.sqlite'))
+    # Three hands in two classes
+    populate_hands(conn, ['AsAhKsKh', 'AdAcKdKc', '2s3h7d9c'], [0, 0, 1])
+    yield conn
+    conn.close()
+
+
+def test_make_shards_is_deterministic():
+    representatives = [(i, i + 1, i + 2, i + 3) for i in range(10)]
+    shards = make_shards(representatives, 4)
+    assert [shard_id for shard_id, _ in shards] == [0, 1, 2]
+    assert [len(tasks) for _, tasks in shards] == [4, 4, 2]
+    assert shards == make_shards(representatives, 4)
+    assert shards[2][1][0] == (8, representatives[8])
+
+
+def test_simulate_class_equity_is_seeded_by_class():
+    hand = (48, 49, 44, 45)  # AsAhKsKh
+    first = simulate_class_equity(3, hand, iterations=500)
+    assert first == simulate_class_equity(3, hand, iterations=500)
+    assert first['wins'] + first['ties'] + first['losses'] == 500
+
+
+def test_record_shard_and_query(store):
+    assert completed_shards(store) == set()
+    assert get_hand_equity(store, 'AsAhKsKh') is None
+
+    record_shard(store, 0, [{'class_id': 0, 'wins': 70, 'ties': 1, 'losses': 29, 'iterations': 100, 'seed': 1}])
+    assert completed_shards(store) == {0}
+
+    by_string = get_hand_equity(store, 'AdAcKdKc')
+    by_id = get_hand_equity(store, 1)
+    assert by_string == by_id
+    assert by_id['win_pct'] == pytest.approx(70.0)
+    assert by_id['split_pct'] == pytest.approx(1.0)
+    # Class 1 has not been simulated yet
+    assert get_hand_equity(store, 2) is None
+    assert len(sample_hand_equities(store, 10)) == 2
+
+
+def test_record_shard_is_atomic(store):
+    duplicate = {'class_id': 0, 'wins': 1, 'ties': 0, 'losses': 0, 'iterations': 1, 'seed': 1}
+    with pytest.raises(Exception):
+        record_shard(store, 0, [duplicate, duplicate])
+    assert completed_shards(store) == set()
+    assert get_hand_equity(store, 0) is None
+
+
+def test_export_json_expands_classes(store, tmp_path):
+    record_shard(store, 0, [{'class_id': 0, 'wins': 70, 'ties': 0, 'losses': 30, 'iterations': 100, 'seed': 1}])
+    record_shard(store, 1, [{'class_id': 1, 'wins': 40, 'ties': 0, 'losses': 60, 'iterations': 100, 'seed': 2}])
+    output = tmp_path / 'plo_hand_equity.json'
+    export_json(store, str(output))
+
+    data = json.loads(output.read_text())
+    assert [row['hand'] for row in data] == ['AsAhKsKh', 'AdAcKdKc', '2s3h7d9c']
+    assert set(data[0]) == {'hand', 'win_pct', 'split_pct', 'loss_pct'}
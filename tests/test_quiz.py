@@ -0,0 +1,43 @@
+import json
+import re
+
+from total_bankroll.routes.hand_eval import _generate_quiz_questions
+
+
+def _answer_choices(response):
+    return re.findall(r'name="answer" required type="radio" value="([^"]+)"', response.get_data(as_text=True))
+
+
+def test_quiz_questions_are_deterministic_for_a_seed(app):
+    state = {'t': 'hud_stats', 's': 1234, 'n': 5, 'i': 0, 'r': 0, 'a': 0}
+    with app.test_request_context():
+        first = _generate_quiz_questions(state)
+        second = _generate_quiz_questions(state)
+    assert first == second
+    assert len(first) == 5
+
+
+def test_hud_quiz_keeps_compact_session_state(client):
+    """
+    GIVEN a started HUD stats quiz
+    WHEN every question is answered
+    THEN the session only holds the compact quiz state and the results page renders
+    """
+    response = client.post('/hud-stats-quiz', data={'num_questions': '10'})
+    assert response.status_code == 302
+
+    for _ in range(10):
+        choices = _answer_choices(client.get('/quiz'))
+        assert len(choices) == 4
+        client.post('/quiz', data={'answer': choices[0]})
+
+    with client.session_transaction() as sess:
+        state = sess['quiz']
+        assert 'quiz_questions' not in sess
+    assert state['i'] == 10
+    assert len(json.dumps(state)) < 100
+
+    response = client.get('/quiz-results')
+    assert response.status_code == 200
+    correct = bin(state['r']).count('1')
+    assert response.get_data(as_text=True).count('incorrect-answer-item') == 10 - correct
@@ -0,0 +1,156 @@
+"""Tests for the versioned in-process currency rate snapshot."""
+
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import event
+
+from src.total_bankroll.models import Currency
+from src.total_bankroll.rates import bump_rates_version, get_rate_snapshot, get_rates_version
+
+
+def _count_queries(db, func):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return result, len(statements)
+
+
+def test_snapshot_is_reused_until_version_bump(db):
+    first = get_rate_snapshot()
+    second, queries = _count_queries(db, get_rate_snapshot)
+    assert second is first
+    assert queries == 0
+
+    version = get_rates_version()
+    bump_rates_version()
+    assert get_rates_version() == version + 1
+    third, queries = _count_queries(db, get_rate_snapshot)
+    assert third is not first
+    assert queries == 2  # currencies and their rate history
+
+
+def test_currency_commit_bumps_version(db):
+    before = get_rate_snapshot()
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    db.session.commit()
+
+    snapshot = get_rate_snapshot()
+    assert snapshot.version != before.version
+    assert snapshot.currencies['EUR'].symbol == '€'
+    assert snapshot.to_usd(Decimal('10'), 'EUR') == Decimal('20')
+
+
+def test_usd_factors(db):
+    db.session.add(Currency(code='GBP', name='British Pound', symbol='£', rate=Decimal('0.8')))
+    db.session.commit()
+
+    snapshot = get_rate_snapshot()
+    assert snapshot.usd_factors['GBP'] == Decimal('1.25')
+    assert snapshot.usd_factor_array[snapshot.index['GBP']] == 1.25
+    assert snapshot.rate('XXX') == Decimal('1.0')
+
+    converted = snapshot.to_usd_array([8, 5, 3], ['GBP', 'USD', 'XXX'])
+    np.testing.assert_allclose(converted, [10.0, 5.0, 3.0])
+
+
+def test_rate_history_converts_as_of_each_date(db):
+    from datetime import datetime
+    from src.total_bankroll.models import CurrencyRateHistory
+    from src.total_bankroll.rates import RateHistory
+
+    eur = Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5'))
+    db.session.add(eur)
+    db.session.commit()
+    eur.rate = Decimal('0.25')
+    db.session.commit()
+
+    rows = CurrencyRateHistory.query.filter_by(currency_code='EUR').order_by(CurrencyRateHistory.effective_from).all()
+    assert [row.rate for row in rows] == [Decimal('0.5'), Decimal('0.25')]
+
+    history = get_rate_snapshot().history
+    changed_at = rows[1].effective_from
+    assert history.rate_as_of('EUR', datetime(2020, 1, 1)) == Decimal('0.5')
+    assert history.rate_as_of('EUR', changed_at) == Decimal('0.25')
+    assert history.to_usd(Decimal('10'), 'XXX', changed_at) == Decimal('10')
+
+    converted = history.to_usd_array(
+        [10, 10, 10], ['EUR', 'EUR', 'USD'], [datetime(2020, 1, 1), changed_at, datetime(2020, 1, 1)])
+    np.testing.assert_allclose(converted, [20.0, 40.0, 10.0])
+
+    # Amounts before the first recorded change use the earliest rate
+    early = RateHistory([('GBP', datetime(2024, 1, 1), Decimal('0.8'))])
+    assert early.rate_as_of('GBP', datetime(2000, 1, 1)) == Decimal('0.8')
+
+
+def test_breakdown_converts_deposits_at_their_date(db):
+    from datetime import datetime
+    from src.total_bankroll.models import CurrencyRateHistory, Deposits
+    from src.total_bankroll.utils import get_user_bankroll_data
+    from tests.factories import UserFactory
+
+    user = UserFactory()
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.25')))
+    db.session.commit()
+    db.session.add(CurrencyRateHistory(currency_code='EUR', rate=Decimal('0.5'), effective_from=datetime(2024, 1, 1)))
+    db.session.add_all([
+        Deposits(user_id=user.id, amount=Decimal('10'), currency='EUR', date=datetime(2023, 6, 1), last_updated=datetime(2023, 6, 1)),
+        Deposits(user_id=user.id, amount=Decimal('10'), currency='EUR', date=datetime(2024, 6, 1), last_updated=datetime(2024, 6, 1)),
+    ])
+    db.session.commit()
+
+    # 10 EUR at 0.25 (the first rate, covering 2023) + 10 EUR at 0.5 (from 2024)
+    assert get_user_bankroll_data(user.id)['total_deposits'] == Decimal('60')
+
+
+def test_cross_rates(db):
+    db.session.add_all([
+        Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')),
+        Currency(code='GBP', name='British Pound', symbol='£', rate=Decimal('0.8')),
+    ])
+    db.session.commit()
+
+    snapshot = get_rate_snapshot()
+    assert snapshot.cross_rate('EUR', 'GBP') == Decimal('1.6')
+    assert snapshot.scale_factor('EUR', 'GBP') == 1.6
+    assert snapshot.scale_factor('USD', 'EUR') == 0.5
+    assert snapshot.convert_series([10, 20.004], 'USD', 'GBP') == [8.0, 16.0]
+
+
+def test_totals_and_charts_in_other_currencies(app, db):
+    from datetime import datetime
+    from flask_login import login_user
+    from src.total_bankroll.models import Sites, SiteHistory, User
+    from src.total_bankroll.routes.charts import get_bankroll_data
+    from src.total_bankroll.services import BankrollService
+    from src.total_bankroll.extensions import cache
+    from tests.factories import UserFactory
+
+    cache.clear()  # user ids repeat across tests on the shared app
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    user = UserFactory(default_currency_code='EUR')
+    db.session.commit()
+    site = Sites(name='PokerStars', user_id=user.id)
+    db.session.add(site)
+    db.session.commit()
+    db.session.add(SiteHistory(site_id=site.id, user_id=user.id, amount=Decimal('100'),
+                               currency='USD', recorded_at=datetime(2025, 1, 1)))
+    db.session.commit()
+    user_id = user.id
+
+    service = BankrollService()
+    assert service.calculate_total_bankroll(user_id) == Decimal('100')
+    assert service.calculate_total_bankroll(user_id, 'EUR') == Decimal('50')
+    assert service.get_bankroll_breakdown(user_id, 'EUR')['total_profit'] == Decimal('50')
+
+    for query, currency, value in (('', 'EUR', 50.0), ('?currency=usd', 'USD', 100.0)):
+        with app.test_request_context(f'/charts/bankroll/data{query}'):
+            login_user(db.session.get(User, user_id))
+            payload = get_bankroll_data().get_json()
+        assert payload['currency'] == currency
+        assert payload['datasets'][0]['label'] == f'Total Bankroll ({currency})'
+        assert payload['datasets'][0]['data'][-1]['y'] == value
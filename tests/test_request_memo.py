@@ -0,0 +1,67 @@
+"""Tests for the per-request memo of service results."""
+
+from datetime import datetime
+from decimal import Decimal
+
+from flask import g
+
+from src.total_bankroll.extensions import cache
+from src.total_bankroll.models import Deposits
+from src.total_bankroll.request_memo import MEMO_ATTRIBUTE
+from src.total_bankroll.services import AchievementService, BankrollService
+from src.total_bankroll.services import bankroll_service as bankroll_module
+from tests.factories import UserFactory
+
+
+def _count_breakdown_reads(monkeypatch):
+    reads = []
+    real_get = cache.get
+
+    def get(key):
+        if key.startswith('bankroll_breakdown_'):
+            reads.append(key)
+        return real_get(key)
+
+    monkeypatch.setattr(bankroll_module.cache, 'get', get)
+    return reads
+
+
+def test_repeated_calls_in_a_request_read_the_cache_once(app, db, monkeypatch):
+    user = UserFactory()
+    db.session.commit()
+    reads = _count_breakdown_reads(monkeypatch)
+
+    with app.test_request_context('/'):
+        first = BankrollService().get_bankroll_breakdown(user.id)
+        assert BankrollService().get_bankroll_breakdown(user_id=user.id, currency_code='USD') is first
+        AchievementService().check_achievements(user)
+        assert len(reads) == 1
+
+    with app.test_request_context('/'):
+        assert BankrollService().get_bankroll_breakdown(user.id) == first
+        assert len(reads) == 2
+
+
+def test_invalidation_drops_the_memo(app, db):
+    user = UserFactory()
+    db.session.commit()
+    service = BankrollService()
+
+    with app.test_request_context('/'):
+        assert service.get_bankroll_breakdown(user.id)['total_deposits'] == Decimal('0')
+        db.session.add(Deposits(user_id=user.id, amount=Decimal('100'), currency='USD', date=datetime(2025, 1, 1),
+                                last_updated=datetime(2025, 1, 1)))
+        db.session.commit()
+        service._invalidate_cache(user.id)
+        assert service.get_bankroll_breakdown(user.id)['total_deposits'] == Decimal('100')
+
+
+def test_memo_is_dropped_at_teardown(app, db):
+    user = UserFactory()
+    db.session.commit()
+
+    with app.test_request_context('/'):
+        BankrollService().calculate_total_bankroll(user.id)
+        assert getattr(g, MEMO_ATTRIBUTE)
+    # The db fixture's app context outlives the request
+    assert not hasattr(g, MEMO_ATTRIBUTE)
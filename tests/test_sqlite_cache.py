@@ -0,0 +1,85 @@
+"""Tests for the SQLite cache backend shared between worker processes."""
+
+import multiprocessing
+from decimal import Decimal
+from unittest import mock
+
+from flask import Flask
+from flask_caching import Cache
+
+from src.total_bankroll import sqlite_cache
+from src.total_bankroll.sqlite_cache import SQLiteCache
+
+
+def _increment(path, times):
+    cache = SQLiteCache(path)
+    for _ in range(times):
+        cache.inc('counter')
+
+
+def test_writes_are_visible_to_other_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    worker, other = SQLiteCache(path), SQLiteCache(path)
+
+    other.set('bankroll_breakdown_1', {'total': Decimal('10')})
+    worker.set('bankroll_breakdown_1', {'total': Decimal('25')})
+    assert other.get('bankroll_breakdown_1') == {'total': Decimal('25')}
+
+    worker.delete('bankroll_breakdown_1')
+    assert other.get('bankroll_breakdown_1') is None
+    assert other.get_many('a', 'b') == [None, None]
+
+
+def test_entries_expire(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'), default_timeout=60)
+    with mock.patch.object(sqlite_cache, 'time', return_value=1000.0):
+        cache.set('short', 1, timeout=5)
+        cache.set('default', 2)
+        cache.set('forever', 3, timeout=0)
+    with mock.patch.object(sqlite_cache, 'time', return_value=1010.0):
+        assert cache.get_many('short', 'default', 'forever') == [None, 2, 3]
+        assert not cache.has('short')
+        assert cache.add('short', 4)
+        assert not cache.add('default', 5)
+    with mock.patch.object(sqlite_cache, 'time', return_value=1000.0 + 10 ** 6):
+        assert cache.get_many('short', 'default', 'forever') == [None, None, 3]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'), threshold=3, default_timeout=0)
+    for second, key in enumerate(['a', 'b', 'c'], start=1000):
+        with mock.patch.object(sqlite_cache, 'time', return_value=float(second)):
+            cache.set(key, key)
+    with mock.patch.object(sqlite_cache, 'time', return_value=1010.0):
+        assert cache.get('a') == 'a'
+    with mock.patch.object(sqlite_cache, 'time', return_value=1011.0):
+        cache.set('d', 'd')
+
+    assert cache.get_many('a', 'b', 'c', 'd') == ['a', None, 'c', 'd']
+
+
+def test_increments_from_several_processes_are_not_lost(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    SQLiteCache(path).set('counter', 0, timeout=0)
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_increment, args=(path, 50)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert SQLiteCache(path).get('counter') == 150
+
+
+def test_flask_caching_loads_the_backend(tmp_path):
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE='src.total_bankroll.sqlite_cache.SQLiteCache', CACHE_DIR=str(tmp_path),
+                      CACHE_THRESHOLD=10, CACHE_DEFAULT_TIMEOUT=30)
+    cache = Cache(app)
+
+    with app.app_context():
+        cache.set('currency_convert_USD_EUR_1', Decimal('0.9'))
+        assert cache.get('currency_convert_USD_EUR_1') == Decimal('0.9')
+    backend = app.extensions['cache'][cache]
+    assert backend.path == str(tmp_path / 'cache.sqlite3')
+    assert backend.default_timeout == 30
@@ -0,0 +1,473 @@
+"""Tests for the vectorized chart series built from one load of a user's events."""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from src.total_bankroll import timeseries
+from src.total_bankroll.cache_scopes import invalidate, user_scope
+from src.total_bankroll.extensions import cache
+from src.total_bankroll.models import (
+    Sites, Assets, SiteHistory, AssetHistory, Deposits, Drawings, Currency,
+)
+from src.total_bankroll.rates import get_rate_snapshot
+from src.total_bankroll.timeseries import (
+    Series, bucket_sums, chart_view, downsample, get_cached_chart_series, get_chart_series, iso_days,
+    lttb_indices, load_events, rollup, window,
+)
+from tests.factories import UserFactory
+
+
+START = datetime(2025, 3, 1, 12, 0)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(app):
+    # User ids repeat across tests, and so would their cached chart frames
+    with app.app_context():
+        cache.clear()
+
+
+@pytest.fixture
+def site(db):
+    user = UserFactory()
+    db.session.commit()
+    site = Sites(name='PokerStars', user_id=user.id)
+    db.session.add(site)
+    db.session.commit()
+    return site
+
+
+def _at(days, hours=0):
+    return START + timedelta(days=days, hours=hours)
+
+
+def test_series_follow_the_events(db, site):
+    db.session.add(Currency(code='EUR', name='Euro', symbol='€', rate=Decimal('0.5')))
+    second = Sites(name='GGPoker', user_id=site.user_id)
+    asset = Assets(name='Wallet', user_id=site.user_id)
+    db.session.add_all([second, asset])
+    db.session.commit()
+    user_id = site.user_id
+    db.session.add_all([
+        Deposits(user_id=user_id, amount=Decimal('100'), currency='USD', date=_at(-1), last_updated=START),
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('100'), currency='USD', recorded_at=_at(0)),
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('120'), currency='USD', recorded_at=_at(2)),
+        # The last record of a day wins
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('90'), currency='USD', recorded_at=_at(2, 3)),
+        SiteHistory(site_id=second.id, user_id=user_id, amount=Decimal('10'), currency='EUR', recorded_at=_at(1)),
+        AssetHistory(asset_id=asset.id, user_id=user_id, amount=Decimal('5'), currency='USD', recorded_at=_at(3)),
+        Drawings(user_id=user_id, amount=Decimal('30'), currency='USD', date=_at(3), last_updated=START),
+        Drawings(user_id=user_id, amount=Decimal('10'), currency='EUR', date=_at(3), last_updated=START),
+        Deposits(user_id=user_id, amount=Decimal('50'), currency='USD', date=_at(5), last_updated=START),
+    ])
+    db.session.commit()
+
+    series = get_chart_series(user_id, get_rate_snapshot())
+
+    # The bankroll starts on its first non-zero day, profit on the first event
+    assert iso_days(series.bankroll.days) == [_at(d).date().isoformat() for d in range(6)]
+    assert series.bankroll.values.round(2).tolist() == [100, 120, 110, 115, 115, 115]
+    assert iso_days(series.profit.days) == [_at(d).date().isoformat() for d in range(-1, 6)]
+    assert series.profit.values.round(2).tolist() == [-100, 0, 20, 10, 65, 65, 15]
+
+    assert series.sites.names == ['PokerStars', 'GGPoker']
+    assert iso_days(series.sites.days) == [_at(d).date().isoformat() for d in range(3)]
+    assert series.sites.values.tolist() == [[100, 100, 90], [0, 20, 20]]
+    assert series.assets.names == ['Wallet']
+    assert series.assets.values.tolist() == [[5]]
+
+    assert iso_days(series.deposits.days)[0] == _at(-1).date().isoformat()
+    assert series.deposits.values.tolist() == [100, 0, 0, 0, 0, 0, 50]
+    assert iso_days(series.withdrawals.days) == [_at(3).date().isoformat()]
+    assert series.withdrawals.values.tolist() == [50]
+
+
+def test_events_load_in_one_query(db, site):
+    db.session.add(SiteHistory(site_id=site.id, user_id=site.user_id, amount=Decimal('1'),
+                               currency='USD', recorded_at=START))
+    db.session.commit()
+    user_id = site.user_id
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        events = load_events(user_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(statements) == 1
+    assert events['kind'].tolist() == ['site']
+
+
+def test_user_without_events_gets_empty_series(db, site):
+    series = get_chart_series(site.user_id, get_rate_snapshot())
+    assert len(series.bankroll.days) == 0
+    assert len(series.profit.days) == 0
+    assert series.sites.names == []
+    assert len(series.deposits.values) == 0
+
+
+def _daily(values, names=None):
+    values = np.asarray(values, dtype=np.float64)
+    return Series(np.datetime64('2025-01-01') + np.arange(values.shape[-1]), values, names)
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    values = np.zeros(1000)
+    values[437] = 500.0
+    values[-1] = 3.0
+    kept = lttb_indices(values, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 437 in kept
+    assert np.all(np.diff(kept) > 0)
+
+    # Several series share the kept days; a spike in any of them survives
+    other = np.zeros(1000)
+    other[812] = -200.0
+    thinned = downsample(_daily(np.vstack([values, other]), ['a', 'b']), 50)
+    assert thinned.values.shape == (2, 50)
+    assert thinned.values.max() == 500.0 and thinned.values.min() == -200.0
+
+
+def test_bucket_sums_preserve_totals():
+    flows = _daily(np.arange(100))
+    merged = bucket_sums(flows, 7)
+    assert len(merged.days) == 7
+    assert merged.days[0] == flows.days[0]
+    assert merged.values.sum() == flows.values.sum()
+    assert bucket_sums(flows, 0) is flows
+    assert downsample(flows, 200) is flows
+
+
+def test_endpoints_accept_max_points(app, db, site):
+    from flask_login import login_user
+    from src.total_bankroll.models import User
+    from src.total_bankroll.routes.charts import get_deposits_data, get_profit_data
+
+    user_id = site.user_id
+    db.session.add_all([
+        Deposits(user_id=user_id, amount=Decimal('10'), currency='USD', date=_at(day), last_updated=START)
+        for day in range(0, 400, 3)
+    ])
+    db.session.commit()
+
+    with app.test_request_context('/charts/profit_data?max_points=40'):
+        login_user(db.session.get(User, user_id))
+        profit = get_profit_data().get_json()
+    with app.test_request_context('/charts/deposits_data?max_points=40'):
+        login_user(db.session.get(User, user_id))
+        deposits = get_deposits_data().get_json()
+    with app.test_request_context('/charts/deposits_data?max_points=0'):
+        login_user(db.session.get(User, user_id))
+        full = get_deposits_data().get_json()
+
+    assert len(profit['datasets'][0]['data']) == 40
+    assert profit['datasets'][0]['data'][-1]['y'] == -1340.0
+    assert len(deposits['labels']) == 40
+    assert sum(deposits['datasets'][0]['data']) == 1340.0
+    assert len(full['labels']) == 400
+
+
+def test_weekly_and_monthly_rollups():
+    # Wednesday 2025-01-01 to Monday 2025-02-03
+    balances = _daily(np.arange(34))
+    weekly = rollup(balances, 'week')
+    assert iso_days(weekly.days)[:2] == ['2024-12-30', '2025-01-06']
+    assert weekly.values.tolist()[:2] == [4, 11]
+    assert weekly.values[-1] == 33
+
+    flows = _daily(np.ones(34))
+    monthly = rollup(flows, 'month', how='sum')
+    assert iso_days(monthly.days) == ['2025-01-01', '2025-02-01']
+    assert monthly.values.tolist() == [31, 3]
+    assert rollup(flows, 'day') is flows
+
+
+def test_window_and_view_keep_whole_periods(db, site):
+    from datetime import date
+
+    series = _daily(np.arange(34))
+    assert iso_days(window(series, date(2025, 1, 10), date(2025, 1, 12)).days) == \
+        ['2025-01-10', '2025-01-11', '2025-01-12']
+    assert len(window(series, end=date(2024, 1, 1)).days) == 0
+
+    chart = get_chart_series(site.user_id, get_rate_snapshot())._replace(profit=series, deposits=_daily(np.ones(34)))
+    view = chart_view(chart, 'week', start=date(2025, 1, 8), end=date(2025, 1, 20))
+    # The week containing the start date is kept whole
+    assert iso_days(view.profit.days) == ['2025-01-06', '2025-01-13', '2025-01-20']
+    assert view.deposits.values.tolist() == [7, 7, 7]
+
+
+def test_endpoints_accept_range_and_granularity(app, db, site):
+    from flask_login import login_user
+    from src.total_bankroll.models import User
+    from src.total_bankroll.routes.charts import get_poker_sites_historical_data
+
+    user_id = site.user_id
+    db.session.add_all([
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal(day), currency='USD', recorded_at=_at(day))
+        for day in range(0, 90, 10)
+    ])
+    db.session.commit()
+
+    with app.test_request_context('/charts/poker_sites_historical_data?granularity=month&start=2025-04-02'):
+        login_user(db.session.get(User, user_id))
+        payload = get_poker_sites_historical_data().get_json()
+    assert payload['labels'] == ['2025-04-01', '2025-05-01']
+    assert payload['datasets'][0]['data'] == [60.0, 80.0]
+
+    with app.test_request_context('/charts/poker_sites_historical_data?granularity=hour&start=bad'):
+        login_user(db.session.get(User, user_id))
+        payload = get_poker_sites_historical_data().get_json()
+    assert len(payload['labels']) == 81
+
+
+def test_dashboard_payload_matches_single_endpoints(app, db, site):
+    import gzip
+    import json
+    from flask_login import login_user
+    from src.total_bankroll.models import User
+    from src.total_bankroll.routes.charts import (
+        get_dashboard_data, get_deposits_data, get_poker_sites_historical_data, get_poker_sites_pie_data,
+    )
+
+    user_id = site.user_id
+    db.session.add_all([
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal(day), currency='USD', recorded_at=_at(day))
+        for day in range(0, 200, 2)
+    ] + [Deposits(user_id=user_id, amount=Decimal('10'), currency='USD', date=_at(1), last_updated=START)])
+    db.session.commit()
+
+    def call(view, query='', **headers):
+        with app.test_request_context(f'/charts/x{query}', headers=headers):
+            login_user(db.session.get(User, user_id))
+            return view()
+
+    full = call(get_dashboard_data, '?fields=poker_sites,poker_sites_pie,deposits,nonsense')
+    assert full.headers.get('Content-Encoding') is None
+    payload = full.get_json()
+    assert sorted(payload) == ['currency', 'deposits', 'poker_sites', 'poker_sites_pie']
+    assert payload['poker_sites'] == call(get_poker_sites_historical_data).get_json()
+    assert payload['poker_sites_pie'] == call(get_poker_sites_pie_data).get_json()
+    assert payload['deposits'] == call(get_deposits_data).get_json()
+
+    compressed = call(get_dashboard_data, **{'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    everything = json.loads(gzip.decompress(compressed.get_data()))
+    assert set(everything) == {'currency', 'bankroll', 'profit', 'poker_sites', 'assets', 'poker_sites_pie',
+                               'assets_pie', 'deposits', 'withdrawals'}
+    assert everything['poker_sites'] == payload['poker_sites']
+
+
+def _assert_same_series(cached, fresh):
+    for name, got, expected in zip(fresh._fields, cached, fresh):
+        assert iso_days(got.days) == iso_days(expected.days), name
+        assert np.allclose(got.values, expected.values), name
+        assert got.names == expected.names, name
+
+
+def test_cached_series_only_rebuild_changed_days(db, site, monkeypatch):
+    user_id = site.user_id
+    rates = get_rate_snapshot()
+    db.session.add_all([
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal(100 + day), currency='USD',
+                    recorded_at=_at(day))
+        for day in range(0, 30, 3)
+    ] + [Deposits(user_id=user_id, amount=Decimal('100'), currency='USD', date=_at(0), last_updated=START)])
+    db.session.commit()
+    get_cached_chart_series(user_id, rates)
+
+    loads = []
+    real_load = timeseries.load_events
+    monkeypatch.setattr(timeseries, 'load_events', lambda *args: loads.append(args) or real_load(*args))
+
+    # Unchanged history is served from the cache
+    get_cached_chart_series(user_id, rates)
+    assert loads == []
+
+    # Appending a day only loads that day
+    asset = Assets(name='Wallet', user_id=user_id)
+    db.session.add(asset)
+    db.session.commit()
+    db.session.add(AssetHistory(asset_id=asset.id, user_id=user_id, amount=Decimal('7'), currency='USD',
+                                recorded_at=_at(40)))
+    db.session.commit()
+    cached = get_cached_chart_series(user_id, rates)
+    assert loads == [(user_id, _at(40).date())]
+    _assert_same_series(cached, get_chart_series(user_id, rates))
+
+    # Backdated, edited and deleted rows rebuild from their own day
+    loads.clear()
+    db.session.add(Drawings(user_id=user_id, amount=Decimal('20'), currency='USD', date=_at(10),
+                            last_updated=START))
+    latest = db.session.query(SiteHistory).filter_by(user_id=user_id, recorded_at=_at(27)).one()
+    latest.amount = Decimal('500')
+    db.session.delete(db.session.query(SiteHistory).filter_by(user_id=user_id, recorded_at=_at(15)).one())
+    db.session.commit()
+    cached = get_cached_chart_series(user_id, rates)
+    assert loads == [(user_id, _at(10).date())]
+    _assert_same_series(cached, get_chart_series(user_id, rates))
+
+    # Deleting the newest events trims the trailing days
+    AssetHistory.query.filter_by(asset_id=asset.id).delete()
+    db.session.commit()
+    _assert_same_series(get_cached_chart_series(user_id, rates), get_chart_series(user_id, rates))
+
+    # Renaming an item rebuilds everything
+    loads.clear()
+    site.name = 'Stars'
+    db.session.commit()
+    cached = get_cached_chart_series(user_id, rates)
+    assert cached.sites.names == ['Stars']
+    assert loads == [(user_id,)]
+
+
+def test_cached_rollups_follow_changed_days(db, site, monkeypatch):
+    user_id = site.user_id
+    rates = get_rate_snapshot()
+    db.session.add_all([
+        SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal(100 + day), currency='USD',
+                    recorded_at=_at(day))
+        for day in range(0, 70, 4)
+    ] + [Deposits(user_id=user_id, amount=Decimal(10 + day), currency='USD', date=_at(day), last_updated=START)
+         for day in range(0, 70, 9)])
+    db.session.commit()
+
+    def assert_rollups_match():
+        fresh = get_chart_series(user_id, rates)
+        for granularity in ('week', 'month'):
+            _assert_same_series(get_cached_chart_series(user_id, rates, granularity), chart_view(fresh, granularity))
+
+    assert_rollups_match()
+    rollups = []
+    real_rollup = timeseries.rollup
+    monkeypatch.setattr(timeseries, 'rollup', lambda *args: rollups.append(args) or real_rollup(*args))
+    get_cached_chart_series(user_id, rates, 'month')
+    assert rollups == []
+
+    # Appended, backdated and deleted rows, and an item first seen mid-history
+    db.session.add(SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('7'), currency='USD',
+                               recorded_at=_at(80)))
+    db.session.commit()
+    assert_rollups_match()
+    asset = Assets(name='Wallet', user_id=user_id)
+    db.session.add(asset)
+    db.session.commit()
+    db.session.add_all([
+        AssetHistory(asset_id=asset.id, user_id=user_id, amount=Decimal('5'), currency='USD', recorded_at=_at(45)),
+        Drawings(user_id=user_id, amount=Decimal('20'), currency='USD', date=_at(30), last_updated=START),
+    ])
+    db.session.commit()
+    assert_rollups_match()
+    db.session.delete(db.session.query(SiteHistory).filter_by(user_id=user_id, recorded_at=_at(80)).one())
+    db.session.commit()
+    assert_rollups_match()
+
+
+def test_rolled_back_writes_keep_the_cache(db, site):
+    user_id = site.user_id
+    rates = get_rate_snapshot()
+    db.session.add(SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('5'), currency='USD',
+                               recorded_at=START))
+    db.session.commit()
+    get_cached_chart_series(user_id, rates)
+
+    db.session.add(SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('9'), currency='USD',
+                               recorded_at=_at(2)))
+    db.session.flush()
+    db.session.rollback()
+    assert cache.get(timeseries.CHART_DIRTY_KEY.format(user_id)) is None
+    assert get_cached_chart_series(user_id, rates).sites.values.tolist() == [[5]]
+
+
+def test_invalidated_frames_are_rebuilt_without_a_marker(db, site, monkeypatch):
+    user_id = site.user_id
+    rates = get_rate_snapshot()
+    db.session.add(SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('5'), currency='USD',
+                               recorded_at=START))
+    db.session.commit()
+    get_cached_chart_series(user_id, rates)
+
+    # Another worker committed the write: its marker never reached this worker's cache
+    db.session.add(SiteHistory(site_id=site.id, user_id=user_id, amount=Decimal('9'), currency='USD',
+                               recorded_at=_at(2)))
+    db.session.commit()
+    cache.delete(timeseries.CHART_DIRTY_KEY.format(user_id))
+    assert get_cached_chart_series(user_id, rates).sites.values.tolist() == [[5, 5, 9]]
+
+    loads = []
+    real_load = timeseries.load_events
+    monkeypatch.setattr(timeseries, 'load_events', lambda *args: loads.append(args) or real_load(*args))
+    invalidate(user_scope(user_id))
+    get_cached_chart_series(user_id, rates)
+    assert loads == [(user_id,)]
+
+
+def test_frames_expire_like_other_entries_on_a_per_process_backend(app, monkeypatch):
+    with app.app_context():
+        assert timeseries._frame_timeout() == app.config['CACHE_DEFAULT_TIMEOUT']
+        monkeypatch.setitem(app.config, 'CACHE_TYPE', 'total_bankroll.sqlite_cache.SQLiteCache')
+        assert timeseries._frame_timeout() == timeseries.CHART_FRAME_TIMEOUT
+
+
+def _expand_columnar(payload):
+    # Mirrors expandChartData in chart_utils.js
+    if payload.get('format') != 'columnar':
+        return payload
+    start = datetime.fromisoformat(payload['start'])
+    count = len(payload['datasets'][0]['data']) if payload['datasets'] else 0
+    offsets = payload.get('offsets') or [i * payload['step'] for i in range(count)]
+    days = [(start + timedelta(days=offset)).date().isoformat() for offset in offsets]
+    datasets = [{**payload['style'], **dataset} for dataset in payload['datasets']]
+    if payload['points']:
+        for dataset in datasets:
+            dataset['data'] = [{'x': day, 'y': value} for day, value in zip(days, dataset['data'])]
+        return {'datasets': datasets, 'currency': payload['currency']}
+    return {'labels': days, 'datasets': datasets, 'currency': payload['currency']}
+
+
+def test_columnar_format_expands_to_the_regular_payload(app, db, site):
+    from flask_login import login_user
+    from src.total_bankroll.models import User
+    from src.total_bankroll.routes.charts import (
+        get_bankroll_data, get_deposits_data, get_poker_sites_historical_data, get_profit_data,
+    )
+
+    user_id = site.user_id
+    second = Sites(name='GGPoker', user_id=user_id)
+    db.session.add(second)
+    db.session.commit()
+    db.session.add_all([
+        SiteHistory(site_id=site_id, user_id=user_id, amount=Decimal(day % 37), currency='USD',
+                    recorded_at=_at(day))
+        for day in range(0, 300, 2) for site_id in (site.id, second.id)
+    ] + [Deposits(user_id=user_id, amount=Decimal('10'), currency='USD', date=_at(day), last_updated=START)
+         for day in (0, 5, 120)])
+    db.session.commit()
+
+    def call(view, query):
+        with app.test_request_context(f'/charts/x?{query}'):
+            login_user(db.session.get(User, user_id))
+            return view()
+
+    for view in (get_bankroll_data, get_profit_data, get_poker_sites_historical_data, get_deposits_data):
+        for query in ('', 'granularity=month', 'max_points=50'):
+            regular = call(view, query)
+            compact = call(view, f'{query}&format=columnar')
+            assert _expand_columnar(compact.get_json()) == regular.get_json(), (view.__name__, query)
+        assert call(view, 'format=columnar').content_length < call(view, '').content_length
+    # {x, y} points shrink the most
+    assert call(get_bankroll_data, 'format=columnar').content_length < call(get_bankroll_data, '').content_length / 3
+
+    payload = call(get_poker_sites_historical_data, 'format=columnar').get_json()
+    assert payload['step'] == 1 and 'offsets' not in payload
+    assert payload['style'] == {'fill': False, 'tension': 0.1}
+    assert payload['datasets'][1]['borderColor'] != payload['datasets'][0]['borderColor']
+    assert 'offsets' in call(get_poker_sites_historical_data, 'format=columnar&granularity=month').get_json()